@@ -6,9 +6,122 @@ Servo servos[4];
 // Broches des servomoteurs
 const int SERVO_PINS[4] = {3, 5, 6, 9};
 
+// Négociation de vitesse (voir baud_negotiation.py)
+const long SAFE_BAUD = 9600;
+const long SUPPORTED_BAUDS[] = {9600, 19200, 38400, 57600, 115200, 250000, 500000};
+const unsigned long BAUD_PROBATION_MS = 1000;
+bool baud_probation = false;
+unsigned long baud_switched_at = 0;
+
+bool baud_supported(long rate) {
+  for (unsigned int i = 0; i < sizeof(SUPPORTED_BAUDS) / sizeof(SUPPORTED_BAUDS[0]); i++) {
+    if (SUPPORTED_BAUDS[i] == rate) return true;
+  }
+  return false;
+}
+
+void switch_baud(long rate) {
+  Serial.flush();  // Attendre la fin de l'émission en cours
+  Serial.end();
+  Serial.begin(rate);
+}
+
+// Traite les commandes "BAUD <vitesse>" et "PING <motif>", renvoie true si la ligne en était une
+bool handle_link_command(char *data) {
+  if (strncmp(data, "BAUD ", 5) == 0) {
+    long rate = atol(data + 5);
+    if (!baud_supported(rate)) {
+      Serial.println("BAUD NON");
+      return true;
+    }
+    Serial.print("BAUD OK ");
+    Serial.println(rate);
+    switch_baud(rate);
+    // Sans PING valide avant la fin de la période d'essai, retour à la vitesse sûre
+    baud_probation = rate != SAFE_BAUD;
+    baud_switched_at = millis();
+    return true;
+  }
+  if (strncmp(data, "PING ", 5) == 0) {
+    Serial.print("PONG ");
+    Serial.println(data + 5);
+    baud_probation = false;
+    return true;
+  }
+  return false;
+}
+
+// Ligne en cours de réception : assemblée caractère par caractère, sans
+// readStringUntil (qui bloque jusqu'à 1 s si la fin de ligne tarde)
+char line[64];
+byte line_length = 0;
+bool line_overflow = false;
+
+// Traite une ligne complète : "servo,angle;servo,angle" ou "@<seq> servo,angle;..."
+void process_line(char *data) {
+  if (handle_link_command(data)) {
+    return;
+  }
+
+  // Commande numérotée (fenêtre glissante) : un seul accusé "OK <seq>"
+  int seq = -1;
+  if (data[0] == '@') {
+    seq = atoi(data + 1);
+    data = strchr(data, ' ');
+    if (data == NULL) {
+      Serial.print("ERR ");
+      Serial.println(seq);
+      return;
+    }
+    data++;
+  }
+  
+  // Variables pour stocker les informations
+  int servos_to_update[4] = {-1, -1, -1, -1};
+  int angles[4] = {-1, -1, -1, -1};
+  
+  // Analyser la chaîne de données
+  int index = 0;
+  char* command = strtok(data, ";");
+  while (command != NULL && index < 4) {
+    // Convertir la commande en numéro de servo et angle
+    int servo, angle;
+    if (sscanf(command, "%d,%d", &servo, &angle) == 2) {
+      // Vérifier que le servo et l'angle sont dans les plages valides
+      if (servo >= 0 && servo < 4 && angle >= 0 && angle <= 180) {
+        servos_to_update[index] = servo;
+        angles[index] = angle;
+        index++;
+      }
+    }
+    command = strtok(NULL, ";");
+  }
+  
+  // Mettre à jour les servos spécifiés
+  for (int i = 0; i < 4; i++) {
+    if (servos_to_update[i] != -1) {
+      servos[servos_to_update[i]].write(angles[i]);
+      
+      // Confirmation de l'action (sauf commande numérotée)
+      if (seq < 0) {
+        Serial.print("Servo ");
+        Serial.print(servos_to_update[i]);
+        Serial.print(" positionné à ");
+        Serial.print(angles[i]);
+        Serial.println(" degrés");
+      }
+    }
+  }
+
+  if (seq >= 0) {
+    Serial.print(index > 0 ? "OK " : "ERR ");
+    Serial.println(seq);
+  }
+}
+
 void setup() {
   // Initialiser la communication série
-  Serial.begin(9600);
+  Serial.begin(SAFE_BAUD);
   
   // Attacher les servos aux broches correspondantes
   for (int i = 0; i < 4; i++) {
@@ -22,45 +135,29 @@ void setup() {
 }
 
 void loop() {
-  // Vérifier si des données sont disponibles sur le port série
-  if (Serial.available() > 0) {
-    // Lire la ligne complète
-    String data = Serial.readStringUntil('\n');
-    
-    // Variables pour stocker les informations
-    int servos_to_update[4] = {-1, -1, -1, -1};
-    int angles[4] = {-1, -1, -1, -1};
-    
-    // Analyser la chaîne de données
-    int index = 0;
-    char* command = strtok((char*)data.c_str(), ";");
-    while (command != NULL && index < 4) {
-      // Convertir la commande en numéro de servo et angle
-      int servo, angle;
-      if (sscanf(command, "%d,%d", &servo, &angle) == 2) {
-        // Vérifier que le servo et l'angle sont dans les plages valides
-        if (servo >= 0 && servo < 4 && angle >= 0 && angle <= 180) {
-          servos_to_update[index] = servo;
-          angles[index] = angle;
-          index++;
-        }
+  // Période d'essai écoulée sans confirmation : retour à la vitesse sûre
+  if (baud_probation && millis() - baud_switched_at >= BAUD_PROBATION_MS) {
+    baud_probation = false;
+    switch_baud(SAFE_BAUD);
+  }
+
+  // Lire tous les caractères disponibles sans jamais attendre
+  while (Serial.available() > 0) {
+    char c = Serial.read();
+    if (c == '\n') {
+      line[line_length] = '\0';
+      // Une ligne trop longue est ignorée en entier plutôt que tronquée
+      if (!line_overflow) {
+        process_line(line);
       }
-      command = strtok(NULL, ";");
-    }
-    
-    // Mettre à jour les servos spécifiés
-    for (int i = 0; i < 4; i++) {
-      if (servos_to_update[i] != -1) {
-        servos[servos_to_update[i]].write(angles[i]);
-        
-        // Confirmation de l'action
-        Serial.print("Servo ");
-        Serial.print(servos_to_update[i]);
-        Serial.print(" positionné à ");
-        Serial.print(angles[i]);
-        Serial.println(" degrés");
+      line_length = 0;
+      line_overflow = false;
+    } else if (c != '\r') {
+      if (line_length < sizeof(line) - 1) {
+        line[line_length++] = c;
+      } else {
+        line_overflow = true;
       }
     }
   }
 }
-
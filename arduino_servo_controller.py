@@ -1,25 +1,118 @@
 #!/usr/bin/env python3
+import queue
 import serial
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 import time
+import binary_protocol
+from baud_negotiation import negotiate_baud_rate, DEFAULT_CANDIDATES
+from serial_reader import SerialReader, LineSplitter
+from servo_state import ServoStateMirror
+from command_window import CommandWindow, parse_ack
+from write_scheduler import WriteScheduler
+from port_discovery import DEFAULT_CACHE, READY_TIMEOUT, open_board, remember_port
+
+# Commande validée et encodée une fois par prepare_frame, puis rejouée par send_frame
+# (data vaut None en protocole binaire : le numéro de séquence change à chaque envoi)
+PreparedFrame = namedtuple('PreparedFrame', 'servos angles data expected')
 
 class ArduinoServoController:
     """
     Classe pour contrôler les servomoteurs via l'Arduino
     """
     
-    def __init__(self, port='/dev/ttyUSB0', baud_rate=9600):
+    NUM_SERVOS = 4  # Servos pilotés par une carte
+    num_servos = NUM_SERVOS
+    
+    def __init__(self, port='auto', baud_rate=9600, reader_thread=False, reply_timeout=1.0,
+                 binary=False, auto_baud=False, baud_candidates=DEFAULT_CANDIDATES,
+                 window_size=0, retransmit_timeout=0.25, metrics=None, safety=None,
+                 reset_on_connect=True, ready_timeout=READY_TIMEOUT, port_cache=DEFAULT_CACHE, trace=None):
         """
         Initialise la connexion avec l'Arduino
         
         Args:
-            port (str): Port série de l'Arduino
+            port (str): Port série de l'Arduino ('auto' : recherche parmi /dev/ttyUSB*
+                        et /dev/ttyACM*, voir port_discovery.py)
             baud_rate (int): Vitesse de transmission
+            reader_thread (bool): Si True, un thread dédié lit les réponses
+                                  et set_servo_angle ne bloque plus
+            reply_timeout (float): Délai maximal d'attente d'une réponse (s)
+            binary (bool): Si True, utilise le protocole binaire de binary_arduino.ino
+                           au lieu des commandes texte
+            auto_baud (bool): Si True, négocie à la connexion la vitesse la plus
+                              élevée supportée (baud_rate sert de vitesse sûre)
+            baud_candidates (tuple): Vitesses proposées lors de la négociation
+            window_size (int): Si > 0, nombre de commandes numérotées en vol
+                               (fenêtre glissante, implique reader_thread)
+            retransmit_timeout (float): Délai avant retransmission d'une commande
+                                        sans accusé en mode fenêtre (s)
+            metrics (Metrics): Si donné, mesures de la liaison (voir metrics.py)
+            safety (SafetyEnvelope): Si donnée, enveloppe de sécurité vérifiée avant
+                                     chaque envoi (voir safety.py)
+            reset_on_connect (bool): Si False, la carte n'est pas redémarrée à l'ouverture
+                                     du port (DTR maintenu) : une carte déjà démarrée
+                                     répond aussitôt à une sonde
+            ready_timeout (float): Délai maximal d'attente de la carte au démarrage (s)
+            port_cache (str): Fichier du cache des ports par numéro de série USB (None : sans cache)
+            trace (WireTrace): Si donnée, trace des octets échangés (voir wire_trace.py)
         """
         self.port = port
         self.baud_rate = baud_rate
         self.serial = None
         self.connected = False
-        self.current_angles = [90, 90, 90, 90]  # Angles actuels des servos
+        self.reader_thread = reader_thread or window_size > 0
+        self.window_size = window_size
+        self.retransmit_timeout = retransmit_timeout
+        self.window = None
+        self.reply_timeout = reply_timeout
+        self.binary = binary
+        self.auto_baud = auto_baud
+        self.baud_candidates = baud_candidates
+        self.negotiated_baud = None  # Vitesse effective de la liaison une fois connecté
+        self.sequence = 0  # Numéro de séquence des trames binaires
+        self.reader = None
+        self.scheduler = None
+        # Angles commandés et angles confirmés par l'Arduino
+        self.state = ServoStateMirror()
+        self.connections = 0
+        self.listeners = ()  # Fonctions appelées pour chaque message de l'Arduino
+        self.metrics = metrics
+        self.safety = safety
+        self.reset_on_connect = reset_on_connect
+        self.ready_timeout = ready_timeout
+        self.port_cache = port_cache
+        self.trace = trace
+        # Un envoi (état commandé, numéro de séquence, écriture) à la fois, quel que soit le thread
+        self.lock = threading.RLock()
+        self.gauge_labels = None  # Étiquettes des jauges déclarées (à la connexion, port résolu)
+    
+    @property
+    def current_angles(self):
+        """
+        Derniers angles commandés (voir self.state pour les angles confirmés)
+        """
+        return self.state.commanded
+    
+    @property
+    def confirmed_angles(self):
+        """
+        Derniers angles confirmés par l'Arduino (None tant qu'un servo n'a rien confirmé)
+        """
+        return list(self.state.acked)
+    
+    def add_listener(self, listener):
+        """
+        Enregistre listener(message), appelé pour chaque message de l'Arduino
+        (depuis le thread de lecture s'il est actif) ; utile pour réveiller une
+        boucle d'événements. Un listener qui renvoie True consomme le message
+        (ex. crédits du tampon de trajectoire) : il ne va pas dans la file des messages.
+        """
+        self.listeners = self.listeners + (listener,)
+    
+    def remove_listener(self, listener):
+        self.listeners = tuple(l for l in self.listeners if l is not listener)
         
     def connect(self):
         """
@@ -29,17 +122,51 @@ class ArduinoServoController:
             bool: True si la connexion est établie, False sinon
         """
         try:
-            self.serial = serial.Serial(self.port, self.baud_rate, timeout=1)
-            # Attendre que la connexion Arduino soit prête
-            time.sleep(2)
+            # Attendre que l'Arduino soit prêt (bannière ou réponse à une sonde) plutôt qu'une pause fixe
+            self.serial, self.port, signal, messages = open_board(
+                self.port, self.baud_rate, self.binary, self.reset_on_connect, self.baud_candidates,
+                self.ready_timeout, self.port_cache)
+            if self.metrics:
+                self.serial = self.metrics.wrap_serial(self.serial)
+                self._register_gauges()
+            if self.trace:
+                self.serial = self.trace.wrap_serial(self.serial, self.port)
+            if signal != 'probe':
+                # L'Arduino a redémarré : les servos repartent au centre
+                self.state.reset()
             
-            # Lire et retourner les messages d'initialisation
-            messages = []
-            while self.serial.in_waiting:
-                message = self.serial.readline().decode('utf-8').strip()
-                messages.append(message)
+            # Passer à la vitesse la plus élevée acceptée par l'Arduino
+            # (une carte non redémarrée peut déjà être à la vitesse négociée la fois précédente)
+            if self.auto_baud and self.serial.baudrate == self.baud_rate:
+                self.negotiated_baud = negotiate_baud_rate(self.serial, self.baud_candidates, self.binary)
+            else:
+                self.negotiated_baud = self.serial.baudrate
+            if self.port_cache:
+                remember_port(self.port, self.negotiated_baud, self.port_cache)
+            
+            if self.window_size:
+                self.window = CommandWindow(self.serial.write, self._encode_numbered, self.window_size,
+                                            self.retransmit_timeout, is_current=self._is_current)
+            
+            if self.reader_thread:
+                # Timeout court pour que le thread de lecture puisse s'arrêter rapidement
+                self.serial.timeout = 0.05
+                periodic = self.window.check_timeouts if self.window else None
+                if self.binary:
+                    self.reader = SerialReader(self.serial, binary_protocol.ReplySplitter(),
+                                               lambda message: isinstance(message, binary_protocol.Reply),
+                                               listener=self._observe, periodic=periodic)
+                else:
+                    self.reader = SerialReader(self.serial, LineSplitter(), listener=self._observe,
+                                               periodic=periodic)
+                self.reader.start()
                 
             self.connected = True
+            self.connections += 1
+            if self.metrics:
+                self.metrics.count('connects')
+                if self.connections > 1:
+                    self.metrics.count('reconnects')
             return True, messages
             
         except serial.SerialException as e:
@@ -49,13 +176,24 @@ class ArduinoServoController:
         """
         Ferme la connexion avec l'Arduino
         """
+        self.stop_scheduler()
+        if self.reader:
+            self.reader.stop()
+            self.reader = None
+        if self.window:
+            self.window.fail_all()
+            if self.metrics:
+                # Les totaux de la fenêtre survivent à sa destruction
+                self.metrics.count('retransmissions', self.window.retransmissions)
+                self.metrics.count('window_failures', self.window.failures)
+            self.window = None
         if self.serial and self.serial.is_open:
             self.serial.close()
             self.connected = False
             return True
         return False
     
-    def set_servo_angle(self, servo_num, angle, multi_servo=False):
+    def set_servo_angle(self, servo_num, angle, multi_servo=False, wait=False, timeout=None, force=False):
         """
         Définit l'angle d'un ou plusieurs servomoteurs
         
@@ -63,9 +201,14 @@ class ArduinoServoController:
             servo_num (int or list): Numéro du servomoteur ou liste de numéros
             angle (int or list): Angle désiré ou liste d'angles
             multi_servo (bool): Si True, permet de mettre à jour plusieurs servos simultanément
+            wait (bool): Avec le thread de lecture, attendre la réponse de l'Arduino
+            timeout (float): Délai d'attente de la réponse (reply_timeout par défaut)
+            force (bool): Envoyer même les angles déjà confirmés par l'Arduino
             
         Returns:
-            tuple: (bool, str) - Succès et message associé
+            tuple: (bool, str) - Succès et message associé. Avec le thread de
+                   lecture et wait=False, le second élément est un Future
+                   résolu avec la liste des réponses.
         """
         if not self.connected:
             return False, "Non connecté à l'Arduino"
@@ -84,30 +227,391 @@ class ArduinoServoController:
             if not (0 <= a <= 180):
                 return False, f"L'angle {a} doit être entre 0 et 180 degrés"
         
+        # Si pas multi_servo, n'envoie qu'un seul servo à la fois
+        if not multi_servo:
+            servo_num, angle = servo_num[:1], angle[:1]
+        
+        # Avec le thread de lecture, la réponse est attendue hors du verrou :
+        # les autres threads peuvent envoyer pendant ce temps
+        asynchronous = self.reader is not None
+        with self.lock:
+            success, result = self._set_servo_angle(servo_num, angle, wait and not asynchronous, timeout, force)
+        if success and wait and isinstance(result, Future):
+            return self._wait_reply(result, timeout)
+        return success, result
+    
+    def _set_servo_angle(self, servo_num, angle, wait, timeout, force):
+        """
+        Suite de set_servo_angle, appelée avec self.lock : consignes validées
+        """
+        # Enveloppe de sécurité : la pose complète (avec les autres servos) doit être permise
+        if self.safety:
+            safe, reason = self.safety.check_targets(servo_num, angle, self.state.commanded)
+            if not safe:
+                return False, reason
+        
+        # Ne pas renvoyer les angles déjà confirmés par l'Arduino
+        if not force:
+            pairs = [(s, a) for s, a in zip(servo_num, angle) if not self.state.is_applied(s, a)]
+            if not pairs:
+                if self.metrics:
+                    self.metrics.count('commands_skipped')
+                return True, (self.reader.expect(0, 0) if self.reader and not wait else [])
+            servo_num, angle = [s for s, _ in pairs], [a for _, a in pairs]
+        
+        if self.window:
+            return self._send_windowed(servo_num, angle, wait, timeout)
+        
         # Préparer la commande
-        if multi_servo:
-            # Format de commande : "servo1,angle1;servo2,angle2;servo3,angle3;servo4,angle4"
-            command = ";".join([f"{s},{a}" for s, a in zip(servo_num, angle)]) + "\n"
+        seq = None
+        if self.binary:
+            seq = self._next_sequence()
+            command = binary_protocol.encode_angles(servo_num, angle, seq)
+            expected = 1  # Un seul accusé par trame
         else:
-            # Si pas multi_servo, n'envoie qu'un seul servo à la fois
-            command = f"{servo_num[0]},{angle[0]}\n"
+            # Format de commande : "servo1,angle1;servo2,angle2;servo3,angle3;servo4,angle4"
+            command = (";".join([f"{s},{a}" for s, a in zip(servo_num, angle)]) + "\n").encode('utf-8')
+            # Une confirmation par servo distinct (arduino.ino en traite au plus 4)
+            expected = min(len(set(servo_num)), 4)
         
-        # Envoi de la commande à l'Arduino
-        self.serial.write(command.encode('utf-8'))
+        # Mettre à jour les angles commandés (confirmés à réception de la réponse)
+        self.state.command(servo_num, angle, seq)
+        
+        if self.reader:
+            return self._send_async(command, expected, wait, timeout)
+        return self._send_blocking(command, expected)
+    
+    def prepare_frame(self, servo_num, angle):
+        """
+        Valide et encode une commande multi-servos une fois pour toutes
         
-        # Mettre à jour les angles actuels
+        Args:
+            servo_num (list): Numéros des servomoteurs
+            angle (list): Angles désirés
+            
+        Returns:
+            tuple: (bool, PreparedFrame ou str) - Trame à passer à send_frame, ou message d'erreur
+        """
+        if not isinstance(servo_num, list):
+            servo_num = [servo_num]
+        if not isinstance(angle, list):
+            angle = [angle]
         for s, a in zip(servo_num, angle):
-            self.current_angles[s] = a
-        
-        # Attente et lecture de la réponse
-        time.sleep(0.1)
-        responses = []
-        while self.serial.in_waiting:
-            response = self.serial.readline().decode('utf-8').strip()
-            responses.append(response)
+            if not (0 <= s <= 3):
+                return False, f"Le numéro de servo {s} doit être entre 0 et 3"
+            if not (0 <= a <= 180):
+                return False, f"L'angle {a} doit être entre 0 et 180 degrés"
+        if self.binary:
+            return True, PreparedFrame(tuple(servo_num), tuple(angle), None, 1)
+        command = (";".join([f"{s},{a}" for s, a in zip(servo_num, angle)]) + "\n").encode('utf-8')
+        return True, PreparedFrame(tuple(servo_num), tuple(angle), command, min(len(set(servo_num)), 4))
+    
+    def send_frame(self, frame, wait=False, timeout=None):
+        """
+        Envoie une trame préparée par prepare_frame, sans la revalider ni la réencoder
+        
+        La trame part toujours, même si l'Arduino a déjà confirmé ses angles :
+        une séquence rejouée reste identique d'une fois sur l'autre.
+        
+        Args:
+            frame (PreparedFrame): Trame préparée
+            wait (bool): Avec le thread de lecture, attendre la réponse de l'Arduino
+            timeout (float): Délai d'attente de la réponse (reply_timeout par défaut)
+            
+        Returns:
+            tuple: (bool, list ou Future) - Comme set_servo_angle
+        """
+        if not self.connected:
+            return False, "Non connecté à l'Arduino"
+        if frame.data is None or self.window:
+            # Numéro de séquence propre à chaque envoi : encodage au moment de l'envoi
+            return self.set_servo_angle(list(frame.servos), list(frame.angles), multi_servo=True,
+                                        wait=wait, timeout=timeout, force=True)
+        with self.lock:
+            if self.safety:
+                safe, reason = self.safety.check_targets(frame.servos, frame.angles, self.state.commanded)
+                if not safe:
+                    return False, reason
+            self.state.command(frame.servos, frame.angles)
+            if not self.reader:
+                return self._send_blocking(frame.data, frame.expected)
+            success, future = self._send_async(frame.data, frame.expected, False, timeout)
+        if wait:
+            return self._wait_reply(future, timeout)
+        return success, future
+    
+    def _send_blocking(self, command, expected):
+        """
+        Envoie une commande et lit ses réponses sur place (sans thread de lecture)
+        """
+        # Envoi de la commande à l'Arduino
+        started = time.monotonic()
+        self.serial.write(command)
+        
+        if self.binary:
+            responses = self._read_binary_replies(expected)
+        else:
+            # Attente et lecture de la réponse
+            self._sleep(0.1)
+            responses = []
+            while self.serial.in_waiting:
+                response = self.serial.readline().decode('utf-8', errors='replace').strip()
+                responses.append(response)
+        
+        for response in responses:
+            self._observe(response)
+        if self.metrics:
+            self._record_reply(started, responses)
             
         return True, responses
     
+    def _observe(self, message):
+        """
+        Reporte une réponse de l'Arduino dans le miroir d'état et dans la fenêtre
+        
+        Returns:
+            bool: True si le message était l'accusé d'une commande de la fenêtre,
+                  ou s'il a été consommé par un listener
+        """
+        consumed = False
+        for listener in self.listeners:
+            consumed = listener(message) or consumed
+        if consumed:
+            return True
+        if isinstance(message, binary_protocol.Reply):
+            accepted, seq = message.ack, message.seq
+        else:
+            ack = parse_ack(message)
+            if ack is None:
+                if not self.state.observe(message) and self.metrics:
+                    self.metrics.count('reply_parse_failures')
+                return False
+            accepted, seq = ack
+        
+        if accepted:
+            self.state.acknowledge_frame(seq)
+        if self.window:
+            # Un refus laisse la trame en attente : elle sera retransmise
+            return self.window.acknowledge(seq, accepted, message)
+        if not accepted:
+            self.state.acknowledge_frame(seq, accepted=False)
+        return False
+    
+    def _encode_numbered(self, seq, targets):
+        """
+        Encode une commande numérotée pour la fenêtre glissante
+        """
+        servos = sorted(targets)
+        angles = [targets[s] for s in servos]
+        if self.binary:
+            return binary_protocol.encode_angles(servos, angles, seq)
+        # Préfixe "@<seq> " : arduino.ino répond "OK <seq>" au lieu des confirmations par servo
+        return (f"@{seq} " + ";".join(f"{s},{a}" for s, a in zip(servos, angles)) + "\n").encode('utf-8')
+    
+    def _is_current(self, servo, angle):
+        """
+        Indique si l'angle est toujours la dernière consigne du servo (retransmission)
+        """
+        return self.state.commanded[servo] == angle
+    
+    def _send_windowed(self, servo_num, angle, wait, timeout):
+        """
+        Envoie une commande numérotée dans la fenêtre glissante
+        """
+        seq = self._next_sequence()
+        # Noté avant l'écriture : l'accusé peut arriver avant le retour de submit
+        previous = self.state.command(servo_num, angle, seq)
+        try:
+            future = self.window.submit(seq, dict(zip(servo_num, angle)),
+                                        timeout if timeout is not None else self.reply_timeout)
+        except ValueError as e:
+            self.state.withdraw(previous, seq)
+            return False, str(e)
+        if future is None:
+            # Rien n'est parti : le miroir ne doit pas croire le servo déjà commandé
+            self.state.withdraw(previous, seq)
+            return False, "Fenêtre de commandes pleine"
+        if self.metrics:
+            self._track_reply(future)
+        if not wait:
+            return True, future
+        return self._wait_reply(future, timeout)
+    
+    def _next_sequence(self):
+        """
+        Renvoie le numéro de séquence de la prochaine trame binaire (0-255)
+        """
+        seq = self.sequence
+        # Un numéro encore en vol (commande retransmise pendant que 255 autres
+        # aboutissaient) est sauté : la fenêtre en garde moins de 128, il en reste toujours un libre
+        while self.window and seq in self.window.in_flight:
+            seq = (seq + 1) & 0xFF
+        self.sequence = (seq + 1) & 0xFF
+        return seq
+    
+    def _read_binary_replies(self, expected):
+        """
+        Lit les accusés binaires sans pause fixe (mode bloquant)
+        """
+        splitter = binary_protocol.ReplySplitter()
+        replies = []
+        deadline = time.monotonic() + self.reply_timeout
+        while len(replies) < expected and time.monotonic() < deadline:
+            data = self.serial.read(self.serial.in_waiting or 1)
+            replies.extend(m for m in splitter.feed(data) if isinstance(m, binary_protocol.Reply))
+        return replies
+    
+    def _send_async(self, command, expected, wait, timeout):
+        """
+        Envoie une commande sans attendre : la réponse arrive par le thread de lecture
+        """
+        future = self.reader.expect(expected, self.reply_timeout)
+        if self.metrics:
+            self._track_reply(future)
+        self.serial.write(command)
+        
+        if not wait:
+            return True, future
+        return self._wait_reply(future, timeout)
+    
+    def _wait_reply(self, future, timeout):
+        """
+        Attend la réponse d'une commande envoyée par le thread de lecture
+        """
+        started = time.monotonic()
+        try:
+            return True, future.result(timeout if timeout is not None else self.reply_timeout)
+        except FutureTimeoutError:
+            return False, "Pas de réponse de l'Arduino"
+        finally:
+            if self.metrics:
+                self.metrics.count('reply_wait_seconds', time.monotonic() - started)
+    
+    def _sleep(self, seconds):
+        """
+        Pause, comptée dans les mesures si elles sont activées
+        """
+        if self.metrics:
+            self.metrics.sleep(seconds)
+        else:
+            time.sleep(seconds)
+    
+    def _record_reply(self, started, responses):
+        """
+        Note une commande envoyée et le délai de sa réponse (absence de réponse : délai dépassé)
+        """
+        self.metrics.count('commands_sent')
+        if responses:
+            self.metrics.observe('round_trip_seconds', time.monotonic() - started)
+        else:
+            self.metrics.count('reply_timeouts')
+    
+    def _track_reply(self, future):
+        """
+        Mesure le délai de réponse d'une commande asynchrone à la résolution de sa Future
+        """
+        started = time.monotonic()
+        future.add_done_callback(lambda done: self._record_reply(started, done.result()))
+    
+    def _register_gauges(self):
+        """
+        Déclare les mesures lues à la demande (files d'attente, fenêtre, vitesse)
+
+        Étiquetées par port : les cartes d'un ControllerPool partagent le même Metrics.
+        Appelé à la connexion, une fois le port 'auto' résolu par open_board.
+        """
+        board = {'board': self.port}
+        if self.gauge_labels is not None and self.gauge_labels != board:
+            # Reconnexion sur un autre port : les jauges de l'ancien disparaissent
+            self.metrics.remove_gauges(self.gauge_labels)
+        self.gauge_labels = board
+        gauge = self.metrics.gauge
+        gauge('window_in_flight', lambda: self.window.pending() if self.window else 0, labels=board)
+        gauge('replies_pending', lambda: len(self.reader.pending) if self.reader else 0, labels=board)
+        gauge('messages_queued', lambda: self.reader.messages.qsize() if self.reader else 0, labels=board)
+        gauge('servos_unconfirmed', self.state.in_flight, labels=board)
+        gauge('link_baud', lambda: self.negotiated_baud or 0, labels=board)
+        gauge('retransmissions', lambda: self.window.retransmissions if self.window else 0, 'counter', board)
+        gauge('window_failures', lambda: self.window.failures if self.window else 0, 'counter', board)
+    
+    def start_scheduler(self, rate_hz=50, commands=None):
+        """
+        Démarre l'ordonnanceur d'écriture « dernier gagnant »
+        
+        Args:
+            rate_hz (float): Fréquence d'envoi des trames combinées (Hz)
+            commands (CommandQueue): Si donnée, les trames passent par sa voie normale
+                                     (voir command_queue.py)
+        """
+        if self.scheduler is None:
+            self.scheduler = WriteScheduler(self, rate_hz, commands)
+            self.scheduler.start()
+        return self.scheduler
+    
+    def stop_scheduler(self):
+        """
+        Arrête l'ordonnanceur en envoyant les dernières consignes
+        """
+        if self.scheduler:
+            self.scheduler.stop()
+            self.scheduler = None
+    
+    def discard_queued(self):
+        """
+        Oublie les consignes de l'ordonnanceur pas encore envoyées (avant une commande prioritaire)
+        """
+        if self.scheduler:
+            self.scheduler.discard()
+    
+    def queue_servo_angle(self, servo_num, angle):
+        """
+        Confie une consigne à l'ordonnanceur : seule la plus récente par servo est envoyée
+        
+        Args:
+            servo_num (int or list): Numéro du servomoteur ou liste de numéros
+            angle (int or list): Angle désiré ou liste d'angles
+            
+        Returns:
+            tuple: (bool, str) - Succès et message associé
+        """
+        if not self.connected:
+            return False, "Non connecté à l'Arduino"
+        if self.scheduler is None:
+            return False, "Ordonnanceur non démarré"
+        if not isinstance(servo_num, list):
+            servo_num = [servo_num]
+        if not isinstance(angle, list):
+            angle = [angle]
+        for s, a in zip(servo_num, angle):
+            if not (0 <= s <= 3):
+                return False, f"Le numéro de servo {s} doit être entre 0 et 3"
+            if not (0 <= a <= 180):
+                return False, f"L'angle {a} doit être entre 0 et 180 degrés"
+        if self.safety:
+            safe, reason = self.safety.check_targets(servo_num, angle, self.state.commanded)
+            if not safe:
+                return False, reason
+        for s, a in zip(servo_num, angle):
+            self.scheduler.set_target(s, a)
+        return True, "Consigne en attente"
+    
+    def get_message(self, timeout=None):
+        """
+        Renvoie le prochain message non sollicité de l'Arduino (thread de lecture)
+        
+        Args:
+            timeout (float): Délai d'attente, None pour ne pas attendre
+            
+        Returns:
+            str or None: Message reçu, ou None si aucun
+        """
+        if not self.reader:
+            return None
+        try:
+            return self.reader.messages.get(timeout=timeout) if timeout else self.reader.messages.get_nowait()
+        except queue.Empty:
+            return None
+    
     def is_connected(self):
         """
         Vérifie si la connexion est active
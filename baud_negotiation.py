@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Négociation automatique de la vitesse de la liaison série
+
+La connexion s'ouvre à une vitesse sûre (9600 bauds). L'hôte propose ensuite
+les vitesses candidates de la plus rapide à la plus lente ; l'Arduino accepte
+ou refuse, bascule, puis l'hôte vérifie la liaison avec un motif de test.
+Si la vérification échoue, l'Arduino revient de lui-même à 9600 bauds après
+une période d'essai (BAUD_PROBATION) et l'hôte essaie la vitesse suivante.
+
+Protocole texte (arduino.ino, new_arduino.ino) :
+    "BAUD <vitesse>"  ->  "BAUD OK <vitesse>" ou "BAUD NON"
+    "PING <motif>"    ->  "PONG <motif>"   (confirme la nouvelle vitesse)
+
+Protocole binaire (binary_arduino.ino) : trames CMD_SET_BAUD et CMD_PING,
+voir binary_protocol.py.
+"""
+import time
+
+import binary_protocol
+from serial_reader import LineSplitter
+
+SAFE_BAUD = 9600
+DEFAULT_CANDIDATES = (500000, 250000, 115200)
+
+# Délai avant lequel l'Arduino doit recevoir un PING valide à la nouvelle vitesse
+BAUD_PROBATION = 1.0
+# Temps laissé à l'Arduino pour vider son tampon et changer de vitesse
+SWITCH_DELAY = 0.05
+# Délai d'attente d'une réponse pendant la négociation
+REPLY_TIMEOUT = 0.5
+
+# Motif de test : bits alternés, valeurs extrêmes imprimables et chiffres
+TEST_PATTERN = "U*U*~~  0123456789ABCDEF"
+
+
+def _read_until(ser, splitter, predicate, timeout):
+    """
+    Lit le port jusqu'à obtenir un message accepté par predicate
+
+    Returns:
+        Le message trouvé, ou None si le délai est dépassé
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        data = ser.read(ser.in_waiting or 1)
+        if not data:
+            continue
+        for message in splitter.feed(data):
+            if predicate(message):
+                return message
+    return None
+
+
+def _send_ascii(ser, rate):
+    ser.write(f"BAUD {rate}\n".encode('utf-8'))
+
+
+def _request_ascii(ser, rate):
+    _send_ascii(ser, rate)
+    reply = _read_until(ser, LineSplitter(), lambda m: m.startswith("BAUD "), REPLY_TIMEOUT)
+    if reply is None:
+        return None
+    return reply == f"BAUD OK {rate}"
+
+
+def _verify_ascii(ser, pings):
+    for _ in range(pings):
+        ser.write(f"PING {TEST_PATTERN}\n".encode('utf-8'))
+        reply = _read_until(ser, LineSplitter(), lambda m: m.startswith("PONG"), REPLY_TIMEOUT)
+        if reply != f"PONG {TEST_PATTERN}":
+            return False
+    return True
+
+
+def _is_reply(message):
+    return isinstance(message, binary_protocol.Reply)
+
+
+def _send_binary(ser, rate):
+    ser.write(binary_protocol.encode_set_baud(binary_protocol.BAUD_CODES[rate], seq=0))
+
+
+def _request_binary(ser, rate):
+    if rate not in binary_protocol.BAUD_CODES:
+        return False
+    _send_binary(ser, rate)
+    reply = _read_until(ser, binary_protocol.ReplySplitter(), _is_reply, REPLY_TIMEOUT)
+    if reply is None:
+        return None
+    return reply.ack and reply.seq == 0
+
+
+def _verify_binary(ser, pings):
+    pattern = TEST_PATTERN.encode('ascii') + bytes((0x00, 0xFF, 0x55, 0xAA))
+    for seq in range(1, pings + 1):
+        ser.write(binary_protocol.encode_ping(pattern, seq))
+        reply = _read_until(ser, binary_protocol.ReplySplitter(), _is_reply, REPLY_TIMEOUT)
+        if reply is None or not reply.ack or reply.seq != seq:
+            return False
+    return True
+
+
+def negotiate_baud_rate(ser, candidates=DEFAULT_CANDIDATES, binary=False, pings=4):
+    """
+    Négocie la vitesse la plus élevée supportée par l'hôte et l'Arduino
+
+    Args:
+        ser (serial.Serial): Port ouvert à la vitesse sûre, Arduino prêt
+        candidates (tuple): Vitesses à essayer (bauds)
+        binary (bool): True si l'Arduino utilise le protocole binaire
+        pings (int): Nombre d'échanges de test à la nouvelle vitesse
+
+    Returns:
+        int: Vitesse retenue (la vitesse initiale si aucune n'a pu être validée)
+    """
+    safe = ser.baudrate
+    request = _request_binary if binary else _request_ascii
+    verify = _verify_binary if binary else _verify_ascii
+    send = _send_binary if binary else _send_ascii
+    timeout = ser.timeout
+    ser.timeout = 0.05
+    try:
+        return _negotiate(ser, candidates, safe, request, verify, send, pings)
+    finally:
+        ser.timeout = timeout
+
+
+def _negotiate(ser, candidates, safe, request, verify, send, pings):
+    for rate in sorted(candidates, reverse=True):
+        if rate <= safe:
+            break
+        ser.reset_input_buffer()
+        accepted = request(ser, rate)
+        if accepted is None:
+            # Aucune réponse : le firmware ne connaît pas la négociation
+            break
+        if not accepted:
+            continue
+
+        try:
+            ser.baudrate = rate
+        except (ValueError, OSError):
+            # Vitesse refusée par le pilote : l'Arduino reviendra seul à la vitesse sûre
+            time.sleep(BAUD_PROBATION)
+            continue
+        time.sleep(SWITCH_DELAY)
+        ser.reset_input_buffer()
+        if verify(ser, pings):
+            return rate
+
+        # Liaison non fiable : retour à la vitesse sûre après la période d'essai.
+        # Si un PING est passé mais que sa réponse s'est perdue, l'Arduino a quitté
+        # la période d'essai : on lui demande explicitement de revenir à la vitesse sûre.
+        send(ser, safe)
+        time.sleep(SWITCH_DELAY)
+        ser.baudrate = safe
+        time.sleep(BAUD_PROBATION)
+        ser.reset_input_buffer()
+
+    return safe
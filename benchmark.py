@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+Banc de mesure de la chaîne de commande des servos
+
+Chaque scénario pilote un Arduino virtuel (virtual_arduino.py, lancé dans un
+processus séparé pour que son temps CPU ne soit pas compté) ou un port réel
+(--port), puis mesure :
+    - commandes par seconde et octets par seconde ;
+    - latence de l'appel jusqu'à l'accusé de réception (p50, p99, max) ;
+    - latence jusqu'à l'écriture du servo dans l'émulateur (« actionnement ») ;
+    - temps CPU du processus hôte par commande.
+
+Les résultats sont écrits en JSON et peuvent être comparés à une référence :
+
+    python benchmark.py --output resultats.json
+    python benchmark.py --baseline reference.json   # code de sortie 1 si régression
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import platform
+import sys
+import time
+from collections import defaultdict, deque
+
+from arduino_servo_controller import ArduinoServoController
+from playback import DeadlinePlayer, controller_sender
+
+DEFAULT_TOLERANCE = 0.10
+
+# Métriques comparées à la référence : (chemin, True si une valeur plus grande est meilleure)
+COMPARED_METRICS = (
+    (('commands_per_s',), True),
+    (('latency_ms', 'p50'), False),
+    (('latency_ms', 'p99'), False),
+    (('cpu_us_per_command',), False),
+)
+
+
+def _serve_board(conn, firmware, options):
+    """
+    Processus de l'émulateur : répond aux demandes du banc par le tube conn
+    """
+    from virtual_arduino import VirtualArduino
+
+    board = VirtualArduino(firmware, **options)
+    events = []
+    board.add_listener(lambda servo, angle, t: events.append((servo, angle, t)))
+    conn.send(board.start())
+    while True:
+        request = conn.recv()
+        if request == 'events':
+            batch = events[:]
+            del events[:len(batch)]
+            conn.send(batch)
+        elif request == 'stats':
+            conn.send(board.stats())
+        else:
+            board.stop()
+            conn.send(board.stats())
+            return
+
+
+class EmulatedBoard:
+    """
+    Arduino virtuel exécuté dans un processus fils
+
+    Les instants des écritures de servo sont pris sur time.monotonic(), commune
+    à tous les processus sous Linux : ils se comparent directement aux instants
+    mesurés par le banc.
+    """
+
+    def __init__(self, firmware, **options):
+        self.firmware = firmware
+        self.options = options
+        self.conn = None
+        self.process = None
+        self.port = None
+
+    def __enter__(self):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve_board, args=(child, self.firmware, self.options),
+                                               daemon=True)
+        self.process.start()
+        self.port = self.conn.recv()
+        return self
+
+    def __exit__(self, *exc):
+        self.conn.send('stop')
+        self.conn.recv()
+        self.process.join()
+
+    def events(self):
+        """
+        Écritures de servo depuis le dernier appel : [(servo, angle, instant)]
+        """
+        self.conn.send('events')
+        return self.conn.recv()
+
+    def stats(self):
+        self.conn.send('stats')
+        return self.conn.recv()
+
+
+class CommandTimings:
+    """
+    Instants d'envoi et d'accusé de chaque commande d'un scénario
+    """
+
+    def __init__(self, baseline=None):
+        """
+        Args:
+            baseline (callable): Appelé juste avant la première commande, connexion
+                                 terminée (ex. compteurs d'octets de l'émulateur)
+        """
+        self.baseline = baseline
+        self.before = None  # Valeur de baseline() au début des mesures
+        self.samples = []  # [début, fin ou None, {servo: angle}]
+        self.failures = 0
+        # Temps CPU du processus, de la première commande à la dernière réponse (connexion exclue)
+        self.cpu_start = None
+        self.cpu_end = None
+
+    def start(self, targets):
+        """
+        Note l'envoi d'une commande
+
+        Returns:
+            list: Échantillon à compléter avec finish()
+        """
+        if self.cpu_start is None:
+            if self.baseline:
+                self.before = self.baseline()
+            self.cpu_start = time.process_time()
+        sample = [time.monotonic(), None, dict(targets)]
+        self.samples.append(sample)
+        return sample
+
+    def finish(self, sample, success=True):
+        sample[1] = time.monotonic()
+        self.cpu_end = time.process_time()
+        if not success:
+            self.failures += 1
+
+    def finish_when_done(self, sample, success, responses):
+        """
+        Termine l'échantillon à l'arrivée de l'accusé si la réponse est une Future
+        """
+        if success and hasattr(responses, 'add_done_callback'):
+            responses.add_done_callback(lambda future: self.finish(sample, bool(future.result())))
+        else:
+            self.finish(sample, success)
+
+    def cpu_per_command(self):
+        if self.cpu_start is None or self.cpu_end is None:
+            return None
+        return (self.cpu_end - self.cpu_start) / len(self.samples)
+
+    def latencies(self):
+        return [end - start for start, end, _ in self.samples if end is not None]
+
+    def actuation_latencies(self, events, inverted=()):
+        """
+        Associe chaque commande à la première écriture du servo correspondante
+
+        Args:
+            events (list): Écritures de l'émulateur [(servo, angle, instant)]
+            inverted (tuple): Servos dont le croquis inverse l'angle (180 - angle)
+
+        Returns:
+            list: Délais entre l'envoi et l'écriture du dernier servo de la commande
+        """
+        per_servo = defaultdict(deque)
+        for servo, angle, t in events:
+            per_servo[servo].append((angle, t))
+        latencies = []
+        for start, _, targets in self.samples:
+            actuated = []
+            for servo, angle in targets.items():
+                expected = abs(angle - 180) if servo in inverted else angle
+                writes = per_servo[servo]
+                while writes and (writes[0][1] < start or writes[0][0] != expected):
+                    writes.popleft()
+                if writes:
+                    actuated.append(writes.popleft()[1])
+            if actuated and len(actuated) == len(targets):
+                latencies.append(max(actuated) - start)
+        return latencies
+
+
+def percentile(sorted_values, q):
+    """
+    Percentile par rang le plus proche d'une liste triée
+    """
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize_latencies(values):
+    """
+    Returns:
+        dict or None: p50, p99, max et moyenne en millisecondes
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        'p50': percentile(values, 50) * 1e3,
+        'p99': percentile(values, 99) * 1e3,
+        'max': values[-1] * 1e3,
+        'mean': sum(values) / len(values) * 1e3,
+    }
+
+
+def _angle(i):
+    # Angles successifs toujours différents (le contrôleur ignore les consignes déjà appliquées)
+    return 10 + (i * 37) % 161
+
+
+# ===== SCÉNARIOS =====
+# Chaque scénario reçoit le CommandTimings à remplir, le port, le nombre de
+# commandes et les options de connexion ; il renvoie le CommandTimings une
+# fois l'envoi terminé.
+
+def _connected_controller(port, auto_baud, **options):
+    controller = ArduinoServoController(port, auto_baud=auto_baud, **options)
+    success, messages = controller.connect()
+    if not success:
+        raise RuntimeError(f"Connexion impossible: {messages}")
+    return controller
+
+
+def _run_controller(timings, controller, count, servos):
+    for i in range(count):
+        angles = [_angle(i + k) for k in range(len(servos))]
+        sample = timings.start(dict(zip(servos, angles)))
+        success, _ = controller.set_servo_angle(list(servos), angles, multi_servo=len(servos) > 1, wait=True)
+        timings.finish(sample, success)
+    return timings
+
+
+def scenario_controller_single(timings, port, count, auto_baud):
+    """set_servo_angle d'un servo, mode historique (pause de 0,1 s puis lecture)"""
+    controller = _connected_controller(port, auto_baud)
+    try:
+        return _run_controller(timings, controller, count, (0,))
+    finally:
+        controller.disconnect()
+
+
+def scenario_controller_multi(timings, port, count, auto_baud):
+    """set_servo_angle multi_servo des 4 servos, mode historique"""
+    controller = _connected_controller(port, auto_baud)
+    try:
+        return _run_controller(timings, controller, count, (0, 1, 2, 3))
+    finally:
+        controller.disconnect()
+
+
+def scenario_controller_reader(timings, port, count, auto_baud):
+    """set_servo_angle d'un servo avec le thread de lecture (attente de la confirmation)"""
+    controller = _connected_controller(port, auto_baud, reader_thread=True)
+    try:
+        return _run_controller(timings, controller, count, (0,))
+    finally:
+        controller.disconnect()
+
+
+def scenario_controller_multi_reader(timings, port, count, auto_baud):
+    """set_servo_angle multi_servo des 4 servos avec le thread de lecture"""
+    controller = _connected_controller(port, auto_baud, reader_thread=True)
+    try:
+        return _run_controller(timings, controller, count, (0, 1, 2, 3))
+    finally:
+        controller.disconnect()
+
+
+def scenario_controller_window(timings, port, count, auto_baud):
+    """Commandes numérotées en fenêtre glissante (8 en vol), sans attente entre envois"""
+    controller = _connected_controller(port, auto_baud, window_size=8)
+    try:
+        futures = []
+        for i in range(count):
+            sample = timings.start({0: _angle(i)})
+            success, future = controller.set_servo_angle(0, _angle(i))
+            timings.finish_when_done(sample, success, future)
+            if success:
+                futures.append(future)
+        for future in futures:
+            future.result(timeout=5)
+        return timings
+    finally:
+        controller.disconnect()
+
+
+def scenario_controller_binary(timings, port, count, auto_baud):
+    """Protocole binaire, 4 servos par trame, thread de lecture"""
+    controller = _connected_controller(port, auto_baud, binary=True, reader_thread=True)
+    try:
+        return _run_controller(timings, controller, count, (0, 1, 2, 3))
+    finally:
+        controller.disconnect()
+
+
+def scenario_new_main(timings, port, count, auto_baud):
+    """new_main.move_servos (pause de 0,5 s après chaque envoi)"""
+    import new_main
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if new_main.connect_arduino(port, auto_baud=auto_baud) is None:
+            raise RuntimeError(f"Connexion impossible: {port}")
+        try:
+            for i in range(count):
+                targets = {0: _angle(i), 1: _angle(i + 1)}
+                sample = timings.start(targets)
+                new_main.move_servos(targets)
+                timings.finish(sample)
+        finally:
+            new_main.ser.close()
+    return timings
+
+
+COMMAND_LINES = ("a(0, 90)", "a(1, 45, 2, 135)", "a(0, 0, 1, 180, 2, 90, 3, 45)", "a(3,12)")
+
+
+def scenario_interpreter_parse(timings, port, count, auto_baud):
+    """Analyse des commandes du mode interpréteur seule (sans liaison série)"""
+    from main import parse_command
+
+    for i in range(count):
+        line = COMMAND_LINES[i % len(COMMAND_LINES)]
+        sample = timings.start({})
+        timings.finish(sample, parse_command(line, ArduinoServoController.NUM_SERVOS) is not None)
+    return timings
+
+
+def scenario_interpreter(timings, port, count, auto_baud):
+    """Chemin complet du mode interpréteur : analyse puis envoi avec attente des confirmations"""
+    from main import parse_command
+
+    controller = _connected_controller(port, auto_baud, reader_thread=True)
+    try:
+        for i in range(count):
+            line = f"a(0, {_angle(i)}, 1, {_angle(i + 1)})"
+            sample = timings.start({0: _angle(i), 1: _angle(i + 1)})
+            servos, angles = parse_command(line, controller.num_servos)
+            success, _ = controller.set_servo_angle(servos, angles, multi_servo=True, wait=True)
+            timings.finish(sample, success)
+        return timings
+    finally:
+        controller.disconnect()
+
+
+def scenario_playback(timings, port, count, auto_baud, rate_hz=50):
+    """Lecture d'une séquence à 50 Hz par DeadlinePlayer (4 servos par trame)"""
+    controller = _connected_controller(port, auto_baud, reader_thread=True)
+    send = controller_sender(controller)
+
+    futures = []
+
+    def timed_send(targets):
+        sample = timings.start(targets)
+        success, responses = send(targets)
+        # Avec le thread de lecture, l'envoi rend une Future : la latence court jusqu'à l'accusé
+        timings.finish_when_done(sample, success, responses)
+        if hasattr(responses, 'result'):
+            futures.append(responses)
+        return success, responses
+
+    frames = ((i / rate_hz, {servo: _angle(i + servo) for servo in range(4)}) for i in range(count))
+    try:
+        DeadlinePlayer(timed_send).play(frames)
+        for future in futures:
+            future.result(timeout=5)
+        return timings
+    finally:
+        controller.disconnect()
+
+
+# Nom -> (fonction, croquis émulé ou None, nombre de commandes par défaut, servos inversés par le croquis)
+SCENARIOS = {
+    'controller_single': (scenario_controller_single, 'servo', 50, ()),
+    'controller_multi': (scenario_controller_multi, 'servo', 50, ()),
+    'controller_reader': (scenario_controller_reader, 'servo', 500, ()),
+    'controller_multi_reader': (scenario_controller_multi_reader, 'servo', 500, ()),
+    'controller_window': (scenario_controller_window, 'servo', 2000, ()),
+    'controller_binary': (scenario_controller_binary, 'binary', 500, ()),
+    'new_main_move_servos': (scenario_new_main, 'flat', 10, (2, 3)),
+    'interpreter_parse': (scenario_interpreter_parse, None, 100000, ()),
+    'interpreter': (scenario_interpreter, 'servo', 500, ()),
+    'playback': (scenario_playback, 'servo', 250, ()),
+}
+
+
+def run_scenario(name, count=None, port=None, auto_baud=True):
+    """
+    Exécute un scénario et calcule ses métriques
+
+    Args:
+        name (str): Nom du scénario (clé de SCENARIOS)
+        count (int): Nombre de commandes, None pour la valeur par défaut du scénario
+        port (str): Port réel à utiliser ; None pour un Arduino virtuel
+        auto_baud (bool): Négocier la vitesse de la liaison à la connexion
+
+    Returns:
+        dict: Métriques du scénario
+    """
+    function, firmware, default_count, inverted = SCENARIOS[name]
+    count = count or default_count
+    board = None
+    with contextlib.ExitStack() as stack:
+        if firmware is not None and port is None:
+            board = stack.enter_context(EmulatedBoard(firmware))
+        target = board.port if board else port
+        timings = CommandTimings(baseline=board.stats if board else None)
+        timings = function(timings, target, count, auto_baud)
+        before = timings.before
+        after = board.stats() if board else None
+        events = board.events() if board else []
+
+    samples = timings.samples
+    duration = (max(end or start for start, end, _ in samples) - samples[0][0]) if samples else 0.0
+    result = {
+        'commands': len(samples),
+        'failures': timings.failures,
+        'duration_s': duration,
+        'commands_per_s': len(samples) / duration if duration > 0 else None,
+        'latency_ms': summarize_latencies(timings.latencies()),
+        'actuation_ms': summarize_latencies(timings.actuation_latencies(events, inverted)) if board else None,
+        'cpu_us_per_command': timings.cpu_per_command() * 1e6 if timings.cpu_per_command() is not None else None,
+        'bytes_written': None,
+        'bytes_read': None,
+        'bytes_per_s': None,
+    }
+    if before is not None:
+        # Compteurs relevés après la connexion (bannière, négociation) : seuls les octets des commandes comptent
+        written = after['rx_bytes'] - before['rx_bytes']
+        read = after['tx_bytes'] - before['tx_bytes']
+        result.update(bytes_written=written, bytes_read=read,
+                      bytes_per_s=(written + read) / duration if duration > 0 else None,
+                      baud=after['baud'])
+    return result
+
+
+def _metric(result, path):
+    for key in path:
+        if result is None:
+            return None
+        result = result.get(key)
+    return result
+
+
+def compare_results(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare des résultats à une référence
+
+    Args:
+        results (dict): Résultats courants (format de run_benchmarks)
+        baseline (dict): Résultats de référence
+        tolerance (float): Dégradation relative admise (0.10 = 10 %)
+
+    Returns:
+        list: Descriptions des régressions (vide si aucune)
+    """
+    regressions = []
+    for name, current in results['scenarios'].items():
+        reference = baseline.get('scenarios', {}).get(name)
+        if reference is None:
+            continue
+        for path, higher_is_better in COMPARED_METRICS:
+            value, ref = _metric(current, path), _metric(reference, path)
+            if value is None or not ref:
+                continue
+            change = (value - ref) / ref
+            if (change < -tolerance) if higher_is_better else (change > tolerance):
+                regressions.append(f"{name}: {'.'.join(path)} {ref:.3f} -> {value:.3f} ({change:+.1%})")
+    return regressions
+
+
+def run_benchmarks(names, count=None, port=None, auto_baud=True, log=print):
+    """
+    Exécute plusieurs scénarios
+
+    Returns:
+        dict: {'meta': {...}, 'scenarios': {nom: métriques}}
+    """
+    results = {
+        'meta': {
+            'date': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'port': port or 'virtual',
+            'auto_baud': auto_baud,
+        },
+        'scenarios': {},
+    }
+    for name in names:
+        log(f"{name}...")
+        result = run_scenario(name, count, port, auto_baud)
+        results['scenarios'][name] = result
+        log(format_result(result))
+    return results
+
+
+def format_result(result):
+    def ms(summary, key):
+        return f"{summary[key]:.2f}" if summary else "-"
+
+    rate = result['commands_per_s']
+    line = (f"  {result['commands']} commandes, {rate:.1f} cmd/s" if rate else f"  {result['commands']} commandes")
+    line += f", latence p50 {ms(result['latency_ms'], 'p50')} ms p99 {ms(result['latency_ms'], 'p99')} ms"
+    if result['actuation_ms']:
+        line += f", actionnement p50 {ms(result['actuation_ms'], 'p50')} ms"
+    if result['bytes_per_s'] is not None:
+        line += f", {result['bytes_per_s']:.0f} o/s"
+    line += f", CPU {result['cpu_us_per_command']:.1f} µs/cmd"
+    if result['failures']:
+        line += f", {result['failures']} échecs"
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de mesure de la liaison série des servos")
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO',
+                        help=f"Scénarios à exécuter (par défaut tous : {', '.join(SCENARIOS)})")
+    parser.add_argument('--count', type=int, help="Nombre de commandes par scénario")
+    parser.add_argument('--port', help="Port réel ou bouclé à utiliser à la place de l'Arduino virtuel")
+    parser.add_argument('--no-auto-baud', action='store_true', help="Rester à 9600 bauds")
+    parser.add_argument('--output', default='benchmark-results.json', help="Fichier de résultats JSON")
+    parser.add_argument('--baseline', help="Résultats de référence à comparer")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Dégradation relative admise avant de signaler une régression")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Scénario(s) inconnu(s): {', '.join(unknown)}")
+
+    results = run_benchmarks(args.scenarios or list(SCENARIOS), args.count, args.port, not args.no_auto_baud)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Résultats écrits dans {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print("Régressions par rapport à la référence:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("Aucune régression par rapport à la référence")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+// Protocole binaire : SYNC | type | seq | masque | données | CRC-8
+// Réponse : ACK (0x06) ou NACK (0x15) suivi du numéro de séquence
+// (voir binary_protocol.py pour le détail du format)
+
+#include <Servo.h>
+
+const byte SYNC = 0xA5;
+const byte CMD_SET_ANGLES = 0x01;
+const byte CMD_SET_MICROS = 0x02;
+const byte CMD_SET_BAUD = 0x10;
+const byte CMD_PING = 0x11;
+const byte ACK = 0x06;
+const byte NACK = 0x15;
+
+// Créer un tableau d'objets Servo
+Servo servos[4];
+
+// Broches des servomoteurs
+const int SERVO_PINS[4] = {3, 5, 6, 9};
+
+// Vitesses indexées par les codes de CMD_SET_BAUD (BAUD_CODES dans binary_protocol.py)
+const long SAFE_BAUD = 9600;
+const long BAUD_RATES[] = {9600, 19200, 38400, 57600, 115200, 250000, 500000};
+const byte BAUD_RATE_COUNT = sizeof(BAUD_RATES) / sizeof(BAUD_RATES[0]);
+const unsigned long BAUD_PROBATION_MS = 1000;
+bool baud_probation = false;
+unsigned long baud_switched_at = 0;
+
+// Trame en cours de réception (type, seq, masque, jusqu'à 32 octets de données, CRC)
+byte frame[36];
+byte frame_length = 0;
+byte expected_length = 0;
+bool in_frame = false;
+
+byte crc8_update(byte crc, byte data) {
+  crc ^= data;
+  for (byte i = 0; i < 8; i++) {
+    crc = (crc & 0x80) ? (byte)((crc << 1) ^ 0x07) : (byte)(crc << 1);
+  }
+  return crc;
+}
+
+byte payload_size(byte command, byte mask) {
+  if (command == CMD_SET_BAUD) return 0;
+  if (command == CMD_PING) return mask;
+  byte count = 0;
+  for (byte i = 0; i < 8; i++) {
+    if (mask & (1 << i)) count++;
+  }
+  return command == CMD_SET_MICROS ? count * 2 : count;
+}
+
+void reply(byte code, byte seq) {
+  Serial.write(code);
+  Serial.write(seq);
+}
+
+void switch_baud(long rate) {
+  Serial.flush();  // Attendre la fin de l'émission de l'accusé
+  Serial.end();
+  Serial.begin(rate);
+}
+
+void apply_frame() {
+  byte command = frame[0];
+  byte seq = frame[1];
+  byte mask = frame[2];
+
+  byte crc = 0;
+  for (byte i = 0; i < expected_length - 1; i++) {
+    crc = crc8_update(crc, frame[i]);
+  }
+  if (crc != frame[expected_length - 1]) {
+    reply(NACK, seq);
+    return;
+  }
+
+  if (command == CMD_PING) {
+    // Motif reçu intact : la vitesse courante est confirmée
+    baud_probation = false;
+    reply(ACK, seq);
+    return;
+  }
+  if (command == CMD_SET_BAUD) {
+    if (mask >= BAUD_RATE_COUNT) {
+      reply(NACK, seq);
+      return;
+    }
+    reply(ACK, seq);
+    switch_baud(BAUD_RATES[mask]);
+    baud_probation = BAUD_RATES[mask] != SAFE_BAUD;
+    baud_switched_at = millis();
+    return;
+  }
+  if (mask & 0xF0) {
+    reply(NACK, seq);
+    return;
+  }
+
+  byte offset = 3;
+  for (byte servo = 0; servo < 4; servo++) {
+    if (!(mask & (1 << servo))) continue;
+    if (command == CMD_SET_ANGLES) {
+      byte angle = frame[offset++];
+      if (angle > 180) {
+        reply(NACK, seq);
+        return;
+      }
+      servos[servo].write(angle);
+    } else {
+      int micros = frame[offset] | (frame[offset + 1] << 8);
+      offset += 2;
+      servos[servo].writeMicroseconds(constrain(micros, 500, 2500));
+    }
+  }
+  reply(ACK, seq);
+}
+
+void setup() {
+  // Initialiser la communication série
+  Serial.begin(SAFE_BAUD);
+
+  // Attacher les servos aux broches correspondantes
+  for (int i = 0; i < 4; i++) {
+    servos[i].attach(SERVO_PINS[i]);
+    // Initialiser tous les servos à la position centrale
+    servos[i].write(90);
+  }
+
+  // Message d'initialisation
+  Serial.println("Servos initialisés - Prêt à recevoir des commandes");
+}
+
+void loop() {
+  // Période d'essai écoulée sans PING valide : retour à la vitesse sûre
+  if (baud_probation && millis() - baud_switched_at >= BAUD_PROBATION_MS) {
+    baud_probation = false;
+    switch_baud(SAFE_BAUD);
+  }
+
+  // Lecture octet par octet, sans attente bloquante
+  while (Serial.available() > 0) {
+    byte data = Serial.read();
+
+    if (!in_frame) {
+      if (data == SYNC) {
+        in_frame = true;
+        frame_length = 0;
+        expected_length = 3;
+      }
+      continue;
+    }
+
+    frame[frame_length++] = data;
+
+    if (frame_length == 3) {
+      // Type et masque connus : longueur totale = en-tête + données + CRC
+      if (frame[0] != CMD_SET_ANGLES && frame[0] != CMD_SET_MICROS &&
+          frame[0] != CMD_SET_BAUD && frame[0] != CMD_PING) {
+        reply(NACK, frame[1]);
+        in_frame = false;
+        continue;
+      }
+      expected_length = 3 + payload_size(frame[0], frame[2]) + 1;
+      if (expected_length > sizeof(frame)) {
+        reply(NACK, frame[1]);
+        in_frame = false;
+        continue;
+      }
+    }
+
+    if (frame_length == expected_length) {
+      apply_frame();
+      in_frame = false;
+    }
+  }
+}
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Protocole binaire compact entre l'hôte et binary_arduino.ino
+
+Trame hôte -> Arduino :
+    SYNC | type | seq | masque | données | CRC-8
+
+    - SYNC (0xA5) marque le début de trame
+    - type : CMD_SET_ANGLES (1 octet par servo) ou CMD_SET_MICROS (2 octets par servo, little-endian)
+    - seq : numéro de séquence (0-255), renvoyé dans l'accusé
+    - masque : bit i à 1 si le servo i est présent, données dans l'ordre croissant des servos
+    - CRC-8 (polynôme 0x07) calculé sur type, seq, masque et données
+
+Commandes de contrôle (le masque porte alors un paramètre) :
+    - CMD_SET_BAUD : masque = code de vitesse (BAUD_CODES), pas de données
+    - CMD_PING : masque = longueur du motif de test, données = motif
+
+Réponse Arduino -> hôte : ACK (0x06) ou NACK (0x15) suivi du numéro de séquence.
+Les messages texte (bannière de démarrage) restent des lignes terminées par '\\n'.
+"""
+
+SYNC = 0xA5
+
+CMD_SET_ANGLES = 0x01
+CMD_SET_MICROS = 0x02
+CMD_SET_BAUD = 0x10
+CMD_PING = 0x11
+
+ACK = 0x06
+NACK = 0x15
+
+MAX_SERVOS = 8
+MAX_PING_LENGTH = 32
+
+# Vitesses connues du firmware, codées sur un octet
+BAUD_CODES = {
+    9600: 0,
+    19200: 1,
+    38400: 2,
+    57600: 3,
+    115200: 4,
+    250000: 5,
+    500000: 6,
+    1000000: 7,
+}
+
+
+def _make_crc8_table(poly=0x07):
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return bytes(table)
+
+
+CRC8_TABLE = _make_crc8_table()
+
+
+def crc8(data):
+    """
+    Calcule le CRC-8 (polynôme 0x07, valeur initiale 0) d'une suite d'octets
+    """
+    crc = 0
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def payload_size(command, mask):
+    """
+    Renvoie la taille des données d'une trame d'après son type et son masque
+    """
+    if command == CMD_SET_BAUD:
+        return 0
+    if command == CMD_PING:
+        return mask
+    count = bin(mask).count('1')
+    return count * 2 if command == CMD_SET_MICROS else count
+
+
+def encode_frame(command, seq, mask, payload=b''):
+    """
+    Assemble une trame complète (SYNC et CRC compris)
+    """
+    body = bytes((command, seq & 0xFF, mask)) + bytes(payload)
+    return bytes((SYNC,)) + body + bytes((crc8(body),))
+
+
+def _mask_and_order(servos, values):
+    pairs = {}
+    for servo, value in zip(servos, values):
+        if not (0 <= servo < MAX_SERVOS):
+            raise ValueError(f"Numéro de servo invalide: {servo}")
+        pairs[servo] = value
+    mask = 0
+    for servo in pairs:
+        mask |= 1 << servo
+    return mask, [pairs[servo] for servo in sorted(pairs)]
+
+
+def encode_angles(servos, angles, seq=0):
+    """
+    Encode une commande de positionnement en degrés
+
+    Args:
+        servos (list): Numéros des servos
+        angles (list): Angles correspondants (0-180)
+        seq (int): Numéro de séquence
+
+    Returns:
+        bytes: Trame prête à être envoyée
+    """
+    mask, ordered = _mask_and_order(servos, angles)
+    if any(not (0 <= a <= 180) for a in ordered):
+        raise ValueError("Angle hors de la plage 0-180")
+    return encode_frame(CMD_SET_ANGLES, seq, mask, bytes(int(a) for a in ordered))
+
+
+def encode_micros(servos, micros, seq=0):
+    """
+    Encode une commande de positionnement en largeur d'impulsion (µs)
+
+    Args:
+        servos (list): Numéros des servos
+        micros (list): Largeurs d'impulsion correspondantes (µs)
+        seq (int): Numéro de séquence
+
+    Returns:
+        bytes: Trame prête à être envoyée
+    """
+    mask, ordered = _mask_and_order(servos, micros)
+    payload = bytearray()
+    for value in ordered:
+        value = int(value)
+        if not (0 <= value <= 0xFFFF):
+            raise ValueError(f"Largeur d'impulsion invalide: {value}")
+        payload += bytes((value & 0xFF, value >> 8))
+    return encode_frame(CMD_SET_MICROS, seq, mask, payload)
+
+
+def encode_set_baud(code, seq=0):
+    """
+    Encode une demande de changement de vitesse (code issu de BAUD_CODES)
+    """
+    return encode_frame(CMD_SET_BAUD, seq, code)
+
+
+def encode_ping(pattern, seq=0):
+    """
+    Encode un motif de test, acquitté par l'Arduino si le CRC est correct
+    """
+    if len(pattern) > MAX_PING_LENGTH:
+        raise ValueError("Motif de test trop long")
+    return encode_frame(CMD_PING, seq, len(pattern), pattern)
+
+
+def decode_frame(frame):
+    """
+    Décode une trame complète
+
+    Args:
+        frame (bytes): Trame commençant par SYNC
+
+    Returns:
+        tuple: (type, seq, {servo: valeur}) ; pour les commandes de contrôle,
+               le troisième élément est (masque, données)
+
+    Raises:
+        ValueError: Trame tronquée, mal synchronisée ou CRC invalide
+    """
+    if len(frame) < 5 or frame[0] != SYNC:
+        raise ValueError("Trame invalide")
+    command, seq, mask = frame[1], frame[2], frame[3]
+    size = payload_size(command, mask)
+    if len(frame) != 5 + size:
+        raise ValueError("Longueur de trame incorrecte")
+    if crc8(frame[1:-1]) != frame[-1]:
+        raise ValueError("CRC invalide")
+    payload = frame[4:-1]
+    if command in (CMD_SET_BAUD, CMD_PING):
+        return command, seq, (mask, bytes(payload))
+    servos = [i for i in range(MAX_SERVOS) if mask & (1 << i)]
+    if command == CMD_SET_MICROS:
+        values = [payload[2 * i] | (payload[2 * i + 1] << 8) for i in range(len(servos))]
+    else:
+        values = list(payload)
+    return command, seq, dict(zip(servos, values))
+
+
+class Reply:
+    """
+    Accusé de réception (ACK) ou refus (NACK) renvoyé par l'Arduino
+    """
+
+    __slots__ = ('ack', 'seq')
+
+    def __init__(self, ack, seq):
+        self.ack = ack
+        self.seq = seq
+
+    def __eq__(self, other):
+        return isinstance(other, Reply) and (self.ack, self.seq) == (other.ack, other.seq)
+
+    def __repr__(self):
+        return f"Reply(ack={self.ack}, seq={self.seq})"
+
+    def __str__(self):
+        return f"{'ACK' if self.ack else 'NACK'} {self.seq}"
+
+
+def encode_reply(ack, seq):
+    """
+    Encode un accusé (utilisé par les émulateurs et les tests de liaison)
+    """
+    return bytes((ACK if ack else NACK, seq & 0xFF))
+
+
+class ReplySplitter:
+    """
+    Découpe le flux de l'Arduino en accusés binaires et en lignes de texte
+
+    S'utilise comme LineSplitter : feed(bytes) renvoie une liste de messages,
+    chacun étant soit un Reply, soit une chaîne de caractères.
+    """
+
+    def __init__(self, encoding='utf-8'):
+        self.encoding = encoding
+        self.buffer = bytearray()
+        self.text = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        messages = []
+        i = 0
+        size = len(self.buffer)
+        while i < size:
+            byte = self.buffer[i]
+            if byte in (ACK, NACK):
+                if i + 1 >= size:
+                    break
+                messages.append(Reply(byte == ACK, self.buffer[i + 1]))
+                i += 2
+            elif byte == 0x0A:
+                line = self.text.decode(self.encoding, errors='replace').strip()
+                if line:
+                    messages.append(line)
+                self.text.clear()
+                i += 1
+            else:
+                self.text.append(byte)
+                i += 1
+        del self.buffer[:i]
+        return messages
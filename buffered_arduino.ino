@@ -0,0 +1,294 @@
+// Tampon de trajectoire : consignes horodatées jouées par une interruption du Timer2
+//
+// Évolution de new_arduino.ino (même format "servo, angle, servo, angle",
+// servos 2 et 3 montés à l'envers), avec les confirmations de arduino.ino
+// pour que ArduinoServoController puisse aussi piloter la carte directement.
+//
+// Commandes (une par ligne) :
+//   servo, angle, servo, angle     positionnement immédiat ("," ou ";" comme séparateur)
+//   T <ms> servo,angle,...         consigne à jouer <ms> millisecondes après GO
+//   GO                             démarre la lecture (horloge de lecture à 0)
+//   ABORT                          vide le tampon et arrête la lecture -> "ABORTED <libérées>"
+//   BUF?                           état -> "BUF <capacité> <occupées> <libérées> <en retard>"
+//   BAUD <vitesse>, PING <motif>   négociation de vitesse (voir baud_negotiation.py)
+//
+// Crédits : chaque case libérée du tampon (consigne jouée ou abandonnée)
+// incrémente un compteur cumulé sur 16 bits, renvoyé par "C <libérées>"
+// par lots de CREDIT_BATCH, dès que le tampon est vide, ou CREDIT_DELAY_MS
+// après la première case libérée non signalée (pendant un maintien, la
+// consigne suivante peut être loin).
+// L'hôte n'envoie jamais plus de consignes que de cases libres
+// (voir trajectory_stream.py) : "FULL" signale une consigne refusée.
+
+#include <Servo.h>
+
+const byte NUM_SERVOS = 4;
+Servo servos[NUM_SERVOS];
+const int SERVO_PINS[NUM_SERVOS] = {3, 5, 6, 9};
+const bool REVERSED[NUM_SERVOS] = {false, false, true, true};
+
+// Tampon circulaire : head et tail sont des compteurs libres sur 8 bits,
+// l'indice de la case est leur reste modulo BUFFER_SIZE (puissance de 2)
+const byte BUFFER_SIZE = 64;
+const byte UNCHANGED = 0xFF;  // Servo absent de la consigne
+const unsigned int CREDIT_BATCH = 4;  // Cases libérées avant un "C <libérées>"
+const unsigned long CREDIT_DELAY_MS = 20;  // Attente maximale d'un lot incomplet
+const unsigned long LATE_MS = 2;  // Au-delà, une consigne jouée compte comme en retard
+
+struct Setpoint {
+  unsigned long due;  // Instant de lecture (ms après GO)
+  byte angles[NUM_SERVOS];
+};
+
+Setpoint ring[BUFFER_SIZE];
+volatile byte head = 0;  // Prochaine consigne à jouer (avancé par l'interruption)
+volatile byte tail = 0;  // Prochaine case libre (avancé par loop)
+volatile unsigned long clock_ms = 0;  // Horloge de lecture
+volatile bool playing = false;
+volatile unsigned int released = 0;
+volatile unsigned int late = 0;
+unsigned int reported = 0;  // Dernier compteur envoyé à l'hôte
+unsigned long unreported_since = 0;  // Première case libérée depuis le dernier "C"
+
+// Négociation de vitesse (voir baud_negotiation.py)
+const long SAFE_BAUD = 9600;
+const long SUPPORTED_BAUDS[] = {9600, 19200, 38400, 57600, 115200, 250000, 500000};
+const unsigned long BAUD_PROBATION_MS = 1000;
+bool baud_probation = false;
+unsigned long baud_switched_at = 0;
+
+bool baud_supported(long rate) {
+  for (unsigned int i = 0; i < sizeof(SUPPORTED_BAUDS) / sizeof(SUPPORTED_BAUDS[0]); i++) {
+    if (SUPPORTED_BAUDS[i] == rate) return true;
+  }
+  return false;
+}
+
+void switch_baud(long rate) {
+  Serial.flush();
+  Serial.end();
+  Serial.begin(rate);
+}
+
+// Traite les commandes "BAUD <vitesse>" et "PING <motif>", renvoie true si la ligne en était une
+bool handle_link_command(String &data) {
+  if (data.startsWith("BAUD ")) {
+    long rate = data.substring(5).toInt();
+    if (!baud_supported(rate)) {
+      Serial.println("BAUD NON");
+      return true;
+    }
+    Serial.print("BAUD OK ");
+    Serial.println(rate);
+    switch_baud(rate);
+    baud_probation = rate != SAFE_BAUD;
+    baud_switched_at = millis();
+    return true;
+  }
+  if (data.startsWith("PING ")) {
+    Serial.print("PONG ");
+    Serial.println(data.substring(5));
+    baud_probation = false;
+    return true;
+  }
+  return false;
+}
+
+void write_angle(byte servo, byte angle) {
+  servos[servo].write(REVERSED[servo] ? 180 - angle : angle);
+}
+
+// Timer2 en mode CTC : 16 MHz / 64 / 250 = une interruption par milliseconde
+// (le Timer1 est pris par la bibliothèque Servo)
+void start_timer() {
+  noInterrupts();
+  TCCR2A = _BV(WGM21);
+  TCCR2B = _BV(CS22);
+  OCR2A = 249;
+  TCNT2 = 0;
+  TIMSK2 = _BV(OCIE2A);
+  interrupts();
+}
+
+ISR(TIMER2_COMPA_vect) {
+  if (!playing) return;
+  clock_ms++;
+  // Toutes les consignes échues partent dans la même milliseconde
+  while (head != tail) {
+    Setpoint &next = ring[head & (BUFFER_SIZE - 1)];
+    if ((long)(clock_ms - next.due) < 0) break;
+    if (clock_ms - next.due > LATE_MS) late++;
+    for (byte i = 0; i < NUM_SERVOS; i++) {
+      if (next.angles[i] != UNCHANGED) write_angle(i, next.angles[i]);
+    }
+    head++;
+    released++;
+  }
+}
+
+// Lit les entiers de text à partir de start ; tout autre caractère sépare deux valeurs.
+// Renvoie le nombre de valeurs, -1 s'il y en a plus que max_values
+int parse_values(const String &text, unsigned int start, int values[], int max_values) {
+  int count = 0;
+  bool in_number = false;
+  bool negative = false;
+  int value = 0;
+  for (unsigned int i = start; i <= text.length(); i++) {
+    char c = i < text.length() ? text[i] : ',';
+    if (c >= '0' && c <= '9') {
+      if (value < 1000) value = value * 10 + (c - '0');
+      in_number = true;
+    } else if (c == '-' && !in_number) {
+      negative = true;
+    } else {
+      if (in_number) {
+        if (count == max_values) return -1;
+        values[count++] = negative ? -value : value;
+      }
+      in_number = false;
+      negative = false;
+      value = 0;
+    }
+  }
+  return count;
+}
+
+bool valid_pair(int servo, int angle) {
+  return servo >= 0 && servo < NUM_SERVOS && angle >= 0 && angle <= 180;
+}
+
+void queue_setpoint(const String &line) {
+  int space = line.indexOf(' ', 2);
+  int values[2 * NUM_SERVOS];
+  int count = space < 0 ? 0 : parse_values(line, space + 1, values, 2 * NUM_SERVOS);
+  if (count <= 0 || count % 2 != 0) {
+    Serial.println("ERR T");
+    return;
+  }
+  if ((byte)(tail - head) >= BUFFER_SIZE) {
+    Serial.println("FULL");
+    return;
+  }
+  Setpoint &slot = ring[tail & (BUFFER_SIZE - 1)];
+  slot.due = line.substring(2, space).toInt();
+  for (byte i = 0; i < NUM_SERVOS; i++) {
+    slot.angles[i] = UNCHANGED;
+  }
+  for (int i = 0; i < count; i += 2) {
+    if (!valid_pair(values[i], values[i + 1])) {
+      Serial.println("ERR T");
+      return;
+    }
+    slot.angles[values[i]] = values[i + 1];
+  }
+  // Publiée une fois complète : l'interruption ne voit jamais une case à moitié écrite
+  tail++;
+}
+
+void set_angles_now(const String &line) {
+  int values[2 * NUM_SERVOS];
+  int count = parse_values(line, 0, values, 2 * NUM_SERVOS);
+  if (count <= 0 || count % 2 != 0) return;
+  for (int i = 0; i < count; i += 2) {
+    if (!valid_pair(values[i], values[i + 1])) continue;
+    write_angle(values[i], values[i + 1]);
+    Serial.print("Servo ");
+    Serial.print(values[i]);
+    Serial.print(" positionné à ");
+    Serial.print(values[i + 1]);
+    Serial.println(" degrés");
+  }
+}
+
+void process_line(String &line) {
+  if (handle_link_command(line)) return;
+  if (line.startsWith("T ")) {
+    queue_setpoint(line);
+  } else if (line == "GO") {
+    noInterrupts();
+    clock_ms = 0;
+    playing = true;
+    interrupts();
+    Serial.println("GO");
+  } else if (line == "ABORT") {
+    noInterrupts();
+    playing = false;
+    released += (byte)(tail - head);
+    head = tail;
+    unsigned int freed = released;
+    interrupts();
+    reported = freed;
+    Serial.print("ABORTED ");
+    Serial.println(freed);
+  } else if (line == "BUF?") {
+    noInterrupts();
+    byte count = tail - head;
+    unsigned int freed = released;
+    unsigned int late_count = late;
+    interrupts();
+    Serial.print("BUF ");
+    Serial.print(BUFFER_SIZE);
+    Serial.print(' ');
+    Serial.print(count);
+    Serial.print(' ');
+    Serial.print(freed);
+    Serial.print(' ');
+    Serial.println(late_count);
+  } else {
+    set_angles_now(line);
+  }
+}
+
+// Renvoie les crédits par lots, dès que le tampon est vide, ou après CREDIT_DELAY_MS
+void report_credits() {
+  noInterrupts();
+  unsigned int freed = released;
+  byte count = tail - head;
+  interrupts();
+  if (freed == reported) {
+    unreported_since = millis();
+    return;
+  }
+  if (freed - reported >= CREDIT_BATCH || count == 0 || millis() - unreported_since >= CREDIT_DELAY_MS) {
+    Serial.print("C ");
+    Serial.println(freed);
+    reported = freed;
+    unreported_since = millis();
+  }
+}
+
+void setup() {
+  Serial.begin(SAFE_BAUD);
+
+  for (byte i = 0; i < NUM_SERVOS; i++) {
+    servos[i].attach(SERVO_PINS[i]);
+    write_angle(i, 90);
+  }
+  start_timer();
+
+  Serial.println("Servos initialisés - Prêt à recevoir des commandes");
+}
+
+// Ligne en cours de réception, assemblée sans readStringUntil
+String pending_line = "";
+
+void loop() {
+  if (baud_probation && millis() - baud_switched_at >= BAUD_PROBATION_MS) {
+    baud_probation = false;
+    switch_baud(SAFE_BAUD);
+  }
+
+  while (Serial.available()) {
+    char c = Serial.read();
+    if (c != '\n') {
+      pending_line += c;
+      continue;
+    }
+    String line = pending_line;
+    pending_line = "";
+    line.trim();
+    process_line(line);
+  }
+
+  report_credits();
+}
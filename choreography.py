@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Chorégraphies : fichiers texte compilés en trames binaires lues par mmap
+
+Format texte (.choreo) :
+
+    # Commentaire
+    rate 50                 # fréquence des trames (Hz), 50 par défaut
+    ease minimum_jerk       # profil par défaut : linear, cubic, minimum_jerk
+    ease 0 cubic            # profil propre au servo 0
+    at 0.0  90 90 90 90     # instant (s) puis un angle par servo
+    at 1.0  45 _ _ _        # '_' conserve l'angle précédent
+
+Format compilé : un en-tête fixe suivi d'une trame de 5 octets par pas de
+temps. Une trame de type DELTA contient la variation signée de chaque servo
+depuis la trame précédente ; une trame ABSOLUTE (première trame, ou variation
+trop grande pour un octet signé) contient les angles eux-mêmes. Les fichiers
+compilés sont mis en cache, nommés d'après l'empreinte SHA-256 du texte.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import time
+
+from playback import DeadlinePlayer, controller_sender
+
+NUM_SERVOS = 4
+EXTENSION = '.choreo'
+DEFAULT_DIRECTORY = 'choreographies'
+CACHE_DIRECTORY = '.cache'
+
+MAGIC = b'CHOR'
+VERSION = 1
+# magic, version, fréquence (Hz), nombre de servos, nombre de trames, réservé
+HEADER = struct.Struct('<4sBHBI4x')
+FRAME_SIZE = 1 + NUM_SERVOS
+FRAME_DELTA = 0
+FRAME_ABSOLUTE = 1
+
+PROFILES = ('linear', 'cubic', 'minimum_jerk')
+
+
+class ChoreographyError(ValueError):
+    """
+    Erreur de syntaxe ou de contenu d'une chorégraphie
+    """
+
+    def __init__(self, line_number, message):
+        super().__init__(f"ligne {line_number}: {message}")
+        self.line_number = line_number
+
+
+def parse_choreography(text):
+    """
+    Analyse le texte d'une chorégraphie
+
+    Args:
+        text (str): Contenu du fichier .choreo
+
+    Returns:
+        tuple: (fréquence, profils par servo, positions clés [(t, [angles])])
+
+    Raises:
+        ChoreographyError: Ligne invalide (avec son numéro)
+    """
+    rate = 50
+    default_ease = 'minimum_jerk'
+    servo_eases = {}
+    keyframes = []
+    previous = None
+
+    for number, raw in enumerate(text.splitlines(), start=1):
+        line = raw.split('#', 1)[0].strip()
+        if not line:
+            continue
+        words = line.split()
+        keyword, args = words[0].lower(), words[1:]
+
+        if keyword == 'rate':
+            if len(args) != 1 or not args[0].isdigit() or not (1 <= int(args[0]) <= 1000):
+                raise ChoreographyError(number, "'rate' attend une fréquence entière entre 1 et 1000 Hz")
+            rate = int(args[0])
+        elif keyword == 'ease':
+            if len(args) == 1:
+                servo, profile = None, args[0]
+            elif len(args) == 2 and args[0].isdigit():
+                servo, profile = int(args[0]), args[1]
+                if servo >= NUM_SERVOS:
+                    raise ChoreographyError(number, f"servo {servo} inexistant")
+            else:
+                raise ChoreographyError(number, "'ease' attend [servo] profil")
+            if profile not in PROFILES:
+                raise ChoreographyError(number, f"profil inconnu '{profile}'")
+            if servo is None:
+                default_ease = profile
+            else:
+                servo_eases[servo] = profile
+        elif keyword == 'at':
+            if len(args) != 1 + NUM_SERVOS:
+                raise ChoreographyError(number, f"'at' attend un instant et {NUM_SERVOS} angles")
+            try:
+                t = float(args[0])
+            except ValueError:
+                raise ChoreographyError(number, f"instant invalide '{args[0]}'")
+            if keyframes and t <= keyframes[-1][0]:
+                raise ChoreographyError(number, "les instants doivent être croissants")
+            pose = []
+            for servo, word in enumerate(args[1:]):
+                if word == '_':
+                    if previous is None:
+                        raise ChoreographyError(number, "la première position doit donner tous les angles")
+                    pose.append(previous[servo])
+                    continue
+                if not word.isdigit() or int(word) > 180:
+                    raise ChoreographyError(number, f"angle invalide '{word}' (0-180)")
+                pose.append(int(word))
+            keyframes.append((t, pose))
+            previous = pose
+        else:
+            raise ChoreographyError(number, f"mot-clé inconnu '{words[0]}'")
+
+    if not keyframes:
+        raise ChoreographyError(0, "aucune position 'at'")
+    eases = [servo_eases.get(servo, default_ease) for servo in range(NUM_SERVOS)]
+    return rate, eases, keyframes
+
+
+def compile_choreography(text):
+    """
+    Compile le texte d'une chorégraphie en son format binaire
+
+    Returns:
+        bytes: En-tête et trames
+    """
+    # NumPy n'est nécessaire qu'à la compilation : la lecture d'un fichier en cache n'en dépend pas
+    import numpy as np
+    from trajectory import plan_trajectory
+
+    rate, eases, keyframes = parse_choreography(text)
+
+    # Une passe du moteur de trajectoires par profil utilisé, puis sélection des colonnes
+    setpoints = None
+    for profile in set(eases):
+        _, planned = plan_trajectory(keyframes, rate_hz=rate, profile=profile)
+        if setpoints is None:
+            setpoints = np.empty_like(planned)
+        columns = [servo for servo in range(NUM_SERVOS) if eases[servo] == profile]
+        setpoints[:, columns] = planned[:, columns]
+    angles = np.rint(setpoints).astype(np.int16)
+
+    deltas = np.diff(angles, axis=0, prepend=angles[:1])
+    absolute = np.any(np.abs(deltas) > 127, axis=1)
+    absolute[0] = True
+
+    frames = np.empty((len(angles), FRAME_SIZE), dtype=np.uint8)
+    frames[:, 0] = np.where(absolute, FRAME_ABSOLUTE, FRAME_DELTA)
+    # Deltas signés stockés en complément à deux sur un octet
+    frames[:, 1:] = (np.where(absolute[:, None], angles, deltas) & 0xFF).astype(np.uint8)
+
+    header = HEADER.pack(MAGIC, VERSION, rate, NUM_SERVOS, len(frames))
+    return header + frames.tobytes()
+
+
+def compiled_path(path, cache_dir=None):
+    """
+    Renvoie le fichier compilé d'une chorégraphie, en le compilant s'il n'est pas en cache
+
+    Args:
+        path (str): Chemin du fichier .choreo
+        cache_dir (str): Répertoire du cache (par défaut .cache à côté du fichier)
+
+    Returns:
+        str: Chemin du fichier compilé
+    """
+    with open(path, 'rb') as f:
+        source = f.read()
+    digest = hashlib.sha256(source).hexdigest()[:16]
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(path) or '.', CACHE_DIRECTORY)
+    target = os.path.join(cache_dir, f"{digest}.chorbin")
+    if os.path.exists(target):
+        return target
+
+    data = compile_choreography(source.decode('utf-8'))
+    os.makedirs(cache_dir, exist_ok=True)
+    # Écriture atomique : un lecteur ne voit jamais de fichier à moitié écrit
+    temporary = f"{target}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, target)
+    return target
+
+
+def iter_frames(path):
+    """
+    Parcourt un fichier compilé via mmap et produit les trames à envoyer
+
+    Seules les trames qui changent au moins un servo sont produites ; la
+    mémoire utilisée est constante quelle que soit la durée du fichier.
+
+    Args:
+        path (str): Chemin du fichier compilé
+
+    Yields:
+        tuple: (t_secondes, {servo: angle})
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if len(data) < HEADER.size:
+            raise ValueError(f"Fichier compilé tronqué: {path}")
+        magic, version, rate, servos, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or servos != NUM_SERVOS:
+            raise ValueError(f"Fichier compilé invalide: {path}")
+        if len(data) < HEADER.size + count * FRAME_SIZE:
+            raise ValueError(f"Fichier compilé tronqué: {path}")
+
+        angles = [0] * NUM_SERVOS
+        unpack_delta = struct.Struct('<B4b').unpack_from
+        offset = HEADER.size
+        for index in range(count):
+            kind, *values = unpack_delta(data, offset)
+            offset += FRAME_SIZE
+            changed = {}
+            if kind == FRAME_ABSOLUTE:
+                for servo in range(NUM_SERVOS):
+                    value = values[servo] & 0xFF
+                    if value != angles[servo] or index == 0:
+                        angles[servo] = changed[servo] = value
+            else:
+                for servo in range(NUM_SERVOS):
+                    if values[servo]:
+                        angles[servo] += values[servo]
+                        changed[servo] = angles[servo]
+            if changed or index == count - 1:
+                yield index / rate, changed
+
+
+def list_choreographies(directory=DEFAULT_DIRECTORY):
+    """
+    Liste les fichiers .choreo d'un répertoire
+
+    Returns:
+        list: Chemins triés par nom
+    """
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.endswith(EXTENSION))
+
+
+def play_choreography(controller, path, speed=1.0, clock=time.monotonic, sleep=time.sleep):
+    """
+    Compile (si nécessaire) puis joue une chorégraphie sur le contrôleur
+
+    Args:
+        controller (ArduinoServoController): Contrôleur connecté
+        path (str): Chemin du fichier .choreo
+        speed (float): Multiplicateur de vitesse
+        clock (callable): Horloge monotone en secondes (ex. Job.clock, arrêtée pendant une pause)
+        sleep (callable): Fonction d'attente (ex. Job.sleep, interrompue par une annulation)
+
+    Returns:
+        tuple: (bool, PlaybackStats ou str) - Succès et statistiques de la lecture
+    """
+    if not controller.is_connected():
+        return False, "Non connecté à l'Arduino"
+    try:
+        compiled = compiled_path(path)
+    except (OSError, ValueError, ImportError) as e:
+        return False, str(e)
+    try:
+        # Cache tronqué ou illisible : l'erreur n'apparaît qu'à la lecture des trames
+        stats = DeadlinePlayer(controller_sender(controller), speed=speed, clock=clock, sleep=sleep).play(
+            iter_frames(compiled))
+    except (OSError, ValueError) as e:
+        return False, str(e)
+    return stats.failures == 0, stats
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+File de commandes devant le port série : voie prioritaire et séquences en arrière-plan
+
+Un seul thread écrit les commandes de la file sur le contrôleur, dans
+l'ordre d'arrivée, sur deux voies :
+    - la voie normale, où les séquences en arrière-plan déposent leurs trames ;
+    - la voie prioritaire (remise à 90°, arrêt sur place), toujours servie
+      d'abord. urgent() annule aussi les séquences et vide la voie normale :
+      la commande part dès la fin de l'écriture en cours, quelques
+      millisecondes au plus, au lieu d'attendre la fin de la file.
+
+La voie normale est cadencée dans les deux sens de la liaison : une
+commande n'est écrite qu'une fois confirmée la précédente (les réponses de
+arduino.ino, une trentaine d'octets par servo, pèsent plus que les
+commandes) et sans dépasser d'avance le tampon de réception de l'Arduino
+(64 octets). Le reste attend dans la file, où urgent() peut l'abandonner,
+plutôt que dans les tampons du système et de la carte, qu'aucune commande
+ne peut doubler : la confirmation d'une commande urgente arrive après
+celle d'une seule commande normale au plus.
+
+Les consignes du mode interactif (controller.queue_servo_angle) passent
+aussi par la voie normale si l'ordonnanceur est démarré avec la file :
+controller.start_scheduler(commands=commands).
+
+Une séquence est une fonction function(job) exécutée dans son propre thread.
+Elle passe job.controller (même interface que le contrôleur, mais ses envois
+prennent la voie normale) et règle son minutage sur job.clock et job.sleep :
+une annulation interrompt l'attente en cours, une pause arrête l'horloge de
+la séquence, qui reprend ensuite là où elle en était.
+
+    commands = CommandQueue(controller)
+    commands.start()
+    job = commands.start_job("danse", lambda job: play_choreography(
+        job.controller, path, clock=job.clock, sleep=job.sleep))
+    job.pause()
+    job.resume()
+    commands.urgent([0, 1, 2, 3], [90, 90, 90, 90])  # la chorégraphie est annulée
+"""
+import itertools
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import CancelledError, Future
+
+from macros import frame_size
+from script_runner import ARDUINO_RX_BUFFER, reply_futures
+
+# Commande en file : Future du résultat, fonction d'envoi, séquence d'origine (None : aucune)
+# et taille estimée sur la liaison (octets)
+QueuedCommand = namedtuple('QueuedCommand', 'future function args kwargs owner size')
+
+
+def command_size(servo_num, angle):
+    """
+    Octets estimés d'une commande set_servo_angle (format texte "servo,angle;")
+    """
+    if not isinstance(servo_num, (list, tuple)):
+        servo_num, angle = [servo_num], [angle]
+    return sum(len(f"{s},{a};") for s, a in zip(servo_num, angle))
+
+
+class JobCancelled(Exception):
+    """
+    Levée dans une séquence annulée, à sa prochaine attente ou à son prochain envoi
+    """
+
+
+class QueuedController:
+    """
+    Contrôleur vu par une séquence : les envois passent par la voie normale de la file
+
+    Comme metrics.InstrumentedSerial, tout le reste (angles, état, is_connected...)
+    est lu sur le contrôleur d'origine.
+    """
+
+    def __init__(self, controller, job):
+        self._controller = controller
+        self._job = job
+
+    def __getattr__(self, name):
+        return getattr(self._controller, name)
+
+    def set_servo_angle(self, servo_num, angle, *args, **kwargs):
+        return self._job.send(self._controller.set_servo_angle, servo_num, angle, *args,
+                              size=command_size(servo_num, angle), **kwargs)
+
+    def send_frame(self, frame, *args, **kwargs):
+        return self._job.send(self._controller.send_frame, frame, *args,
+                              size=frame_size(frame), **kwargs)
+
+
+class Job:
+    """
+    Séquence exécutée en arrière-plan, annulable et suspendable
+    """
+
+    def __init__(self, number, name, function, commands, clock=time.monotonic):
+        """
+        Args:
+            number (int): Numéro de la séquence (affiché, et utilisé par CommandQueue.job)
+            name (str): Description de la séquence
+            function (callable): function(job), exécutée dans le thread de la séquence
+            commands (CommandQueue): File par laquelle passent ses envois
+            clock (callable): Horloge monotone en secondes
+        """
+        self.number = number
+        self.name = name
+        self.function = function
+        self.commands = commands
+        self.controller = QueuedController(commands.controller, self)
+        self.future = Future()  # Résultat de function, ou JobCancelled
+        self._clock = clock
+        self.condition = threading.Condition()
+        self.cancelled = False
+        self.paused_at = None  # Début de la pause en cours
+        self.paused_total = 0.0  # Durée des pauses terminées
+        self.cancel_hooks = []
+        self.thread = threading.Thread(target=self._run, name=f"Job{number}", daemon=True)
+
+    def _run(self):
+        result = error = None
+        try:
+            result = self.function(self)
+        except Exception as e:  # JobCancelled compris : rendu par wait()
+            error = e
+        # Retirée de la liste avant d'être déclarée finie (on_done voit une liste à jour)
+        self.commands._forget(self)
+        if error is None:
+            self.future.set_result(result)
+        else:
+            self.future.set_exception(error)
+
+    @property
+    def state(self):
+        if self.cancelled:
+            return "annulée"
+        if self.future.done():
+            return "terminée"
+        if self.paused_at is not None:
+            return "en pause"
+        return "en cours"
+
+    def clock(self):
+        """
+        Horloge de la séquence : temps monotone, pauses exclues
+        """
+        with self.condition:
+            return self._elapsed()
+
+    def _elapsed(self):
+        paused = self.paused_total
+        if self.paused_at is not None:
+            paused += self._clock() - self.paused_at
+        return self._clock() - paused
+
+    def sleep(self, seconds):
+        """
+        Attente sur l'horloge de la séquence ; prolongée par une pause, interrompue par une annulation
+
+        Raises:
+            JobCancelled: La séquence a été annulée
+        """
+        with self.condition:
+            deadline = self._elapsed() + seconds
+            while True:
+                if self.cancelled:
+                    raise JobCancelled(f"Séquence {self.number} annulée")
+                if self.paused_at is not None:
+                    self.condition.wait()
+                    continue
+                remaining = deadline - self._elapsed()
+                if remaining <= 0:
+                    return
+                self.condition.wait(remaining)
+
+    def checkpoint(self):
+        """
+        Attend la fin d'une pause ; lève JobCancelled si la séquence est annulée
+        """
+        self.sleep(0)
+
+    def send(self, function, *args, size=0, **kwargs):
+        """
+        Envoi par la voie normale de la file ; attend son écriture (pas la réponse de l'Arduino)
+
+        Args:
+            size (int): Taille estimée de la commande sur la liaison (octets)
+
+        Returns:
+            Le résultat de function (ex. (bool, Future) de set_servo_angle)
+        """
+        self.checkpoint()
+        future = self.commands.submit(function, *args, owner=self, size=size, **kwargs)
+        try:
+            return future.result()
+        except CancelledError:
+            raise JobCancelled(f"Séquence {self.number} annulée") from None
+
+    def on_cancel(self, hook):
+        """
+        Enregistre hook(), appelé à l'annulation (ex. TrajectoryStreamer.abort pour vider
+        le tampon de la carte)
+        """
+        self.cancel_hooks.append(hook)
+
+    def cancel(self):
+        """
+        Annule la séquence : ses commandes en file sont abandonnées et son attente interrompue
+        """
+        with self.condition:
+            if self.cancelled or self.future.done():
+                return False
+            self.cancelled = True
+            self.condition.notify_all()
+        self.commands.flush(owner=self)
+        for hook in self.cancel_hooks:
+            hook()
+        return True
+
+    def pause(self):
+        with self.condition:
+            if self.paused_at is None and not self.cancelled:
+                self.paused_at = self._clock()
+            self.condition.notify_all()
+
+    def resume(self):
+        with self.condition:
+            if self.paused_at is not None:
+                self.paused_total += self._clock() - self.paused_at
+                self.paused_at = None
+            self.condition.notify_all()
+
+    def wait(self, timeout=None):
+        """
+        Attend la fin de la séquence
+
+        Returns:
+            Le résultat de function
+
+        Raises:
+            JobCancelled: La séquence a été annulée
+        """
+        return self.future.result(timeout)
+
+
+class CommandQueue:
+    """
+    Thread unique d'écriture des commandes, avec une voie prioritaire
+    """
+
+    def __init__(self, controller, backlog=ARDUINO_RX_BUFFER, max_unconfirmed=1):
+        """
+        Args:
+            controller: ArduinoServoController ou ControllerPool connecté
+            backlog (int): Octets de la voie normale écrits d'avance sur la liaison
+            max_unconfirmed (int): Commandes sans réponse de l'Arduino au-delà desquelles
+                                   la voie normale attend (thread de lecture du contrôleur)
+        """
+        self.controller = controller
+        self.backlog = backlog
+        self.max_unconfirmed = max_unconfirmed
+        self.link_free_at = 0.0  # Instant estimé où la liaison aura fini d'émettre
+        self.unconfirmed = []  # Futures des réponses attendues, dans l'ordre d'envoi
+        self.normal = deque()
+        self.priority = deque()
+        self.condition = threading.Condition()
+        self.jobs = {}  # Numéro -> Job en cours
+        self.numbers = itertools.count(1)
+        self.running = False
+        self.worker = None
+
+    def start(self):
+        if self.worker is None:
+            self.running = True
+            self.worker = threading.Thread(target=self._run, name="CommandQueue", daemon=True)
+            self.worker.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        """
+        Annule les séquences, abandonne les commandes normales en file et arrête le thread
+        """
+        self.halt()
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.worker:
+            self.worker.join(timeout)
+            self.worker = None
+
+    def submit(self, function, *args, priority=False, owner=None, size=0, **kwargs):
+        """
+        Confie une commande au thread d'écriture
+
+        Args:
+            function (callable): Appelée par le thread d'écriture (ex. controller.set_servo_angle)
+            priority (bool): Voie prioritaire, servie avant toute la voie normale
+            owner (Job): Séquence d'origine (ses commandes sont abandonnées à son annulation)
+            size (int): Taille estimée sur la liaison, pour le cadencement de la voie normale
+
+        Returns:
+            Future: Résolue avec le résultat de function, annulée si la commande est abandonnée
+        """
+        command = QueuedCommand(Future(), function, args, kwargs, owner, size)
+        with self.condition:
+            if not self.running:
+                command.future.cancel()
+                return command.future
+            (self.priority if priority else self.normal).append(command)
+            self.condition.notify()
+        return command.future
+
+    def send(self, function, *args, size=0, **kwargs):
+        """
+        Envoi par la voie normale, en attendant son écriture (ex. ordonnanceur d'écriture)
+
+        Returns:
+            Le résultat de function, ou (False, str) si la commande a été abandonnée
+        """
+        try:
+            return self.submit(function, *args, size=size, **kwargs).result()
+        except CancelledError:
+            return False, "Commande abandonnée"
+
+    def flush(self, owner=None):
+        """
+        Abandonne les commandes de la voie normale pas encore écrites
+
+        Args:
+            owner (Job): Si donné, seulement les commandes de cette séquence
+
+        Returns:
+            int: Nombre de commandes abandonnées
+        """
+        with self.condition:
+            dropped = [command for command in self.normal if owner is None or command.owner is owner]
+            if owner is None:
+                self.normal.clear()
+            else:
+                self.normal = deque(command for command in self.normal if command.owner is not owner)
+        for command in dropped:
+            command.future.cancel()
+        return len(dropped)
+
+    def halt(self):
+        """
+        Arrêt sur place : séquences annulées, file vidée ; les servos gardent leur dernière consigne
+
+        Returns:
+            int: Nombre de séquences annulées
+        """
+        cancelled = sum(1 for job in list(self.jobs.values()) if job.cancel())
+        self.flush()
+        # Consignes du mode interactif pas encore parties
+        discard = getattr(self.controller, 'discard_queued', None)
+        if discard:
+            discard()
+        return cancelled
+
+    def urgent(self, servo_num, angle, timeout=None):
+        """
+        Commande prioritaire (remise à 90°, position de repli) : arrêt sur place puis envoi en tête de file
+
+        Args:
+            servo_num (list): Numéros des servos
+            angle (list): Angles désirés
+            timeout (float): Délai d'attente de l'écriture (s)
+
+        Returns:
+            tuple: (bool, str) - Résultat de set_servo_angle
+        """
+        self.halt()
+        future = self.submit(self.controller.set_servo_angle, servo_num, angle, multi_servo=True,
+                             priority=True, size=command_size(servo_num, angle))
+        try:
+            return future.result(timeout)
+        except CancelledError:
+            return False, "File de commandes arrêtée"
+
+    def start_job(self, name, function, on_done=None):
+        """
+        Lance une séquence en arrière-plan
+
+        Args:
+            name (str): Description de la séquence
+            function (callable): function(job) ; ses envois passent par job.controller,
+                                 ses attentes par job.sleep (voir Job)
+            on_done (callable): on_done(job), appelé à la fin de la séquence (même annulée)
+
+        Returns:
+            Job: La séquence lancée
+        """
+        job = Job(next(self.numbers), name, function, self)
+        with self.condition:
+            self.jobs[job.number] = job
+        if on_done:
+            job.future.add_done_callback(lambda _: on_done(job))
+        job.thread.start()
+        return job
+
+    def job(self, number=None):
+        """
+        Séquence en cours de numéro donné, ou la plus récente (None s'il n'y en a pas)
+        """
+        with self.condition:
+            if number is None:
+                return self.jobs[max(self.jobs)] if self.jobs else None
+            return self.jobs.get(number)
+
+    def running_jobs(self):
+        with self.condition:
+            return [self.jobs[number] for number in sorted(self.jobs)]
+
+    def _forget(self, job):
+        with self.condition:
+            self.jobs.pop(job.number, None)
+
+    def _baud_rate(self):
+        # Pour plusieurs cartes, la plus lente (estimation prudente)
+        boards = getattr(self.controller, 'controllers', [self.controller])
+        return min(board.negotiated_baud or board.baud_rate for board in boards)
+
+    def _next_command(self):
+        """
+        Prochaine commande à écrire (appelé sous self.condition), None si le thread doit s'arrêter
+
+        La voie normale attend les réponses des commandes précédentes, puis que la
+        liaison n'ait plus que self.backlog octets d'avance ; une commande prioritaire
+        réveille l'attente et part aussitôt.
+        """
+        while True:
+            if self.priority:
+                return self.priority.popleft()
+            if not self.running:
+                return None
+            if not self.normal:
+                self.condition.wait()
+                continue
+            # Les réponses des commandes précédentes d'abord (réveil par _confirmed)
+            self.unconfirmed = [future for future in self.unconfirmed if not future.done()]
+            if len(self.unconfirmed) >= self.max_unconfirmed:
+                self.condition.wait()
+                continue
+            # 10 bits par octet (start + 8 bits + stop)
+            ahead = self.link_free_at - time.monotonic() - self.backlog * 10 / self._baud_rate()
+            if ahead <= 0:
+                return self.normal.popleft()
+            self.condition.wait(ahead)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                command = self._next_command()
+            if command is None:
+                return
+            if not command.future.set_running_or_notify_cancel():
+                continue
+            result = None  # Pas de réponse à attendre si la commande a levé une exception
+            try:
+                result = command.function(*command.args, **command.kwargs)
+            except Exception as e:
+                command.future.set_exception(e)
+            else:
+                command.future.set_result(result)
+            replies = []
+            if isinstance(result, tuple) and len(result) == 2 and result[0]:
+                replies = [future for future in reply_futures(result[1]) if not future.done()]
+            with self.condition:
+                self.link_free_at = max(time.monotonic(), self.link_free_at) + command.size * 10 / self._baud_rate()
+                self.unconfirmed.extend(replies)
+            for future in replies:
+                future.add_done_callback(self._confirmed)
+
+    def _confirmed(self, future):
+        # Thread de lecture : une réponse attendue est arrivée (ou son délai a expiré)
+        with self.condition:
+            self.condition.notify_all()
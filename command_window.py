@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Fenêtre glissante de commandes numérotées
+
+Jusqu'à window_size commandes peuvent être en vol en même temps. Chaque
+commande porte un numéro de séquence que l'Arduino renvoie dans son accusé :
+"OK <seq>" / "ERR <seq>" en texte (arduino.ino, préfixe "@<seq> "), ou
+ACK/NACK suivi du numéro en binaire (binary_arduino.ino). Les commandes sans
+accusé dans le délai sont retransmises, privées des servos qui ont reçu
+entre-temps une consigne plus récente (sinon on reviendrait en arrière).
+"""
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+from serial_reader import resolve
+
+SEQUENCE_SPACE = 256
+ACK_PATTERN = re.compile(r"(OK|ERR) (\d+)$")
+
+
+def parse_ack(message):
+    """
+    Extrait (accepté, seq) d'un accusé texte "OK <seq>" / "ERR <seq>"
+
+    Returns:
+        tuple or None: (bool, int), ou None si le message n'est pas un accusé
+    """
+    match = ACK_PATTERN.match(message) if isinstance(message, str) else None
+    if match is None:
+        return None
+    return match.group(1) == 'OK', int(match.group(2))
+
+
+class InFlight:
+    """
+    Commande envoyée en attente de son accusé
+    """
+
+    __slots__ = ('seq', 'targets', 'future', 'sent_at', 'retries')
+
+    def __init__(self, seq, targets, sent_at):
+        self.seq = seq
+        self.targets = targets
+        self.future = Future()
+        self.sent_at = sent_at
+        self.retries = 0
+
+
+class CommandWindow:
+    """
+    Fenêtre d'émission : limite les commandes en vol, associe les accusés et retransmet
+    """
+
+    def __init__(self, write, encode, window_size=8, retransmit_timeout=0.25, max_retries=3,
+                 is_current=None, clock=time.monotonic):
+        """
+        Args:
+            write (callable): Écrit des octets sur le port série
+            encode (callable): (seq, {servo: angle}) -> octets de la commande
+            window_size (int): Nombre maximal de commandes en vol (< 128)
+            retransmit_timeout (float): Délai avant retransmission (s)
+            max_retries (int): Nombre de retransmissions avant abandon
+            is_current (callable): (servo, angle) -> False si une consigne plus récente
+                                   a remplacé celle-ci (elle n'est alors pas retransmise)
+            clock (callable): Horloge monotone en secondes
+        """
+        if not (1 <= window_size < SEQUENCE_SPACE // 2):
+            raise ValueError("La taille de fenêtre doit être comprise entre 1 et 127")
+        self.write = write
+        self.encode = encode
+        self.window_size = window_size
+        self.retransmit_timeout = retransmit_timeout
+        self.max_retries = max_retries
+        self.is_current = is_current or (lambda servo, angle: True)
+        self.clock = clock
+        self.in_flight = {}
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.retransmissions = 0
+        self.failures = 0
+
+    def submit(self, seq, targets, timeout=None):
+        """
+        Envoie une commande dès qu'une place se libère dans la fenêtre
+
+        Args:
+            seq (int): Numéro de séquence (0-255)
+            targets (dict): {servo: angle}
+            timeout (float): Attente maximale d'une place, None pour attendre indéfiniment
+
+        Returns:
+            Future or None: Résolue avec [accusé] (liste vide en cas d'échec ou si
+                            toutes ses consignes ont été remplacées avant l'accusé),
+                            None si aucune place ne s'est libérée à temps
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: len(self.in_flight) < self.window_size, timeout):
+                return None
+            if seq in self.in_flight:
+                raise ValueError(f"Numéro de séquence {seq} déjà en vol")
+            entry = InFlight(seq, dict(targets), self.clock())
+            self.in_flight[seq] = entry
+        with self.write_lock:
+            self.write(self.encode(seq, entry.targets))
+        return entry.future
+
+    def acknowledge(self, seq, accepted, message=None):
+        """
+        Traite l'accusé d'une commande ; un refus provoque une retransmission immédiate
+
+        Returns:
+            bool: True si le numéro correspondait à une commande en vol
+        """
+        with self.condition:
+            entry = self.in_flight.get(seq)
+            if entry is None:
+                return False
+            if not accepted and entry.retries < self.max_retries:
+                entry.sent_at = 0.0  # Retransmise au prochain contrôle des délais
+                return True
+            del self.in_flight[seq]
+            self.condition.notify_all()
+        if not accepted:
+            self.failures += 1
+        resolve(entry.future, [message] if accepted else [])
+        return True
+
+    def check_timeouts(self):
+        """
+        Retransmet les commandes sans accusé et abandonne celles qui ont épuisé leurs essais
+        """
+        now = self.clock()
+        resend = []
+        done = []
+        with self.condition:
+            for entry in list(self.in_flight.values()):
+                if now - entry.sent_at < self.retransmit_timeout:
+                    continue
+                # Les servos qui ont reçu une consigne plus récente ne sont pas renvoyés
+                entry.targets = {s: a for s, a in entry.targets.items() if self.is_current(s, a)}
+                if not entry.targets or entry.retries >= self.max_retries:
+                    del self.in_flight[entry.seq]
+                    done.append(entry)
+                    continue
+                entry.retries += 1
+                entry.sent_at = now
+                resend.append((entry.seq, dict(entry.targets)))
+            if done:
+                self.condition.notify_all()
+        for entry in done:
+            if entry.targets:
+                self.failures += 1
+            resolve(entry.future, [])
+        for seq, targets in resend:
+            self.retransmissions += 1
+            with self.write_lock:
+                self.write(self.encode(seq, targets))
+
+    def pending(self):
+        """
+        Nombre de commandes en vol
+        """
+        with self.condition:
+            return len(self.in_flight)
+
+    def fail_all(self):
+        """
+        Abandonne toutes les commandes en vol (déconnexion)
+        """
+        with self.condition:
+            entries = list(self.in_flight.values())
+            self.in_flight.clear()
+            self.condition.notify_all()
+        for entry in entries:
+            resolve(entry.future, [])
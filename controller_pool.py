@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+from concurrent.futures import ThreadPoolExecutor
+
+from arduino_servo_controller import ArduinoServoController
+
+
+class ControllerPool:
+    """
+    Ensemble de cartes Arduino vues comme un seul contrôleur
+
+    Les servos ont des numéros globaux, associés chacun à un couple
+    (carte, canal). Une commande multi-servos est découpée en une trame par
+    carte, et ces trames sont écrites en parallèle : un thread par port, ce
+    qui conserve l'ordre des commandes sur chaque carte. Une pose de 8 ou 12
+    servos coûte ainsi la latence d'une seule carte.
+    """
+
+    def __init__(self, ports, servo_map=None, **controller_options):
+        """
+        Args:
+            ports (list): Ports série des cartes, dans l'ordre des numéros de carte
+            servo_map (dict): {servo_global: (carte, canal)} ; par défaut les servos
+                              sont numérotés carte par carte (0-3 carte 0, 4-7 carte 1...)
+            **controller_options: Options transmises à chaque ArduinoServoController
+        """
+        if not ports:
+            raise ValueError("Au moins un port est nécessaire")
+        self.ports = list(ports)
+        self.controllers = [ArduinoServoController(port=port, **controller_options) for port in self.ports]
+        if servo_map is None:
+            per_board = ArduinoServoController.NUM_SERVOS
+            servo_map = {board * per_board + channel: (board, channel)
+                         for board in range(len(self.ports)) for channel in range(per_board)}
+        for servo, (board, channel) in servo_map.items():
+            if not (0 <= board < len(self.ports)) or not (0 <= channel < ArduinoServoController.NUM_SERVOS):
+                raise ValueError(f"Adresse invalide pour le servo {servo}: carte {board}, canal {channel}")
+        self.servo_map = dict(servo_map)
+        self.num_servos = max(self.servo_map) + 1
+        # Un exécuteur à un seul thread par carte : parallèle entre cartes, ordonné sur chacune
+        self.executors = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"board{board}")
+                          for board in range(len(self.ports))]
+
+    def _run_all(self, call, boards=None):
+        """
+        Exécute call(carte, contrôleur) sur les cartes en parallèle
+
+        Returns:
+            dict: {carte: résultat}
+        """
+        boards = range(len(self.controllers)) if boards is None else boards
+        futures = {board: self.executors[board].submit(call, board, self.controllers[board])
+                   for board in boards}
+        return {board: future.result() for board, future in futures.items()}
+
+    def connect(self):
+        """
+        Connecte toutes les cartes en parallèle (les 2 s de démarrage ne s'additionnent pas)
+
+        Returns:
+            tuple: (bool, list) - Succès global et messages préfixés par leur port
+        """
+        results = self._run_all(lambda board, controller: controller.connect())
+        messages = []
+        success = True
+        for board, (connected, board_messages) in sorted(results.items()):
+            success = success and connected
+            if isinstance(board_messages, str):
+                board_messages = [board_messages]
+            messages.extend(f"[{self.ports[board]}] {message}" for message in board_messages)
+        if not success:
+            self.disconnect()
+            return False, "; ".join(messages)
+        return True, messages
+
+    def disconnect(self):
+        """
+        Ferme toutes les connexions
+        """
+        results = self._run_all(lambda board, controller: controller.disconnect())
+        return any(results.values())
+
+    def close(self):
+        """
+        Ferme les connexions et arrête les threads d'écriture
+        """
+        self.disconnect()
+        for executor in self.executors:
+            executor.shutdown(wait=True)
+
+    def is_connected(self):
+        return all(controller.is_connected() for controller in self.controllers)
+
+    @property
+    def current_angles(self):
+        """
+        Derniers angles commandés, indexés par numéro de servo global
+        """
+        angles = [None] * self.num_servos
+        for servo, (board, channel) in self.servo_map.items():
+            angles[servo] = self.controllers[board].current_angles[channel]
+        return angles
+
+    @property
+    def confirmed_angles(self):
+        """
+        Derniers angles confirmés, indexés par numéro de servo global
+        """
+        angles = [None] * self.num_servos
+        for servo, (board, channel) in self.servo_map.items():
+            angles[servo] = self.controllers[board].confirmed_angles[channel]
+        return angles
+
+    def add_listener(self, listener):
+        """
+        Enregistre listener(message) sur toutes les cartes
+        """
+        for controller in self.controllers:
+            controller.add_listener(listener)
+
+    def remove_listener(self, listener):
+        for controller in self.controllers:
+            controller.remove_listener(listener)
+
+    def _split(self, servo_num, angle):
+        """
+        Répartit des servos globaux par carte
+
+        Returns:
+            tuple: ({carte: ([canaux], [angles])}, None) ou (None, message d'erreur)
+        """
+        if not isinstance(servo_num, list):
+            servo_num = [servo_num]
+        if not isinstance(angle, list):
+            angle = [angle]
+        per_board = {}
+        for servo, value in zip(servo_num, angle):
+            if servo not in self.servo_map:
+                return None, f"Le numéro de servo {servo} doit être entre 0 et {self.num_servos - 1}"
+            board, channel = self.servo_map[servo]
+            channels, angles = per_board.setdefault(board, ([], []))
+            channels.append(channel)
+            angles.append(value)
+        return per_board, None
+
+    def set_servo_angle(self, servo_num, angle, multi_servo=False, wait=False, timeout=None):
+        """
+        Définit l'angle de servos répartis sur plusieurs cartes, une trame par carte en parallèle
+
+        Args:
+            servo_num (int or list): Numéro(s) de servo global
+            angle (int or list): Angle(s) désiré(s)
+            multi_servo (bool): Si True, envoie tous les servos (sinon seulement le premier)
+            wait (bool): Attendre les réponses (voir ArduinoServoController.set_servo_angle)
+            timeout (float): Délai d'attente des réponses
+
+        Returns:
+            tuple: (bool, dict) - Succès global et {carte: (succès, réponses)}
+        """
+        if not isinstance(servo_num, list):
+            servo_num = [servo_num]
+        if not isinstance(angle, list):
+            angle = [angle]
+        if not multi_servo:
+            servo_num, angle = servo_num[:1], angle[:1]
+        per_board, error = self._split(servo_num, angle)
+        if error:
+            return False, error
+
+        def send(board, controller):
+            channels, angles = per_board[board]
+            return controller.set_servo_angle(channels, angles, multi_servo=True, wait=wait, timeout=timeout)
+
+        results = self._run_all(send, sorted(per_board))
+        return all(success for success, _ in results.values()), results
+
+    def prepare_frame(self, servo_num, angle):
+        """
+        Valide et encode une commande une fois pour toutes : une trame préparée par carte
+
+        Returns:
+            tuple: (bool, dict ou str) - {carte: PreparedFrame} pour send_frame, ou message d'erreur
+        """
+        per_board, error = self._split(servo_num, angle)
+        if error:
+            return False, error
+        frames = {}
+        for board, (channels, angles) in per_board.items():
+            success, frame = self.controllers[board].prepare_frame(channels, angles)
+            if not success:
+                return False, f"[{self.ports[board]}] {frame}"
+            frames[board] = frame
+        return True, frames
+
+    def send_frame(self, frames, wait=False, timeout=None):
+        """
+        Envoie les trames préparées par prepare_frame, en parallèle sur leurs cartes
+
+        Returns:
+            tuple: (bool, dict) - Succès global et {carte: (succès, réponses)}
+        """
+        results = self._run_all(lambda board, controller: controller.send_frame(frames[board], wait, timeout),
+                                sorted(frames))
+        return all(success for success, _ in results.values()), results
+
+    def start_scheduler(self, rate_hz=50, commands=None):
+        """
+        Démarre l'ordonnanceur « dernier gagnant » de chaque carte (commands : file partagée)
+        """
+        for controller in self.controllers:
+            controller.start_scheduler(rate_hz, commands)
+
+    def stop_scheduler(self):
+        for controller in self.controllers:
+            controller.stop_scheduler()
+
+    def discard_queued(self):
+        for controller in self.controllers:
+            controller.discard_queued()
+
+    def queue_servo_angle(self, servo_num, angle):
+        """
+        Confie des consignes aux ordonnanceurs des cartes concernées
+
+        Returns:
+            tuple: (bool, str) - Succès et message associé
+        """
+        per_board, error = self._split(servo_num, angle)
+        if error:
+            return False, error
+        for board, (channels, angles) in per_board.items():
+            success, message = self.controllers[board].queue_servo_angle(channels, angles)
+            if not success:
+                return False, f"[{self.ports[board]}] {message}"
+        return True, "Consigne en attente"
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Commande cartésienne du bras à 4 servos (base, épaule, coude, pince)
+
+Modèle : la base tourne autour de l'axe vertical, l'épaule et le coude
+forment un bras plan à deux segments, la pince ne change pas la position.
+La rotation de la base se calcule directement (atan2) ; il reste à
+résoudre le bras plan, ce que fait une table précalculée :
+
+    - grille des angles épaule × coude (pas de 1° par défaut), avec la
+      position (r, z) de la pince pour chaque couple, calculée une fois
+      avec NumPy et gardée en cache sur disque ;
+    - index spatial : une grille régulière sur (r, z) dont chaque case
+      donne le couple d'angles le plus proche de son centre (case vide :
+      hors d'atteinte) ; la recherche d'un point de départ est un simple
+      accès à un tableau ;
+    - quelques itérations de moindres carrés amortis depuis ce point de départ.
+
+Tout est vectorisé : un chemin entier se résout en un seul appel.
+"""
+import hashlib
+import os
+
+import numpy as np
+
+from trajectory import NUM_SERVOS, play_trajectory
+
+DEFAULT_CACHE_DIRECTORY = '.cache'
+# Amortissement du raffinement (mm par degré) : négligeable loin des singularités
+DAMPING = 0.05
+
+
+class ArmModel:
+    """
+    Géométrie du bras et correspondance entre angles des articulations et des servos
+
+    Articulations (degrés) :
+        - lacet de la base, 0 = bras vers +x, positif vers +y ;
+        - élévation de l'épaule au-dessus de l'horizontale ;
+        - flexion du coude, 0 = avant-bras dans le prolongement du bras,
+          positif = avant-bras replié vers le bas.
+    Un servo vaut zero + direction × articulation.
+    """
+
+    def __init__(self, base_height=70.0, upper_arm=80.0, forearm=80.0, servos=(0, 1, 2, 3),
+                 zeros=(90.0, 0.0, 180.0), directions=(1, 1, -1), limits=((0, 180), (0, 180), (0, 180)),
+                 grip_range=(30, 120)):
+        """
+        Args:
+            base_height (float): Hauteur de l'axe de l'épaule au-dessus du sol (mm)
+            upper_arm (float): Longueur épaule -> coude (mm)
+            forearm (float): Longueur coude -> pointe de la pince (mm)
+            servos (tuple): Numéros des servos (base, épaule, coude, pince)
+            zeros (tuple): Angle de servo de chaque articulation à 0° (base, épaule, coude)
+            directions (tuple): Sens de chaque servo (1 ou -1)
+            limits (tuple): Débattement (min, max) de chaque servo (base, épaule, coude)
+            grip_range (tuple): Angles du servo de pince ouverte et fermée
+        """
+        if upper_arm <= 0 or forearm <= 0:
+            raise ValueError("Les longueurs des segments doivent être strictement positives")
+        self.base_height = float(base_height)
+        self.upper_arm = float(upper_arm)
+        self.forearm = float(forearm)
+        self.servos = tuple(servos)
+        self.zeros = np.asarray(zeros, dtype=float)
+        self.directions = np.asarray(directions, dtype=float)
+        self.limits = np.asarray(limits, dtype=float)
+        self.grip_range = tuple(grip_range)
+
+    def key(self):
+        """
+        Empreinte des paramètres qui déterminent la table (nom du fichier en cache)
+        """
+        values = (self.base_height, self.upper_arm, self.forearm, tuple(self.zeros),
+                  tuple(self.directions), tuple(map(tuple, self.limits)))
+        return hashlib.sha256(repr(values).encode()).hexdigest()[:16]
+
+    def planar(self, shoulder, elbow):
+        """
+        Position (r, z) de la pince pour des angles de servo d'épaule et de coude (tableaux)
+        """
+        a1 = np.radians((shoulder - self.zeros[1]) * self.directions[1])
+        a2 = a1 - np.radians((elbow - self.zeros[2]) * self.directions[2])
+        r = self.upper_arm * np.cos(a1) + self.forearm * np.cos(a2)
+        z = self.base_height + self.upper_arm * np.sin(a1) + self.forearm * np.sin(a2)
+        return r, z
+
+    def forward(self, angles):
+        """
+        Position de la pince pour des angles de servo (base, épaule, coude)
+
+        Args:
+            angles (array): Tableau (..., 3) d'angles de servo
+
+        Returns:
+            ndarray: Tableau (..., 3) des positions x, y, z (mm)
+        """
+        angles = np.asarray(angles, dtype=float)
+        yaw = np.radians((angles[..., 0] - self.zeros[0]) * self.directions[0])
+        r, z = self.planar(angles[..., 1], angles[..., 2])
+        return np.stack((r * np.cos(yaw), r * np.sin(yaw), z), axis=-1)
+
+    def grip_angle(self, grip):
+        """
+        Angle du servo de pince pour une fermeture entre 0 (ouverte) et 1 (fermée)
+        """
+        grip = min(1.0, max(0.0, float(grip)))
+        opened, closed = self.grip_range
+        return opened + grip * (closed - opened)
+
+
+class IKSolver:
+    """
+    Cinématique inverse par table précalculée, index spatial et raffinement itératif
+    """
+
+    def __init__(self, model, resolution=1.0, cell=2.0, iterations=4, tolerance=0.5,
+                 cache_dir=DEFAULT_CACHE_DIRECTORY):
+        """
+        Args:
+            model (ArmModel): Géométrie du bras
+            resolution (float): Pas de la grille d'angles (degrés)
+            cell (float): Taille des cases de l'index spatial (mm)
+            iterations (int): Itérations de raffinement après la recherche du point de départ
+            tolerance (float): Écart maximal accepté entre la pince et la cible (mm)
+            cache_dir (str): Répertoire du cache de la table (None : pas de cache)
+        """
+        self.model = model
+        self.resolution = resolution
+        self.cell = cell
+        self.iterations = iterations
+        self.tolerance = tolerance
+        self.cache_dir = cache_dir
+        self.joints, self.seeds, self.origin = self._load_or_build()
+
+    def _cache_path(self):
+        name = f"ik-{self.model.key()}-{self.resolution:g}-{self.cell:g}.npz"
+        return os.path.join(self.cache_dir, name)
+
+    def _load_or_build(self):
+        path = self._cache_path() if self.cache_dir else None
+        if path and os.path.exists(path):
+            with np.load(path) as data:
+                return data['joints'], data['seeds'], data['origin']
+        joints, seeds, origin = self._build()
+        if path:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Écriture atomique : un autre processus ne lit jamais une table à moitié écrite
+            temporary = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez(temporary, joints=joints, seeds=seeds, origin=origin)
+            os.replace(temporary, path)
+        return joints, seeds, origin
+
+    def _build(self):
+        """
+        Calcule la table des angles et l'index spatial (r, z) -> point de départ
+        """
+        model = self.model
+        (low1, high1), (low2, high2) = model.limits[1], model.limits[2]
+        shoulder, elbow = np.meshgrid(np.arange(low1, high1 + 1e-9, self.resolution),
+                                      np.arange(low2, high2 + 1e-9, self.resolution), indexing='ij')
+        joints = np.stack((shoulder.ravel(), elbow.ravel()), axis=1).astype(np.float32)
+        r, z = model.planar(joints[:, 0].astype(float), joints[:, 1].astype(float))
+
+        # Grille régulière couvrant tout le disque atteignable (r peut être négatif : vers l'arrière)
+        reach = model.upper_arm + model.forearm
+        origin = np.array([-reach, model.base_height - reach]) - self.cell
+        size = int(np.ceil((2 * reach) / self.cell)) + 3
+        column = ((r - origin[0]) / self.cell).astype(np.int64)
+        row = ((z - origin[1]) / self.cell).astype(np.int64)
+        cells = row * size + column
+
+        # Pour chaque case, le point de la table le plus proche de son centre
+        centre_r = origin[0] + (column + 0.5) * self.cell
+        centre_z = origin[1] + (row + 0.5) * self.cell
+        distance = np.hypot(r - centre_r, z - centre_z)
+        order = np.lexsort((distance, cells))
+        first_cells, first = np.unique(cells[order], return_index=True)
+        seeds = np.full(size * size, -1, dtype=np.int32)
+        seeds[first_cells] = order[first].astype(np.int32)
+        seeds = seeds.reshape(size, size)
+
+        # Bouche les cases vides isolées (échantillonnage) avec la case voisine ;
+        # les grandes zones vides restent hors d'atteinte
+        for _ in range(2):
+            empty = seeds < 0
+            padded = np.pad(seeds, 1, constant_values=-1)
+            for dr, dc in ((0, 1), (1, 0), (1, 2), (2, 1)):
+                neighbour = padded[dr:dr + size, dc:dc + size]
+                fill = empty & (neighbour >= 0)
+                seeds[fill] = neighbour[fill]
+                empty &= ~fill
+        return joints, seeds, origin
+
+    def solve_many(self, points):
+        """
+        Résout un lot de positions en une passe vectorisée
+
+        Args:
+            points (array): Tableau (N, 3) de positions x, y, z (mm)
+
+        Returns:
+            tuple: (angles, atteignables) - tableau (N, 3) des angles de servo
+                   (base, épaule, coude) et masque booléen des points atteints
+        """
+        model = self.model
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        x, y, z = points[:, 0], points[:, 1], points[:, 2]
+
+        # Base : calcul direct ; si l'angle sort du débattement, on vise à l'opposé, bras vers l'arrière
+        r = np.hypot(x, y)
+        yaw = np.degrees(np.arctan2(y, x))
+        base = model.zeros[0] + model.directions[0] * yaw
+        low, high = model.limits[0]
+        behind = (base < low) | (base > high)
+        yaw = np.where(behind, np.where(yaw > 0, yaw - 180.0, yaw + 180.0), yaw)
+        base = model.zeros[0] + model.directions[0] * yaw
+        r = np.where(behind, -r, r)
+
+        # Point de départ : une lecture dans l'index spatial
+        size = self.seeds.shape[0]
+        column = np.floor((r - self.origin[0]) / self.cell).astype(np.int64)
+        row = np.floor((z - self.origin[1]) / self.cell).astype(np.int64)
+        inside = (column >= 0) & (column < size) & (row >= 0) & (row < size)
+        seed = np.full(len(points), -1, dtype=np.int64)
+        seed[inside] = self.seeds[row[inside], column[inside]]
+        found = seed >= 0
+        q = self.joints[np.where(found, seed, 0)].astype(float)
+
+        # Raffinement : moindres carrés amortis (Levenberg), qui restent stables près
+        # du bras tendu où la jacobienne devient singulière
+        k1 = np.radians(model.directions[1])
+        k2 = np.radians(model.directions[2])
+        lower, upper = model.limits[1:, 0], model.limits[1:, 1]
+        damping = DAMPING ** 2
+        for _ in range(self.iterations):
+            a1 = np.radians((q[:, 0] - model.zeros[1]) * model.directions[1])
+            a2 = a1 - np.radians((q[:, 1] - model.zeros[2]) * model.directions[2])
+            s1, c1 = model.upper_arm * np.sin(a1), model.upper_arm * np.cos(a1)
+            s2, c2 = model.forearm * np.sin(a2), model.forearm * np.cos(a2)
+            error_r = c1 + c2 - r
+            error_z = model.base_height + s1 + s2 - z
+            # d(r, z) / d(épaule, coude), en mm par degré de servo
+            j11, j12 = -(s1 + s2) * k1, s2 * k2
+            j21, j22 = (c1 + c2) * k1, -c2 * k2
+            # Pas = Jᵀ (J Jᵀ + λ² I)⁻¹ e, avec la matrice 2×2 inversée explicitement
+            m11 = j11 * j11 + j12 * j12 + damping
+            m12 = j11 * j21 + j12 * j22
+            m22 = j21 * j21 + j22 * j22 + damping
+            det = m11 * m22 - m12 * m12
+            w1 = (m22 * error_r - m12 * error_z) / det
+            w2 = (m11 * error_z - m12 * error_r) / det
+            q[:, 0] -= j11 * w1 + j21 * w2
+            q[:, 1] -= j12 * w1 + j22 * w2
+            np.clip(q, lower, upper, out=q)
+
+        reached_r, reached_z = model.planar(q[:, 0], q[:, 1])
+        error = np.hypot(reached_r - r, reached_z - z)
+        reachable = found & (error <= self.tolerance)
+        return np.column_stack((base, q)), reachable
+
+    def solve(self, x, y, z):
+        """
+        Résout une position
+
+        Returns:
+            list or None: Angles de servo [base, épaule, coude], None si hors d'atteinte
+        """
+        angles, reachable = self.solve_many([(x, y, z)])
+        return angles[0].tolist() if reachable[0] else None
+
+
+class Arm:
+    """
+    Commande cartésienne d'un bras branché sur un contrôleur
+    """
+
+    def __init__(self, controller, model=None, solver=None):
+        """
+        Args:
+            controller (ArduinoServoController): Contrôleur connecté
+            model (ArmModel): Géométrie (valeurs par défaut si None)
+            solver (IKSolver): Solveur déjà construit (sinon construit depuis le modèle)
+        """
+        self.controller = controller
+        self.model = model or (solver.model if solver else ArmModel())
+        self.solver = solver or IKSolver(self.model)
+
+    def move_to(self, x, y, z, grip=None, wait=False):
+        """
+        Place la pince en (x, y, z), en une seule trame combinée
+
+        Args:
+            x, y, z (float): Position cible (mm)
+            grip (float): Fermeture de la pince entre 0 et 1 (None : inchangée)
+            wait (bool): Attendre la réponse de l'Arduino
+
+        Returns:
+            tuple: (bool, str) - Succès et message associé (comme set_servo_angle)
+        """
+        angles = self.solver.solve(x, y, z)
+        if angles is None:
+            return False, f"Position ({x:.1f}, {y:.1f}, {z:.1f}) hors d'atteinte"
+        servos = list(self.model.servos[:3])
+        values = [int(round(a)) for a in angles]
+        if grip is not None:
+            servos.append(self.model.servos[3])
+            values.append(int(round(self.model.grip_angle(grip))))
+        return self.controller.set_servo_angle(servos, values, multi_servo=True, wait=wait)
+
+    def position(self):
+        """
+        Position actuelle de la pince d'après les derniers angles commandés
+
+        Returns:
+            list or None: [x, y, z] (mm), None si un angle est inconnu
+        """
+        current = self.controller.current_angles
+        angles = [current[servo] for servo in self.model.servos[:3]]
+        if any(angle is None for angle in angles):
+            return None
+        return self.model.forward(angles).tolist()
+
+    def follow_path(self, points, rate_hz=50, grip=None):
+        """
+        Suit un chemin cartésien échantillonné : tous les points sont résolus en un lot,
+        puis envoyés à fréquence fixe (voir trajectory.play_trajectory)
+
+        Args:
+            points (array): Tableau (N, 3) des positions, une par pas de 1/rate_hz s
+            rate_hz (float): Fréquence des trames (Hz)
+            grip (float): Fermeture de la pince pendant le chemin (None : inchangée)
+
+        Returns:
+            tuple: (bool, PlaybackStats ou str) - Succès et statistiques de la lecture
+        """
+        angles, reachable = self.solver.solve_many(points)
+        if not reachable.all():
+            index = int(np.argmin(reachable))
+            return False, f"Point {index} du chemin hors d'atteinte: {np.asarray(points)[index].tolist()}"
+        current = [90 if angle is None else angle for angle in self.controller.current_angles]
+        setpoints = np.tile(np.asarray(current[:NUM_SERVOS], dtype=float), (len(angles), 1))
+        setpoints[:, list(self.model.servos[:3])] = angles
+        if grip is not None:
+            setpoints[:, self.model.servos[3]] = self.model.grip_angle(grip)
+        return play_trajectory(self.controller, setpoints, rate_hz)
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Macros du mode interpréteur, compilées en plans de trames pré-encodées
+
+Langage (les retours à la ligne sont de simples espaces, ';' est facultatif) :
+
+    def vague(servo, bas, haut) {   # macro avec paramètres
+        a(servo, bas)
+        wait 200                    # pause en millisecondes
+        repeat 3 {
+            servo:haut, 3:90        # syntaxe servo:angle
+            wait 100
+            a(servo, bas)
+            wait 100
+        }
+    }
+    vague(0, 10, 170)               # appel
+    reset                           # tous les servos à 90°
+
+Un appel est compilé une seule fois en plan : la suite à plat des trames,
+validées et encodées par le contrôleur, avec leur instant de départ. Les
+plans sont gardés dans un cache LRU indexé par (macro, arguments) ; un
+nouvel appel rejoue directement les octets, sans analyse ni mise en forme.
+"""
+import re
+import time
+from collections import OrderedDict, namedtuple
+
+from script_runner import ReplyPipeline
+
+# Garde-fou contre les boucles qui produiraient des plans démesurés
+MAX_PLAN_FRAMES = 100000
+MAX_CALL_DEPTH = 32
+KEYWORDS = ('def', 'repeat', 'wait', 'reset', 'a')
+
+TOKEN_PATTERN = re.compile(r"""
+      (?P<number>[-+]?\d+)
+    | (?P<name>[A-Za-z_]\w*)
+    | (?P<symbol>[(){},:;])
+    | (?P<comment>\#.*)
+    | (?P<space>\s+)
+    | (?P<error>.)
+""", re.VERBOSE)
+
+Token = namedtuple('Token', 'kind value line')
+
+# Plan compilé : trames (instant en secondes, trame préparée) et durée totale
+MacroPlan = namedtuple('MacroPlan', 'steps duration')
+
+
+class MacroError(ValueError):
+    """
+    Erreur de syntaxe ou de contenu d'une macro
+    """
+
+    def __init__(self, line_number, message):
+        super().__init__(f"ligne {line_number}: {message}")
+        self.line_number = line_number
+
+
+def tokenize(text, first_line=1):
+    """
+    Découpe un texte en jetons (nombre, nom, symbole) numérotés par ligne
+
+    Raises:
+        MacroError: Caractère inattendu
+    """
+    tokens = []
+    for number, line in enumerate(text.splitlines(), start=first_line):
+        for match in TOKEN_PATTERN.finditer(line):
+            kind = match.lastgroup
+            if kind == 'number':
+                tokens.append(Token(kind, int(match.group()), number))
+            elif kind in ('name', 'symbol'):
+                tokens.append(Token(kind, match.group(), number))
+            elif kind == 'error':
+                raise MacroError(number, f"caractère inattendu '{match.group()}'")
+    return tokens
+
+
+class _Parser:
+    """
+    Analyse descendante des jetons en instructions
+
+    Instructions produites (tuples) :
+        ('frame', ligne, [(servo, angle), ...])   servo et angle : entier ou nom de paramètre
+        ('reset', ligne)
+        ('wait', ligne, durée_ms)
+        ('repeat', ligne, nombre, instructions)
+        ('call', ligne, nom, [arguments])
+        ('def', ligne, nom, [paramètres], instructions)
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            last = self.tokens[-1].line if self.tokens else 1
+            raise MacroError(last, "fin de texte inattendue")
+        self.position += 1
+        return token
+
+    def expect(self, symbol):
+        token = self.next()
+        if token.value != symbol or token.kind != 'symbol':
+            raise MacroError(token.line, f"'{symbol}' attendu au lieu de '{token.value}'")
+        return token
+
+    def value(self):
+        token = self.next()
+        if token.kind == 'number' or (token.kind == 'name' and token.value not in KEYWORDS):
+            return token.value
+        raise MacroError(token.line, f"nombre ou paramètre attendu au lieu de '{token.value}'")
+
+    def values(self, closing):
+        """
+        Liste de valeurs séparées par des virgules, jusqu'au symbole fermant
+        """
+        values = []
+        if self.peek() is not None and self.peek().value == closing:
+            self.next()
+            return values
+        while True:
+            values.append(self.value())
+            token = self.next()
+            if token.value == closing:
+                return values
+            if token.value != ',':
+                raise MacroError(token.line, f"',' ou '{closing}' attendu au lieu de '{token.value}'")
+
+    def block(self):
+        """
+        Instructions entre accolades
+        """
+        self.expect('{')
+        statements = []
+        while True:
+            token = self.peek()
+            if token is None:
+                raise MacroError(self.tokens[-1].line, "'}' manquante")
+            if token.value == '}' and token.kind == 'symbol':
+                self.next()
+                return statements
+            statement = self.statement(top_level=False)
+            if statement:
+                statements.append(statement)
+
+    def statement(self, top_level=True):
+        token = self.next()
+        line = token.line
+        if token.kind == 'symbol' and token.value == ';':
+            return None
+        following = self.peek()
+        is_call = following is not None and following.value == '('
+        if token.kind == 'name' and token.value == 'def':
+            if not top_level:
+                raise MacroError(line, "'def' n'est permis qu'au premier niveau")
+            name = self.next()
+            if name.kind != 'name' or name.value in KEYWORDS:
+                raise MacroError(line, f"nom de macro invalide '{name.value}'")
+            self.expect('(')
+            params = self.values(')')
+            if any(not isinstance(p, str) for p in params) or len(set(params)) != len(params):
+                raise MacroError(line, f"paramètres invalides pour '{name.value}'")
+            return ('def', line, name.value, params, self.block())
+        if token.kind == 'name' and token.value == 'repeat':
+            return ('repeat', line, self.value(), self.block())
+        if token.kind == 'name' and token.value == 'wait':
+            return ('wait', line, self.value())
+        if token.kind == 'name' and token.value == 'reset':
+            return ('reset', line)
+        if token.kind == 'name' and token.value == 'a' and is_call:
+            self.next()
+            args = self.values(')')
+            if not args or len(args) % 2:
+                raise MacroError(line, "a(...) attend des paires servo, angle")
+            return ('frame', line, list(zip(args[::2], args[1::2])))
+        if token.kind == 'name' and is_call:
+            self.next()
+            return ('call', line, token.value, self.values(')'))
+        if following is not None and following.value == ':':
+            # Paires servo:angle séparées par des virgules
+            self.position -= 1
+            pairs = []
+            while True:
+                servo = self.value()
+                self.expect(':')
+                pairs.append((servo, self.value()))
+                after = self.peek()
+                if after is None or after.value != ',':
+                    return ('frame', line, pairs)
+                self.next()
+        raise MacroError(line, f"instruction inconnue '{token.value}'")
+
+    def parse(self):
+        statements = []
+        while self.peek() is not None:
+            statement = self.statement()
+            if statement:
+                statements.append(statement)
+        return statements
+
+
+def parse(text, first_line=1):
+    """
+    Analyse un texte de macros
+
+    Returns:
+        list: Instructions (voir _Parser)
+
+    Raises:
+        MacroError: Erreur de syntaxe (avec son numéro de ligne)
+    """
+    return _Parser(tokenize(text, first_line)).parse()
+
+
+class _PlanBuilder:
+    """
+    Accumule des trames datées pendant la compilation
+    """
+
+    def __init__(self):
+        self.steps = []
+        self.t = 0.0
+
+    def add_frame(self, frame, line):
+        if len(self.steps) >= MAX_PLAN_FRAMES:
+            raise MacroError(line, f"plan trop long (plus de {MAX_PLAN_FRAMES} trames)")
+        self.steps.append((self.t, frame))
+
+    def extend(self, plan, line):
+        if len(self.steps) + len(plan.steps) > MAX_PLAN_FRAMES:
+            raise MacroError(line, f"plan trop long (plus de {MAX_PLAN_FRAMES} trames)")
+        offset = self.t
+        self.steps.extend((offset + t, frame) for t, frame in plan.steps)
+        self.t += plan.duration
+
+    def plan(self):
+        return MacroPlan(tuple(self.steps), self.t)
+
+
+class MacroLibrary:
+    """
+    Macros définies dans l'interpréteur et cache LRU de leurs plans compilés
+    """
+
+    def __init__(self, controller, cache_size=64):
+        """
+        Args:
+            controller: ArduinoServoController ou ControllerPool (encode les trames)
+            cache_size (int): Nombre de plans (macro, arguments) gardés en cache
+        """
+        self.controller = controller
+        self.cache_size = cache_size
+        self.macros = {}  # Nom -> (paramètres, instructions)
+        self.cache = OrderedDict()  # (nom, arguments) -> MacroPlan, du moins au plus récent
+        self.hits = 0
+        self.misses = 0
+        self.compiling = []  # Pile des macros en cours de compilation (récursion)
+
+    def define(self, name, params, body):
+        """
+        Définit (ou redéfinit) une macro ; les plans en cache sont oubliés,
+        car ils peuvent contenir l'ancienne définition
+        """
+        self.macros[name] = (list(params), body)
+        self.cache.clear()
+
+    def plan(self, name, args, line=0):
+        """
+        Renvoie le plan d'un appel de macro, compilé au premier appel puis lu dans le cache
+
+        Raises:
+            MacroError: Macro inconnue, arguments ou valeurs invalides
+        """
+        key = (name, tuple(args))
+        plan = self.cache.get(key)
+        if plan is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return plan
+        self.misses += 1
+        if name not in self.macros:
+            raise MacroError(line, f"macro inconnue '{name}'")
+        params, body = self.macros[name]
+        if len(args) != len(params):
+            raise MacroError(line, f"'{name}' attend {len(params)} argument(s), {len(args)} donné(s)")
+        if name in self.compiling or len(self.compiling) >= MAX_CALL_DEPTH:
+            raise MacroError(line, f"appel récursif de '{name}'")
+        self.compiling.append(name)
+        try:
+            plan = self.compile(body, dict(zip(params, args)))
+        finally:
+            self.compiling.pop()
+        self.cache[key] = plan
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return plan
+
+    def compile(self, statements, env=None):
+        """
+        Compile des instructions en plan de trames pré-encodées
+
+        Args:
+            statements (list): Instructions rendues par parse (sans 'def')
+            env (dict): Valeurs des paramètres
+
+        Returns:
+            MacroPlan: Trames datées et durée totale
+        """
+        builder = _PlanBuilder()
+        self._compile_into(builder, statements, env or {})
+        return builder.plan()
+
+    def _resolve(self, value, env, line):
+        if isinstance(value, int):
+            return value
+        if value not in env:
+            raise MacroError(line, f"paramètre inconnu '{value}'")
+        return env[value]
+
+    def _frame(self, servos, angles, line):
+        success, frame = self.controller.prepare_frame(servos, angles)
+        if not success:
+            raise MacroError(line, frame)
+        return frame
+
+    def _compile_into(self, builder, statements, env):
+        for statement in statements:
+            kind, line = statement[0], statement[1]
+            if kind == 'frame':
+                servos = [self._resolve(s, env, line) for s, _ in statement[2]]
+                angles = [self._resolve(a, env, line) for _, a in statement[2]]
+                builder.add_frame(self._frame(servos, angles, line), line)
+            elif kind == 'reset':
+                servos = list(range(self.controller.num_servos))
+                builder.add_frame(self._frame(servos, [90] * len(servos), line), line)
+            elif kind == 'wait':
+                duration = self._resolve(statement[2], env, line)
+                if duration < 0:
+                    raise MacroError(line, f"durée négative ({duration} ms)")
+                builder.t += duration / 1000.0
+            elif kind == 'repeat':
+                count = self._resolve(statement[2], env, line)
+                if count < 0:
+                    raise MacroError(line, f"nombre de répétitions négatif ({count})")
+                # Le corps est compilé une fois puis recopié : les trames sont partagées
+                body = self.compile(statement[3], env)
+                for _ in range(count):
+                    builder.extend(body, line)
+            elif kind == 'call':
+                args = [self._resolve(value, env, line) for value in statement[3]]
+                builder.extend(self.plan(statement[2], args, line), line)
+            else:
+                raise MacroError(line, "'def' n'est permis qu'au premier niveau")
+
+    def execute(self, text, first_line=1):
+        """
+        Exécute un texte de l'interpréteur : enregistre ses définitions puis joue le reste
+
+        Returns:
+            tuple: (bool, str) - Succès et résumé (ou message d'erreur)
+        """
+        try:
+            statements = parse(text, first_line)
+            for statement in statements:
+                if statement[0] == 'def':
+                    self.define(*statement[2:])
+            actions = [statement for statement in statements if statement[0] != 'def']
+            if not actions:
+                return True, f"Macros définies: {', '.join(sorted(self.macros))}"
+            plan = self.compile(actions)
+        except MacroError as e:
+            return False, str(e)
+        return play_plan(self.controller, plan)
+
+
+def frame_size(frame):
+    """
+    Octets d'une trame préparée (une carte) ou d'un ensemble de trames (plusieurs cartes)
+    """
+    if isinstance(frame, dict):
+        return sum(frame_size(board_frame) for board_frame in frame.values())
+    return len(frame.data) if frame.data is not None else 4 + len(frame.servos)
+
+
+def play_plan(controller, plan, pipeline=None, clock=time.monotonic, sleep=time.sleep):
+    """
+    Joue un plan : chaque trame part à son instant, sans encodage sur le chemin critique
+
+    Les instants sont absolus (depuis le début du plan) : le temps d'écriture
+    ne s'ajoute pas aux pauses.
+
+    Args:
+        controller: Contrôleur qui a préparé les trames du plan
+        plan (MacroPlan): Plan compilé
+        pipeline (ReplyPipeline): Limite des octets en vol (tampon de l'Arduino par défaut)
+
+    Returns:
+        tuple: (bool, str) - Succès et résumé (ou message d'erreur)
+    """
+    if not controller.is_connected():
+        return False, "Non connecté à l'Arduino"
+    pipeline = pipeline or ReplyPipeline()
+    start = clock()
+    for t, frame in plan.steps:
+        delay = start + t - clock()
+        if delay > 0:
+            sleep(delay)
+        size = frame_size(frame)
+        pipeline.make_room(size)
+        success, result = controller.send_frame(frame)
+        if not success and pipeline.settle_oldest():
+            success, result = controller.send_frame(frame)
+        if not success:
+            return False, f"Erreur à t={t:.3f} s: {result}"
+        pipeline.add(result, size)
+    delay = start + plan.duration - clock()
+    if delay > 0:
+        sleep(delay)
+    pipeline.drain()
+    summary = f"{len(plan.steps)} trames en {clock() - start:.2f} s"
+    if pipeline.missing:
+        return False, f"{summary}, {pipeline.missing} sans réponse de l'Arduino"
+    return True, summary
@@ -9,7 +9,19 @@ import re        # Module pour les expressions régulières (pour analyser les c
 import sys       # Donne accès à des fonctions liées au système
 import time      # Permet d'utiliser des fonctions liées au temps (comme des pauses)
 import os        # Permet d'interagir avec le système d'exploitation
+import argparse  # Analyse des arguments de la ligne de commande (ports, options)
 from arduino_servo_controller import ArduinoServoController  # Importe notre classe spécifique qui communique avec l'Arduino
+from playback import DeadlinePlayer, controller_sender  # Lecture des séquences à échéances fixes (sans dérive)
+from choreography import list_choreographies, play_choreography  # Chorégraphies stockées dans des fichiers .choreo
+from recorder import SessionRecorder, new_recording_path, list_recordings, replay_recording  # Enregistrement des sessions
+from controller_pool import ControllerPool  # Plusieurs cartes Arduino vues comme un seul contrôleur
+from metrics import Metrics  # Mesures de la liaison (compteurs, latences) exportables pour Prometheus
+from wire_trace import WireTrace  # Trace binaire des échanges avec l'Arduino
+from terminal_ui import RawTerminal, StatusScreen, clear_screen as terminal_clear_screen  # Affichage plein écran
+from velocity_control import VelocityJog  # Mode vitesse : maintenir une touche pour bouger un servo
+from script_runner import ScriptError, parse_script, run_script, script_poses  # Exécution de scripts sans interaction
+from macros import MacroLibrary  # Macros, boucles et pauses du mode interpréteur
+from command_queue import CommandQueue, JobCancelled  # Séquences en arrière-plan et commandes prioritaires
 
 # ===== DÉTECTION DES CAPACITÉS DU SYSTÈME =====
 # Cette partie essaie d'importer des modules pour la gestion du clavier
@@ -18,7 +30,7 @@ try:
     # Ces modules sont nécessaires pour lire les touches du clavier en temps réel
     import termios    # Pour contrôler les paramètres du terminal
     import tty        # Pour mettre le terminal en mode "raw" (lire touches sans appuyer sur Entrée)
-    import select     # Pour vérifier si une touche est disponible sans bloquer
+    import selectors  # Pour surveiller le clavier et l'Arduino dans une seule boucle
     KEYBOARD_AVAILABLE = True  # Si tous les imports réussissent, on note que le clavier est disponible
 except ImportError:
     # Si un des modules n'est pas disponible
@@ -26,46 +38,55 @@ except ImportError:
     print("Module termios non disponible. Le mode interactif pourrait ne pas fonctionner correctement.")
     # On informe l'utilisateur du problème potentiel
 
-# ===== FONCTION POUR LIRE UNE TOUCHE =====
-def getch():
-    """Lit un seul caractère du clavier sans attendre la touche Entrée"""
-    # Cette fonction lit une touche du clavier sans que l'utilisateur doive appuyer sur Entrée
-    
-    if not KEYBOARD_AVAILABLE:
-        # Si les modules de gestion du clavier ne sont pas disponibles
-        return input("Appuyez sur une touche > ")  # On utilise input() comme alternative
-    
-    # Si les modules sont disponibles, on utilise une méthode plus avancée
-    fd = sys.stdin.fileno()  # Obtient l'identifiant du flux d'entrée standard (clavier)
-    old_settings = termios.tcgetattr(fd)  # Sauvegarde les paramètres actuels du terminal
-    try:
-        tty.setraw(fd)  # Met le terminal en mode "raw" pour lire les touches directement
-        # Vérifie si une touche est disponible dans les 0.1 secondes
-        if select.select([sys.stdin], [], [], 0.1)[0]:
-            ch = sys.stdin.read(1)  # Lit un caractère
-        else:
-            ch = None  # Aucune touche n'a été pressée
-    finally:
-        # Restaure les paramètres originaux du terminal, même si une erreur survient
-        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-    return ch  # Renvoie le caractère lu ou None
+# Le moteur de trajectoires a besoin de NumPy ; sans lui, les séquences utilisent des boucles simples
+try:
+    from trajectory import plan_trajectory, play_trajectory
+    TRAJECTORY_AVAILABLE = True
+except ImportError:
+    TRAJECTORY_AVAILABLE = False
 
 # ===== FONCTION POUR EFFACER L'ÉCRAN =====
 def clear_screen():
     """Efface l'écran du terminal"""
     # Cette fonction efface tout le contenu du terminal pour avoir un affichage propre
-    # Elle utilise la commande appropriée selon le système d'exploitation
-    os.system('cls' if os.name == 'nt' else 'clear')
-    # 'cls' est la commande pour Windows ('nt')
-    # 'clear' est la commande pour Linux/Mac (systèmes Unix)
+    # Elle envoie directement la séquence ANSI d'effacement au terminal, sans lancer
+    # de sous-processus comme le ferait os.system('clear')
+    sys.stdout.flush()  # Vide d'abord ce que print() a mis en attente
+    terminal_clear_screen(sys.stdout.fileno())
 
-# ===== MODE INTERACTIF =====
-#!/usr/bin/env python3
-# Les imports et les fonctions précédentes restent inchangés
-# Modification du mode interactif et du mode interpréteur
+# ===== SÉQUENCES EN ARRIÈRE-PLAN =====
+# Les séquences lancées depuis le menu tournent dans leur propre thread (voir command_queue.py) ;
+# leur bilan est gardé ici et affiché par le mode en cours (menu, interpréteur ou interactif)
+job_reports = []
+
+def report_job(job):
+    """Note le bilan d'une séquence terminée (appelé depuis le thread de la séquence)"""
+    try:
+        result = job.wait()
+    except JobCancelled:
+        job_reports.append(f"Séquence {job.number} ({job.name}) annulée")
+        return
+    except Exception as e:
+        job_reports.append(f"Séquence {job.number} ({job.name}) interrompue: {e}")
+        return
+    # Les lectures rendent (succès, statistiques) ; les séquences d'exemple leurs seules statistiques
+    if isinstance(result, tuple):
+        success, stats = result
+        result = stats if success else f"Erreur: {stats}"
+    job_reports.append(f"Séquence {job.number} ({job.name}) terminée: {result}")
+
+def print_job_reports():
+    """Affiche les bilans des séquences terminées depuis le dernier affichage"""
+    while job_reports:
+        print(job_reports.pop(0))
 
 # ===== MODE INTERACTIF =====
-def interactive_mode(controller):
+# Réglages du mode vitesse (touche 'v'), un élément par servo
+JOG_MAX_SPEED = [90, 90, 90, 90]       # Vitesse maximale de chaque servo (degrés par seconde)
+JOG_ACCELERATION = [360, 360, 360, 360]  # Accélération et freinage (degrés par seconde²)
+JOG_RATE_HZ = 50                        # Nombre fixe de trames envoyées par seconde pendant un mouvement
+
+def interactive_mode(controller, commands):
     """Mode interactif utilisant les touches pour contrôler les servos"""
     
     # Tableau des angles des servos
@@ -85,96 +106,282 @@ def interactive_mode(controller):
         'p': (0, 1)    # Servo 4 (O/P) augmente
     }
     
+    # Démarrer l'ordonnanceur : une consigne part aussitôt si le port est libre ;
+    # pendant une rafale de touches, seule la dernière consigne de chaque servo est envoyée.
+    # Ses trames passent par la file de commandes : 'r' et 'x' abandonnent celles en attente
+    controller.start_scheduler(rate_hz=50, commands=commands)
+    
     # Initialiser tous les servos à 90 degrés (position centrale)
-    for i in range(4):
-        controller.set_servo_angle(i, angles[i])
-        time.sleep(0.1)
+    controller.queue_servo_angle([0, 1, 2, 3], angles)
     
-    clear_screen()
+    # Enregistreur de session (None tant que l'enregistrement n'est pas activé avec 'e')
+    recorder = None
     
-    # Affichage des instructions
-    print("=== Mode Interactif Avancé ===")
-    print("Contrôle des servos :")
-    print("  Servo 1 (L/M): Diminuer/Augmenter")
-    print("  Servo 2 (J/K): Diminuer/Augmenter")
-    print("  Servo 3 (U/I): Diminuer/Augmenter")
-    print("  Servo 4 (O/P): Diminuer/Augmenter")
-    print("  +/-: Modifier le pas de changement d'angle")
-    print("  r: Réinitialiser tous les servos à 90°")
-    print("  q: Quitter le mode interactif")
-    
-    # Boucle principale du mode interactif
-    while True:
-        # Afficher l'état actuel des servos
-        print("\n" + "-" * 40)
-        print(f"Pas de changement: {step}°")
-        
-        # Affichage des angles pour tous les servos
-        print("Angles des servos:", end=" ")
-        for i, angle in enumerate(angles):
-            print(f"{i+1}:{angle}°", end=" ")
-        print("\n" + "-" * 40)
+    # Mode vitesse : tant qu'une touche est maintenue, le servo se déplace à vitesse
+    # constante (après une rampe d'accélération). Une boucle à fréquence fixe calcule
+    # les positions et envoie une seule trame pour tous les servos à chaque pas.
+    velocity_mode = False
+    
+    def send_jog(changed):
+        """Reçoit les angles calculés par le mode vitesse et les envoie en une trame"""
+        for servo, angle in changed.items():
+            angles[servo] = angle
+        success, _ = controller.queue_servo_angle(list(changed), list(changed.values()))
+        if not success:
+            screen.set('message', "Erreur lors de l'envoi des angles")
+        elif recorder:
+            recorder.record(angles)
+    
+    jog = VelocityJog(send_jog, rate_hz=JOG_RATE_HZ, max_speed=JOG_MAX_SPEED,
+                      acceleration=JOG_ACCELERATION, initial_angles=angles)
+    
+    # Écran : lignes fixes (instructions) puis champs redessinés seulement s'ils changent
+    instructions = [
+        "=== Mode Interactif Avancé ===",
+        "Contrôle des servos :",
+        "  Servo 1 (L/M): Diminuer/Augmenter",
+        "  Servo 2 (J/K): Diminuer/Augmenter",
+        "  Servo 3 (U/I): Diminuer/Augmenter",
+        "  Servo 4 (O/P): Diminuer/Augmenter",
+        "  +/-: Modifier le pas (ou la vitesse en mode vitesse)",
+        "  v: Basculer entre mode pas à pas et mode vitesse (maintenir la touche)",
+        "  r: Réinitialiser tous les servos à 90° (arrête aussi les séquences en cours)",
+        "  x: Arrêter les séquences en cours (les servos restent où ils sont)",
+        "  e: Démarrer/arrêter l'enregistrement de la session",
+        "  q: Quitter le mode interactif",
+        "-" * 40,
+    ]
+    first_row = len(instructions) + 1  # Les lignes du terminal sont numérotées à partir de 1
+    screen = StatusScreen(sys.stdout.fileno())
+    screen.add_field('step', first_row)       # Pas de changement
+    screen.add_field('angles', first_row + 1)  # Angles commandés
+    screen.add_field('confirmed', first_row + 2)  # Angles confirmés par l'Arduino
+    screen.add_field('message', first_row + 3)  # Dernier message (erreur, enregistrement...)
+    
+    def render():
+        """Met à jour les champs d'état ; seuls ceux qui ont changé sont réécrits"""
+        confirmed = controller.confirmed_angles
+        if velocity_mode:
+            screen.set('step', f"Mode vitesse: {jog.max_speed[0]:.0f}°/s")
+        else:
+            screen.set('step', f"Pas de changement: {step}°")
+        screen.set('angles', "Angles des servos: " + " ".join(f"{i+1}:{a}°" for i, a in enumerate(angles)))
+        screen.set('confirmed', "Confirmés Arduino: " + " ".join(
+            f"{i+1}:{'?' if confirmed[i] is None else confirmed[i]}°" for i in range(len(angles))))
+        if job_reports:
+            screen.set('message', job_reports.pop())  # Fin d'une séquence lancée depuis le menu
+            job_reports.clear()
+        screen.flush()  # Une seule écriture sur le terminal
+    
+    def handle_key(key):
+        """Traite une touche ; renvoie False pour quitter le mode interactif"""
+        nonlocal angles, step, recorder, velocity_mode
         
-        # Lire une touche du clavier
-        key = getch()
+        # Gestion des touches pressées ('\x03' : Ctrl+C, qui n'interrompt plus en mode brut)
+        if key in ['q', 'Q', '\x03']:
+            controller.stop_scheduler()  # Envoie les dernières consignes puis arrête l'ordonnanceur
+            if recorder:
+                recorder.end()  # Écrit la fin de l'enregistrement en cours
+                screen.set('message', f"Enregistrement sauvegardé dans {recorder.path}")
+            return False
         
-        if not key:  # Si aucune touche n'a été pressée
-            continue
-            
-        # Gestion des touches pressées
-        if key in ['q', 'Q']:
-            print("Sortie du mode interactif")
-            break
+        # En mode vitesse, une touche de servo ne fait que noter l'appui :
+        # le mouvement est calculé par la boucle à fréquence fixe (jog.tick)
+        if velocity_mode and key in key_servo_mapping:
+            servo, direction = key_servo_mapping[key]
+            jog.press(servo, direction)
         
         # Modification des servos
-        if key in key_servo_mapping:
+        elif key in key_servo_mapping:
             servo, direction = key_servo_mapping[key]
             
-            # Calculer le nouvel angle
-            new_angle = angles[servo] + (step * direction)
-            
-            # S'assurer que l'angle reste entre 0 et 180
-            new_angle = max(0, min(180, new_angle))
+            # Calculer le nouvel angle, en restant entre 0 et 180
+            new_angle = max(0, min(180, angles[servo] + (step * direction)))
             
             # Mettre à jour l'angle
             angles[servo] = new_angle
             
-            # Envoyer la commande au servo
-            success, _ = controller.set_servo_angle(servo, new_angle)
+            # Confier la consigne à l'ordonnanceur (remplace une consigne non encore envoyée)
+            success, _ = controller.queue_servo_angle(servo, new_angle)
             if not success:
-                print(f"Erreur lors du réglage de l'angle du servo {servo+1}")
+                screen.set('message', f"Erreur lors du réglage de l'angle du servo {servo+1}")
+            elif recorder:
+                recorder.record(angles)  # Note la consigne (sans écrire sur le disque ici)
+        
+        # Modifier la vitesse maximale de tous les servos (mode vitesse)
+        elif velocity_mode and key in ['+', '-']:
+            delta = 10 if key == '+' else -10
+            jog.set_max_speed(max(10, min(360, jog.max_speed[0] + delta)))
         
         # Modifier le pas de changement d'angle
         elif key == '+':
             step = min(20, step + 1)
-            print(f"Pas modifié à {step}°")
         elif key == '-':
             step = max(1, step - 1)
-            print(f"Pas modifié à {step}°")
         
         # Réinitialiser tous les servos à 90°
         elif key in ['r', 'R']:
             reset_angles = [90, 90, 90, 90]
             
-            # Mettre à jour les angles stockés
-            angles = reset_angles.copy()
+            # Mettre à jour les angles stockés (et arrêter un mouvement en cours)
+            angles[:] = reset_angles
+            jog.set_positions(angles)
             
-            # Envoyer la commande à tous les servos en même temps
-            success, responses = controller.set_servo_angle([0, 1, 2, 3], reset_angles, multi_servo=True)
+            # Voie prioritaire : les séquences en arrière-plan sont annulées, les commandes
+            # en attente abandonnées, et la trame part avant tout le reste
+            success, responses = commands.urgent([0, 1, 2, 3], reset_angles)
             
             if success:
-                print("Tous les servos réinitialisés à 90°")
+                screen.set('message', "Tous les servos réinitialisés à 90°")
+                if recorder:
+                    recorder.record(angles)
             else:
-                print("Erreur lors de la réinitialisation des servos")
+                screen.set('message', "Erreur lors de la réinitialisation des servos")
         
-        # Pause pour éviter de surcharger le port série
-        time.sleep(0.05)
+        # Arrêt sur place : séquences annulées, servos immobilisés à leur dernière consigne
+        elif key in ['x', 'X']:
+            stopped = commands.halt()
+            angles[:] = controller.current_angles[:len(angles)]  # Reprendre là où la séquence s'est arrêtée
+            jog.set_positions(angles)
+            screen.set('message', f"{stopped} séquence(s) arrêtée(s)")
+        
+        # Basculer entre le mode pas à pas et le mode vitesse
+        elif key in ['v', 'V']:
+            if not KEYBOARD_AVAILABLE:
+                screen.set('message', "Mode vitesse indisponible sans mode brut du terminal")
+            else:
+                velocity_mode = not velocity_mode
+                jog.set_positions(angles)  # Repartir des angles actuels, servos à l'arrêt
+                screen.set('message', "Mode vitesse: maintenir une touche pour bouger" if velocity_mode
+                           else "Mode pas à pas")
         
-        # Effacer les lignes d'état pour la prochaine itération
-        print("\033[3A", end="")  # Remonte le curseur de 3 lignes
+        # Démarrer ou arrêter l'enregistrement de la session
+        elif key in ['e', 'E']:
+            if recorder is None:
+                recorder = SessionRecorder(new_recording_path())
+                recorder.begin()
+                recorder.record(angles)  # Position de départ
+                screen.set('message', f"Enregistrement démarré ({recorder.path})")
+            else:
+                count = recorder.end()
+                screen.set('message', f"Enregistrement arrêté: {count} consignes sauvegardées dans {recorder.path}")
+                recorder = None
+        return True
+    
+    if not KEYBOARD_AVAILABLE:
+        # Sans mode brut (Windows), les touches sont tapées puis validées par Entrée
+        screen.draw(instructions)
+        render()
+        running = True
+        while running:
+            for key in input("\nTouches > "):
+                if not handle_key(key):
+                    running = False
+                    break
+            render()
+        screen.close()
+        return
+    
+    # Une seule boucle d'événements : le clavier et les messages de l'Arduino sont
+    # surveillés ensemble par un sélecteur, sans délai d'attente ni scrutation.
+    # Le thread de lecture série réveille la boucle en écrivant un octet dans un tube.
+    wakeup_read, wakeup_write = os.pipe()
+    os.set_blocking(wakeup_read, False)
+    os.set_blocking(wakeup_write, False)
+    
+    def wake(message):
+        try:
+            os.write(wakeup_write, b'.')
+        except BlockingIOError:
+            pass  # Tube plein : la boucle a déjà de quoi se réveiller
+    
+    stdin_fd = sys.stdin.fileno()
+    selector = selectors.DefaultSelector()
+    selector.register(stdin_fd, selectors.EVENT_READ, 'clavier')
+    selector.register(wakeup_read, selectors.EVENT_READ, 'arduino')
+    controller.add_listener(wake)
+    
+    try:
+        # Le terminal reste en mode brut pendant toute la session (et non à chaque touche)
+        with RawTerminal(stdin_fd):
+            screen.draw(instructions)
+            render()
+            running = True
+            while running:
+                # Tant qu'un servo bouge en mode vitesse, la boucle se réveille à chaque
+                # pas de la boucle de commande ; sinon elle attend sans limite
+                for event, _ in selector.select(timeout=jog.timeout()):
+                    if event.data == 'clavier':
+                        # Lecture directe du descripteur : toutes les touches déjà tapées d'un coup
+                        for key in os.read(stdin_fd, 64).decode('utf-8', errors='ignore'):
+                            if not handle_key(key):
+                                running = False
+                                break
+                    else:
+                        os.read(wakeup_read, 4096)  # Vide le tube : l'état sera relu en entier
+                # Pas de la boucle de commande : intégration des vitesses et envoi d'une trame
+                if running and jog.due():
+                    jog.tick()
+                render()
+            screen.close()
+    finally:
+        # Nettoyage, même en cas d'erreur
+        controller.remove_listener(wake)
+        selector.close()
+        os.close(wakeup_read)
+        os.close(wakeup_write)
+        controller.stop_scheduler()
+    print("Sortie du mode interactif")
 
 # ===== MODE INTERPRÉTEUR =====
-def interpreter_mode(controller):
+# ===== ANALYSE DES COMMANDES DU MODE INTERPRÉTEUR =====
+# L'expression régulière est compilée une seule fois, au chargement du module
+COMMAND_PATTERN = re.compile(r'a\(([^)]+)\)')
+
+def parse_command(command, num_servos):
+    """
+    Analyse une commande "a(servo1, angle1, servo2, angle2, ...)"
+    
+    Args:
+        command (str): Ligne tapée par l'utilisateur
+        num_servos (int): Nombre de servos du contrôleur
+    
+    Returns:
+        tuple or None: (servos, angles), ou None si la ligne n'a pas la forme a(...)
+    
+    Raises:
+        ValueError: Arguments mal formés, servo ou angle hors limites
+    """
+    match = COMMAND_PATTERN.match(command)
+    if not match:
+        return None
+    
+    # Extraire les arguments
+    args_str = match.group(1)
+    
+    # Convertir la chaîne d'arguments en liste d'entiers
+    args = [int(x.strip()) for x in args_str.split(',')]
+    
+    # Vérifier que le nombre d'arguments est pair 
+    # et que chaque paire correspond bien à (servo, angle)
+    if len(args) % 2 != 0 or len(args) > 2 * num_servos:
+        raise ValueError("Nombre incorrect d'arguments")
+    
+    # Séparer les servos et les angles
+    servos = args[::2]   # Arguments pairs (indices 0, 2, 4...)
+    angles = args[1::2]  # Arguments impairs (indices 1, 3, 5...)
+    
+    # Vérifier que tous les servos sont valides (plus de 4 avec plusieurs cartes)
+    if any(s < 0 or s >= num_servos for s in servos):
+        raise ValueError("Numéro de servo invalide")
+    
+    # Vérifier que tous les angles sont valides
+    if any(a < 0 or a > 180 for a in angles):
+        raise ValueError("Angle invalide")
+    
+    return servos, angles
+
+def interpreter_mode(controller, commands):
     """Mode interpréteur de commandes"""
     
     # Affichage des instructions
@@ -183,11 +390,23 @@ def interpreter_mode(controller):
     print("  a(0, 90)        - Positionne le servo 0 à 90 degrés")
     print("  a(1, 45, 2, 135) - Positionne les servos 1 et 2 simultanément")
     print("  a(0, 0, 1, 180, 2, 90, 3, 45) - Positionne 4 servos")
+    print("  0:45, 1:120     - Même chose avec la syntaxe servo:angle")
+    print("  wait 500        - Pause de 500 ms")
+    print("  repeat 3 { a(0, 0) wait 300 a(0, 180) wait 300 }  - Répète un bloc")
+    print("  def balance(s, amp) { a(s, amp) wait 200 a(s, 90) }  - Définit une macro")
+    print("  balance(1, 45)  - Appelle une macro (compilée une fois, puis rejouée)")
+    print("  jobs            - Liste les séquences en arrière-plan")
+    print("  pause [n], resume [n] - Suspend ou reprend une séquence (la dernière lancée par défaut)")
+    print("  stop [n]        - Arrête une séquence, ou toutes (les servos restent où ils sont)")
     print("  exit            - Quitter le programme")
     
+    # Macros définies pendant la session ; leurs plans compilés sont gardés en cache
+    library = MacroLibrary(controller)
+    
     # Boucle principale d'interprétation des commandes
     while True:
         try:
+            print_job_reports()
             # Lecture d'une commande tapée par l'utilisateur
             command = input("\n> ").strip()
             
@@ -196,50 +415,50 @@ def interpreter_mode(controller):
                 print("Fermeture du mode interpréteur...")
                 break
             
-            # Analyse de la commande avec une expression régulière
-            pattern = r'a\(([^)]+)\)'
-            match = re.match(pattern, command)
+            # Séquences en arrière-plan : elles continuent pendant qu'on tape d'autres commandes
+            words = command.lower().split()
+            if words and words[0] in ('jobs', 'pause', 'resume', 'stop') and len(words) <= 2:
+                control_jobs(commands, words)
+                continue
             
-            if match:
-                # Extraire les arguments
-                args_str = match.group(1)
-                
-                # Diviser les arguments en couples (servo, angle)
-                try:
-                    # Convertir la chaîne d'arguments en liste d'entiers
-                    args = [int(x.strip()) for x in args_str.split(',')]
-                    
-                    # Vérifier que le nombre d'arguments est pair 
-                    # et que chaque paire correspond bien à (servo, angle)
-                    if len(args) % 2 != 0 or len(args) > 8:
-                        raise ValueError("Nombre incorrect d'arguments")
-                    
-                    # Séparer les servos et les angles
-                    servos = args[::2]   # Arguments pairs (indices 0, 2, 4...)
-                    angles = args[1::2]  # Arguments impairs (indices 1, 3, 5...)
-                    
-                    # Vérifier que tous les servos sont valides
-                    if any(s < 0 or s > 3 for s in servos):
-                        raise ValueError("Numéro de servo invalide")
-                    
-                    # Vérifier que tous les angles sont valides
-                    if any(a < 0 or a > 180 for a in angles):
-                        raise ValueError("Angle invalide")
-                    
-                    # Envoi de la commande au contrôleur
-                    success, responses = controller.set_servo_angle(servos, angles, multi_servo=True)
-                    
-                    if success:
-                        for response in responses:
-                            print(f"Arduino: {response}")
-                    else:
-                        print(f"Erreur: {responses}")
-                    
-                except ValueError as e:
-                    print(f"Erreur de format: {e}")
-                    print("Format attendu: a(servo1, angle1, servo2, angle2, ...)")
-            else:
+            # Un bloc { ... } peut s'étendre sur plusieurs lignes : on lit la suite
+            # tant que toutes les accolades ouvertes ne sont pas refermées
+            while command.count('{') > command.count('}'):
+                command += "\n" + input("... ")
+            
+            # Une commande a(...) seule est envoyée directement (avec affichage des réponses) ;
+            # tout le reste (macros, boucles, pauses...) passe par le langage de macros
+            if not COMMAND_PATTERN.fullmatch(command):
+                success, summary = library.execute(command)
+                print(summary if success else f"Erreur: {summary}")
+                continue
+            
+            # Analyse de la commande (voir parse_command plus haut)
+            try:
+                parsed = parse_command(command, controller.num_servos)
+            except ValueError as e:
+                print(f"Erreur de format: {e}")
+                print("Format attendu: a(servo1, angle1, servo2, angle2, ...)")
+                continue
+            
+            if parsed is None:
                 print("Commande non reconnue. Format attendu: a(servo1, angle1, servo2, angle2, ...)")
+                continue
+            servos, angles = parsed
+            
+            # Envoi de la commande au contrôleur
+            success, responses = controller.set_servo_angle(servos, angles, multi_servo=True, wait=True)
+            
+            if success and isinstance(responses, dict):
+                # Plusieurs cartes : réponses regroupées par carte
+                for board, (_, board_responses) in sorted(responses.items()):
+                    for response in board_responses:
+                        print(f"Arduino {board}: {response}")
+            elif success:
+                for response in responses:
+                    print(f"Arduino: {response}")
+            else:
+                print(f"Erreur: {responses}")
         
         except KeyboardInterrupt:
             print("\nFermeture du mode interpréteur...")
@@ -250,75 +469,144 @@ def interpreter_mode(controller):
 # Le reste du code reste identique (main() et autres fonctions)
 
 
+def control_jobs(commands, words):
+    """Commandes jobs, pause, resume et stop du mode interpréteur"""
+    action = words[0]
+    if action == 'jobs':
+        jobs = commands.running_jobs()
+        for job in jobs:
+            print(f"  {job.number}. {job.name} ({job.state})")
+        if not jobs:
+            print("Aucune séquence en cours")
+        return
+    if action == 'stop' and len(words) == 1:
+        # Arrêt immédiat de tout : commandes en attente abandonnées
+        print(f"{commands.halt()} séquence(s) arrêtée(s)")
+        return
+    if len(words) == 2 and not words[1].isdigit():
+        print(f"Numéro de séquence invalide: {words[1]}")
+        return
+    job = commands.job(int(words[1]) if len(words) == 2 else None)
+    if job is None:
+        print("Aucune séquence en cours" if len(words) == 1 else f"Pas de séquence {words[1]} en cours")
+        return
+    if action == 'pause':
+        job.pause()
+    elif action == 'resume':
+        job.resume()
+    else:
+        job.cancel()
+    print(f"Séquence {job.number} ({job.name}): {job.state}")
+
 # ===== MODE SÉQUENCES PERSONNALISÉES =====
-def custom_movements(controller):
+def custom_movements(controller, commands):
     """
     Mode séquences personnalisées
     Cette fonction peut être modifiée pour inclure vos propres mouvements prédéfinis
     """
-    # Cette fonction permet d'exécuter des séquences de mouvements préprogrammées
+    # Cette fonction permet d'exécuter des séquences de mouvements préprogrammées.
+    # La séquence choisie tourne en arrière-plan : on revient aussitôt au menu, et elle
+    # peut être suspendue ou arrêtée depuis les autres modes (voir command_queue.py)
+    
+    # Les chorégraphies du répertoire "choreographies" et les sessions enregistrées
+    # du répertoire "recordings" s'ajoutent aux deux séquences d'exemple
+    choreographies = list_choreographies()
+    recordings = list_recordings()
+    first_recording = 3 + len(choreographies)  # Numéro du premier enregistrement dans le menu
+    back = str(first_recording + len(recordings))  # Numéro de l'option "Retour"
     
     # Affichage du menu des séquences
     print("\n=== Mode Séquences Personnalisées ===")
     print("Choisissez une séquence :")
     print("1. Séquence 1 (exemple)")
     print("2. Séquence 2 (exemple)")
-    print("3. Retour au menu principal")
+    for i, path in enumerate(choreographies, start=3):
+        print(f"{i}. Chorégraphie {os.path.splitext(os.path.basename(path))[0]}")
+    for i, path in enumerate(recordings, start=first_recording):
+        print(f"{i}. Rejouer {os.path.splitext(os.path.basename(path))[0]}")
+    print(f"{back}. Retour au menu principal")
     
     # Demande du choix à l'utilisateur
     choice = input("Votre choix: ").strip()
     
     # Traitement du choix
-    if choice == '1':
-        print("Exécution de la séquence 1...")
+    if choice.isdigit() and first_recording <= int(choice) < int(back):
+        # Relecture d'une session avec son minutage d'origine, éventuellement accéléré
+        path = recordings[int(choice) - first_recording]
+        speed = input("Vitesse de relecture (1 = vitesse d'origine): ").strip()
+        try:
+            speed = float(speed) if speed else 1.0
+        except ValueError:
+            speed = 1.0
+        # Les envois passent par job.controller et les attentes par job.sleep : pause et arrêt immédiats
+        job = commands.start_job(f"relecture {os.path.basename(path)} x{speed}", lambda job: replay_recording(
+            job.controller, path, speed=speed, clock=job.clock, sleep=job.sleep), on_done=report_job)
+    elif choice.isdigit() and 3 <= int(choice) < first_recording:
+        # Fichier compilé au premier lancement puis relu directement depuis le cache
+        path = choreographies[int(choice) - 3]
+        job = commands.start_job(f"chorégraphie {os.path.basename(path)}", lambda job: play_choreography(
+            job.controller, path, clock=job.clock, sleep=job.sleep), on_done=report_job)
+    elif choice == '1':
         # EXEMPLE: Vous pouvez remplacer ce code par vos propres séquences
-        sequence_1(controller)  # Appelle la fonction qui définit la séquence 1
+        job = commands.start_job("séquence 1", sequence_1, on_done=report_job)  # Voir sequence_1 plus bas
     elif choice == '2':
-        print("Exécution de la séquence 2...")
         # EXEMPLE: Vous pouvez remplacer ce code par vos propres séquences
-        sequence_2(controller)  # Appelle la fonction qui définit la séquence 2
-    elif choice == '3':
+        job = commands.start_job("séquence 2", sequence_2, on_done=report_job)  # Voir sequence_2 plus bas
+    elif choice == back:
         return  # Retourne au menu principal
     else:
-        print("Choix invalide.")  # Si l'utilisateur entre autre chose que 1, 2 ou 3
+        print("Choix invalide.")  # Si l'utilisateur entre un numéro qui n'est pas dans le menu
+        return
+    
+    print(f"Séquence {job.number} ({job.name}) lancée en arrière-plan.")
+    print("Mode interpréteur: 'jobs', 'pause', 'resume', 'stop' ; mode interactif: 'x' l'arrête, 'r' remet à 90°")
+    time.sleep(1)  # Laisse le temps de lire le message avant le retour au menu
         
 # ===== DÉFINITION DES SÉQUENCES =====
-def sequence_1(controller):
+def sequence_1(job):
     """
-    Exemple de séquence 1
+    Exemple de séquence 1, exécutée en arrière-plan (job : voir command_queue.Job)
     À personnaliser selon vos besoins
     """
     # CETTE FONCTION EST À MODIFIER POUR VOTRE PROPRE SÉQUENCE
-    print("Séquence 1 - Mouvement d'exemple")
     
     # Exemple de mouvements séquentiels (un après l'autre)
-    controller.set_servo_angle(0, 0)    # Déplace le servo 0 à 0°
-    time.sleep(0.5)                     # Attend 0.5 seconde
-    controller.set_servo_angle(0, 180)  # Déplace le servo 0 à 180°
-    time.sleep(0.5)                     # Attend 0.5 seconde
-    controller.set_servo_angle(0, 90)   # Déplace le servo 0 à 90° (centre)
-    time.sleep(0.5)                     # Attend 0.5 seconde
+    # Chaque trame est (instant en secondes depuis le début, {servo: angle}) ;
+    # les instants sont absolus, donc le temps d'écriture ne s'ajoute pas aux pauses
+    frames = [
+        (0.0, {0: 0}),    # Déplace le servo 0 à 0°
+        (0.5, {0: 180}),  # 0.5 seconde plus tard, déplace le servo 0 à 180°
+        (1.0, {0: 90}),   # Puis le servo 0 à 90° (centre)
+        (1.5, {}),        # Fin de la séquence après une dernière demi-seconde
+    ]
+    # job.controller envoie les trames par la file de commandes ; l'horloge et les pauses
+    # de la séquence (job.clock, job.sleep) permettent de la suspendre ou de l'arrêter à tout moment
+    player = DeadlinePlayer(controller_sender(job.controller), clock=job.clock, sleep=job.sleep)
+    return player.play(frames)  # La gigue et les dépassements mesurés sont affichés à la fin
     
-    print("Séquence 1 terminée. Appuyez sur Entrée pour continuer...")
-    input()  # Attend que l'utilisateur appuie sur Entrée
-    
-def sequence_2(controller):
+def sequence_2(job):
     """
-    Exemple de séquence 2
+    Exemple de séquence 2, exécutée en arrière-plan (job : voir command_queue.Job)
     À personnaliser selon vos besoins
     """
     # CETTE FONCTION EST À MODIFIER POUR VOTRE PROPRE SÉQUENCE
-    print("Séquence 2 - Mouvement d'exemple")
+    controller = job.controller  # Les envois passent par la file de commandes
     
     # Exemple de mouvements coordonnés entre deux servos
-    # Cette boucle va de 0 à 180 par pas de 10
-    for angle in range(0, 181, 10):
-        controller.set_servo_angle(1, angle)         # Servo 1: angle augmente de 0° à 180°
-        controller.set_servo_angle(2, 180 - angle)   # Servo 2: angle diminue de 180° à 0°
-        time.sleep(0.1)                              # Pause de 0.1 seconde entre chaque pas
-    
-    print("Séquence 2 terminée. Appuyez sur Entrée pour continuer...")
-    input()  # Attend que l'utilisateur appuie sur Entrée
+    if TRAJECTORY_AVAILABLE:
+        # Deux positions clés : toute la trajectoire est calculée d'un coup,
+        # puis envoyée en une trame par pas (les deux servos ensemble)
+        start = list(controller.current_angles)
+        start[1], start[2] = 0, 180                  # Servo 1 à 0°, servo 2 à 180°
+        end = list(start)
+        end[1], end[2] = 180, 0                      # Servo 1 à 180°, servo 2 à 0°
+        # 10 pas par seconde sur 1,8 s : les mêmes pas de 10° que la boucle ci-dessous
+        _, setpoints = plan_trajectory([(0.0, start), (1.8, end)], rate_hz=10, profile='linear')
+        return play_trajectory(controller, setpoints, rate_hz=10, clock=job.clock, sleep=job.sleep)
+    # Cette boucle va de 0 à 180 par pas de 10, une trame combinée toutes les 0.1 seconde
+    frames = [(i * 0.1, {1: angle, 2: 180 - angle})  # Servo 1 augmente, servo 2 diminue
+              for i, angle in enumerate(range(0, 181, 10))]
+    return DeadlinePlayer(controller_sender(controller), clock=job.clock, sleep=job.sleep).play(frames)
 
 # ===== PROGRAMME PRINCIPAL =====
 def main():
@@ -327,32 +615,120 @@ def main():
     """
     print("=== Contrôleur de Servomoteurs Arduino ===")
     
-    # Configuration du port série
-    port = '/dev/ttyUSB0'  # Port par défaut (typique sur Linux)
+    # Lecture des arguments de la ligne de commande
+    parser = argparse.ArgumentParser(description="Contrôleur de servomoteurs Arduino")
+    # Chaque argument est le port d'une carte (servos 0-3, 4-7, ...)
+    parser.add_argument('ports', nargs='*', default=['auto'],  # 'auto' : la carte est cherchée parmi /dev/ttyUSB* et /dev/ttyACM*
+                        help="Port(s) série des cartes Arduino ('auto' : recherche automatique)")
+    parser.add_argument('--no-reset', action='store_true',  # La carte tourne déjà : inutile d'attendre son redémarrage
+                        help="Ne pas redémarrer une carte déjà démarrée (connexion en quelques millisecondes)")
+    parser.add_argument('--metrics', metavar='FICHIER',
+                        help="Écrire les mesures de la liaison dans ce fichier (format Prometheus, toutes les 10 s)")
+    parser.add_argument('--trace', metavar='FICHIER',
+                        help="Tracer les octets échangés dans ce fichier circulaire (voir wire_trace.py decode/replay)")
+    parser.add_argument('--safety', metavar='FICHIER',
+                        help="Enveloppe de sécurité JSON (limites, contraintes couplées, zones interdites ; voir safety.py)")
+    parser.add_argument('--script', metavar='FICHIER',
+                        help="Exécuter un fichier de commandes a(...) ou servo:angle puis quitter ('-' : entrée standard)")
+    args = parser.parse_args()
+    ports = args.ports
+    
+    # Mesures optionnelles : activées seulement si un fichier d'export est donné
+    metrics = None
+    if args.metrics:
+        metrics = Metrics(labels={'port': ','.join(ports)})
+        metrics.start_export(args.metrics, interval=10)
     
-    # Permettre la spécification d'un port différent via les arguments de ligne de commande
-    if len(sys.argv) > 1:  # Si au moins un argument a été passé
-        port = sys.argv[1]  # Le premier argument est considéré comme le port
+    # Trace optionnelle des octets échangés : un fichier de taille fixe projeté en mémoire,
+    # lisible même après un arrêt brutal (le fichier de la session précédente devient FICHIER.1)
+    trace = WireTrace(args.trace) if args.trace else None
     
-    # Initialisation du contrôleur avec le port spécifié
-    controller = ArduinoServoController(port=port)
-    print(f"Connexion à l'Arduino sur {port}...")
+    # Enveloppe de sécurité optionnelle : chaque pose est vérifiée avant d'être envoyée
+    # (avec plusieurs cartes, les numéros de servos du fichier sont ceux de chaque carte)
+    safety = None
+    if args.safety:
+        try:
+            from safety import SafetyEnvelope  # NumPy n'est nécessaire qu'avec cette option
+            safety = SafetyEnvelope.load(args.safety)
+        except (ImportError, OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Enveloppe de sécurité invalide: {e}")
+            if metrics:
+                metrics.stop_export()
+            return 1
+    
+    # Initialisation du contrôleur avec le ou les ports spécifiés
+    # Le thread de lecture rend les envois non bloquants (nécessaire à l'ordonnanceur du mode interactif)
+    # auto_baud : passe à la vitesse la plus élevée supportée par l'Arduino après la connexion
+    if len(ports) == 1:
+        controller = ArduinoServoController(port=ports[0], reader_thread=True, auto_baud=True, metrics=metrics,
+                                            safety=safety, reset_on_connect=not args.no_reset, trace=trace)
+    else:
+        controller = ControllerPool(ports, reader_thread=True, auto_baud=True, metrics=metrics, safety=safety,
+                                    reset_on_connect=not args.no_reset, trace=trace)
+    
+    # Mode script : tout le fichier est vérifié avant même la connexion,
+    # pour signaler toutes les erreurs (avec leur ligne) sans attendre l'Arduino
+    commands = None
+    if args.script:
+        try:
+            if args.script == '-':
+                commands = parse_script(sys.stdin, controller.num_servos)
+            else:
+                with open(args.script, encoding='utf-8') as script:
+                    commands = parse_script(script, controller.num_servos)
+        except (OSError, ScriptError) as e:
+            print(f"Script invalide:\n{e}")
+            if metrics:
+                metrics.stop_export()
+            return 1
+        # Avec une enveloppe de sécurité (une seule carte), tout le script est vérifié
+        # d'un coup ; les servos partent de 90°, la position de l'Arduino au démarrage
+        if safety and commands and len(ports) == 1:
+            poses = script_poses(commands, [90] * controller.num_servos)
+            index = safety.first_violation(poses)
+            if index is not None:
+                _, reason = safety.check_pose(poses[index])
+                print(f"Script refusé par l'enveloppe de sécurité, ligne {commands[index][0]}: {reason}")
+                if metrics:
+                    metrics.stop_export()
+                return 1
+    
+    print(f"Connexion à l'Arduino sur {', '.join(ports)}...")
     
     # Tentative de connexion à l'Arduino
     success, messages = controller.connect()
     if not success:  # Si la connexion a échoué
         print(f"Erreur de connexion: {messages}")
-        return  # Quitte la fonction main()
+        if metrics:
+            metrics.stop_export()
+        return 1  # Quitte la fonction main() (code de sortie 1 : échec)
     
     # Si la connexion a réussi
-    print("Connexion établie!")
+    if len(ports) == 1:
+        print(f"Connexion établie sur {controller.port}! ({controller.negotiated_baud} bauds)")  # Port trouvé si 'auto'
+    else:
+        print(f"Connexion établie avec {len(ports)} cartes ({controller.num_servos} servos)")
     for msg in messages:
         print(f"Arduino: {msg}")  # Affiche les messages de l'Arduino
     
+    # Mode script : envoi de toutes les poses à la suite, puis fin du programme
+    if commands is not None:
+        success, summary = run_script(controller, commands)
+        print(summary if success else f"Erreur: {summary}")
+        controller.disconnect()
+        if metrics:
+            metrics.stop_export()
+        return 0 if success else 1
+    
+    # File de commandes devant le port : les séquences tournent en arrière-plan pendant
+    # que les autres modes restent utilisables, et les arrêts passent devant tout le reste
+    commands = CommandQueue(controller).start()
+    
     # ===== BOUCLE PRINCIPALE DU MENU =====
     while True:
         # Affichage du menu principal
         clear_screen()
+        print_job_reports()  # Séquences terminées pendant le mode précédent
         print("\n=== Menu Principal ===")
         print("Choisissez un mode:")
         print("1. Mode interactif (flèches et touches numériques)")
@@ -367,18 +743,18 @@ def main():
         if choice == '1':  # Mode interactif
             # Vérification de la compatibilité (pour les systèmes autres que Windows)
             if not KEYBOARD_AVAILABLE and os.name != 'nt':
-                print("Attention: Le mode interactif nécessite les modules termios, tty et select.")
+                print("Attention: Le mode interactif nécessite les modules termios, tty et selectors.")
                 print("Ces modules peuvent ne pas être disponibles sur tous les systèmes.")
                 confirm = input("Continuer quand même? (o/n): ").lower()
                 if confirm != 'o':  # Si l'utilisateur ne confirme pas
                     continue  # Retourne au menu principal
-            interactive_mode(controller)  # Lance le mode interactif
+            interactive_mode(controller, commands)  # Lance le mode interactif
             
         elif choice == '2':  # Mode interpréteur
-            interpreter_mode(controller)  # Lance le mode interpréteur
+            interpreter_mode(controller, commands)  # Lance le mode interpréteur
             
         elif choice == '3':  # Mode séquences personnalisées
-            custom_movements(controller)  # Lance le mode séquences
+            custom_movements(controller, commands)  # Lance le mode séquences
             
         elif choice == '4':  # Quitter le programme
             print("Fermeture du programme...")
@@ -388,12 +764,17 @@ def main():
             print("Choix invalide. Veuillez entrer un nombre entre 1 et 4.")
             time.sleep(1)  # Pause d'1 seconde pour que l'utilisateur puisse lire le message
     
-    # Fermeture propre de la connexion avant de quitter
+    # Fermeture propre de la connexion avant de quitter (séquences en cours arrêtées)
+    commands.stop()
     controller.disconnect()
+    if metrics:
+        metrics.stop_export()  # Dernière écriture du fichier de mesures
     print("Connexion fermée. Merci d'avoir utilisé le contrôleur de servomoteurs!")
 
 # ===== POINT D'ENTRÉE DU PROGRAMME =====
 if __name__ == "__main__":
     # Cette condition vérifie si le script est exécuté directement (et non importé)
     # C'est une pratique standard en Python
-    main()  # Si c'est le cas, on appelle la fonction principale
+    # Si c'est le cas, on appelle la fonction principale ; sa valeur de retour
+    # devient le code de sortie du programme (utile pour le mode --script)
+    sys.exit(main())
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Mesures de fonctionnement de la liaison série (optionnelles)
+
+Un objet Metrics regroupe :
+    - des compteurs (commandes envoyées, octets écrits et lus, réponses
+      illisibles, reconnexions, temps passé en pause ou à attendre) ;
+    - des histogrammes de latence à seaux fixes, façon HDR : l'enregistrement
+      d'une valeur coûte un frexp et une incrémentation ;
+    - des jauges évaluées à la lecture (profondeur des files, commandes en vol).
+
+Les valeurs se lisent avec snapshot() ou s'exportent au format texte de
+Prometheus, éventuellement dans un fichier réécrit périodiquement (collecteur
+« textfile » de node_exporter) :
+
+    metrics = Metrics(labels={'port': '/dev/ttyUSB0'})
+    controller = ArduinoServoController(metrics=metrics)
+    metrics.start_export('/var/lib/node_exporter/servo.prom', interval=10)
+"""
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+PREFIX = 'servo'
+
+# Description des mesures connues (ligne HELP de l'export Prometheus)
+DESCRIPTIONS = {
+    'commands_sent': "Commandes de positionnement envoyées",
+    'commands_skipped': "Commandes non envoyées car déjà appliquées",
+    'bytes_written': "Octets écrits sur le port série",
+    'bytes_read': "Octets lus sur le port série",
+    'reply_parse_failures': "Réponses de l'Arduino non reconnues",
+    'reply_timeouts': "Commandes restées sans réponse",
+    'connects': "Connexions établies",
+    'reconnects': "Connexions établies après une première connexion",
+    'sleep_seconds': "Temps passé bloqué dans des pauses (s)",
+    'reply_wait_seconds': "Temps passé bloqué à attendre une réponse (s)",
+    'retransmissions': "Commandes retransmises par la fenêtre glissante",
+    'window_failures': "Commandes abandonnées par la fenêtre glissante",
+    'round_trip_seconds': "Délai entre l'envoi d'une commande et sa réponse (s)",
+    'window_in_flight': "Commandes numérotées en vol",
+    'replies_pending': "Commandes en attente de confirmation",
+    'messages_queued': "Messages de l'Arduino en file",
+    'servos_unconfirmed': "Servos dont la dernière consigne n'est pas confirmée",
+    'link_baud': "Vitesse de la liaison (bauds)",
+}
+
+# Bornes exportées vers Prometheus (les seaux internes, plus fins, y sont regroupés)
+EXPORT_BOUNDS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+
+class LatencyHistogram:
+    """
+    Histogramme à seaux fixes log-linéaires
+
+    Chaque puissance de deux au-dessus de lowest est découpée en sub_buckets
+    seaux égaux : l'erreur relative sur un percentile est au plus
+    1/sub_buckets, quelle que soit la valeur.
+    """
+
+    def __init__(self, lowest=1e-6, highest=60.0, sub_buckets=16):
+        """
+        Args:
+            lowest (float): Plus petite valeur distinguée (s) ; en dessous, premier seau
+            highest (float): Plus grande valeur distinguée (s) ; au-dessus, dernier seau
+            sub_buckets (int): Nombre de seaux par puissance de deux
+        """
+        self.lowest = lowest
+        self.sub_buckets = sub_buckets
+        self.magnitudes = max(1, math.ceil(math.log2(highest / lowest)))
+        self.counts = [0] * (self.magnitudes * sub_buckets + 2)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def index(self, value):
+        """
+        Indice du seau contenant value
+        """
+        ratio = value / self.lowest
+        if ratio < 1.0:
+            return 0
+        mantissa, exponent = math.frexp(ratio)  # ratio = mantissa * 2**exponent, mantissa dans [0.5, 1)
+        magnitude = exponent - 1
+        if magnitude >= self.magnitudes:
+            return len(self.counts) - 1
+        return 1 + magnitude * self.sub_buckets + int((mantissa * 2.0 - 1.0) * self.sub_buckets)
+
+    def upper_bound(self, index):
+        """
+        Borne supérieure du seau index
+        """
+        if index == 0:
+            return self.lowest
+        if index == len(self.counts) - 1:
+            return math.inf
+        magnitude, sub = divmod(index - 1, self.sub_buckets)
+        return self.lowest * 2.0 ** magnitude * (1.0 + (sub + 1) / self.sub_buckets)
+
+    def record(self, value):
+        self.counts[self.index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """
+        Valeur sous laquelle se trouvent q % des enregistrements (borne du seau)
+        """
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q / 100.0 * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.upper_bound(index), self.max)
+        return self.max
+
+    def cumulative(self, bounds=EXPORT_BOUNDS):
+        """
+        Nombre d'enregistrements inférieurs ou égaux à chaque borne (seaux Prometheus)
+
+        Un seau interne à cheval sur une borne est compté avec la borne suivante.
+
+        Returns:
+            list: [(borne, nombre cumulé)]
+        """
+        result = []
+        index = 0
+        seen = 0
+        for bound in bounds:
+            while index < len(self.counts) and self.upper_bound(index) <= bound:
+                seen += self.counts[index]
+                index += 1
+            result.append((bound, seen))
+        return result
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+        }
+
+
+class InstrumentedSerial:
+    """
+    Port série dont les octets écrits et lus sont comptés
+
+    Toutes les autres opérations (timeout, baudrate, in_waiting...) sont
+    transmises au port d'origine.
+    """
+
+    def __init__(self, port, metrics):
+        object.__setattr__(self, '_port', port)
+        object.__setattr__(self, '_metrics', metrics)
+
+    def __getattr__(self, name):
+        return getattr(self._port, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._port, name, value)
+
+    def write(self, data):
+        written = self._port.write(data)
+        self._metrics.count('bytes_written', len(data))
+        return written
+
+    def read(self, size=1):
+        data = self._port.read(size)
+        self._metrics.count('bytes_read', len(data))
+        return data
+
+    def readline(self, *args, **kwargs):
+        data = self._port.readline(*args, **kwargs)
+        self._metrics.count('bytes_read', len(data))
+        return data
+
+
+class Metrics:
+    """
+    Compteurs, histogrammes et jauges d'un contrôleur (ou de plusieurs)
+    """
+
+    def __init__(self, labels=None, clock=time.monotonic):
+        """
+        Args:
+            labels (dict): Étiquettes ajoutées à chaque mesure exportée (ex. {'port': ...})
+            clock (callable): Horloge monotone en secondes
+        """
+        self.labels = dict(labels or {})
+        self.clock = clock
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.gauges = {}  # (nom, étiquettes) -> (fonction, 'gauge' ou 'counter')
+        self.lock = threading.Lock()
+        self.exporter = None
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def observe(self, name, value):
+        """
+        Enregistre une durée (s) dans l'histogramme name
+        """
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(value)
+
+    def gauge(self, name, function, kind='gauge', labels=None):
+        """
+        Déclare une mesure lue à la demande
+
+        Args:
+            name (str): Nom de la mesure
+            function (callable): Renvoie la valeur courante
+            kind (str): 'gauge', ou 'counter' pour un total tenu ailleurs (ajouté
+                        au compteur de même nom, où l'on reporte les totaux des
+                        objets détruits ; les totaux de plusieurs cartes s'additionnent)
+            labels (dict): Étiquettes propres à cette jauge (ex. {'board': port}) :
+                           plusieurs cartes d'un même Metrics gardent chacune la leur
+        """
+        key = (name, tuple(sorted((labels or {}).items())))
+        self.gauges[key] = (function, kind)
+
+    def remove_gauges(self, labels):
+        """
+        Retire les jauges déclarées avec ces étiquettes (ex. carte reconnectée sur un autre port)
+        """
+        labels = tuple(sorted(labels.items()))
+        for key in [key for key in self.gauges if key[1] == labels]:
+            del self.gauges[key]
+
+    def sleep(self, seconds):
+        """
+        time.sleep dont la durée est ajoutée au compteur sleep_seconds
+        """
+        start = self.clock()
+        time.sleep(seconds)
+        self.count('sleep_seconds', self.clock() - start)
+
+    def wrap_serial(self, port):
+        """
+        Renvoie le port enveloppé pour compter les octets échangés
+        """
+        return InstrumentedSerial(port, self)
+
+    def _read_gauges(self):
+        values = {}
+        for key, (function, kind) in list(self.gauges.items()):
+            try:
+                values[key] = (float(function()), kind)
+            except Exception:
+                # Objet observé pas encore créé (avant connexion) ou déjà détruit
+                continue
+        return values
+
+    @staticmethod
+    def _add_gauge_totals(counters, gauges):
+        # Les totaux tenus ailleurs (une jauge 'counter' par carte) s'ajoutent au compteur
+        for (name, _), (value, kind) in gauges.items():
+            if kind == 'counter':
+                counters[name] = counters.get(name, 0.0) + value
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: {'counters': {...}, 'gauges': {...}, 'histograms': {nom: résumé}}
+        """
+        gauges = self._read_gauges()
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+        self._add_gauge_totals(counters, gauges)
+        return {
+            'counters': counters,
+            # Jauge étiquetée : 'nom{board="/dev/ttyUSB0"}', comme dans l'export Prometheus
+            'gauges': {name + self._format_labels(dict(labels), base=False): value
+                       for (name, labels), (value, kind) in gauges.items() if kind == 'gauge'},
+            'histograms': histograms,
+        }
+
+    def _format_labels(self, extra=None, base=True):
+        labels = dict(self.labels) if base else {}
+        if extra:
+            labels.update(extra)
+        if not labels:
+            return ''
+        body = ','.join('{}="{}"'.format(key, str(value).replace('\\', r'\\').replace('"', r'\"'))
+                        for key, value in labels.items())
+        return '{' + body + '}'
+
+    def to_prometheus(self, prefix=PREFIX):
+        """
+        Renvoie les mesures au format texte de Prometheus
+        """
+        gauges = self._read_gauges()
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {name: (histogram.cumulative(), histogram.total, histogram.count)
+                          for name, histogram in self.histograms.items()}
+        lines = []
+
+        def header(name, kind, key):
+            if key in DESCRIPTIONS:
+                lines.append(f"# HELP {name} {DESCRIPTIONS[key]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        self._add_gauge_totals(counters, gauges)
+        labels = self._format_labels()
+        for key in sorted(counters):
+            name = f"{prefix}_{key}_total"
+            header(name, 'counter', key)
+            lines.append(f"{name}{labels} {counters[key]:g}")
+        previous = None
+        for key, gauge_labels in sorted(gauges):
+            value, kind = gauges[key, gauge_labels]
+            if kind != 'gauge':
+                continue
+            name = f"{prefix}_{key}"
+            if key != previous:  # Un seul en-tête pour les jauges de toutes les cartes
+                header(name, 'gauge', key)
+                previous = key
+            lines.append(f"{name}{self._format_labels(dict(gauge_labels))} {value:g}")
+        for key in sorted(histograms):
+            buckets, total, count = histograms[key]
+            name = f"{prefix}_{key}"
+            header(name, 'histogram', key)
+            for bound, cumulative in buckets:
+                lines.append(f"{name}_bucket{self._format_labels({'le': f'{bound:g}'})} {cumulative}")
+            lines.append(f"{name}_bucket{self._format_labels({'le': '+Inf'})} {count}")
+            lines.append(f"{name}_sum{labels} {total:g}")
+            lines.append(f"{name}_count{labels} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """
+        Écrit l'export Prometheus dans path de façon atomique (fichier temporaire puis renommage)
+        """
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(temporary, path)
+
+    def start_export(self, path, interval=10.0):
+        """
+        Réécrit périodiquement le fichier d'export dans un thread
+        """
+        self.stop_export()
+        self.exporter = PrometheusExporter(self, path, interval)
+        self.exporter.start()
+        return self.exporter
+
+    def stop_export(self):
+        if self.exporter:
+            self.exporter.stop()
+            self.exporter = None
+
+
+class PrometheusExporter(threading.Thread):
+    """
+    Thread qui écrit les mesures dans un fichier à intervalle régulier
+    """
+
+    def __init__(self, metrics, path, interval=10.0):
+        super().__init__(name="PrometheusExporter", daemon=True)
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self._write()
+        self._write()
+
+    def _write(self):
+        try:
+            self.metrics.write_prometheus(self.path)
+        except OSError:
+            # Répertoire absent ou disque plein : on réessaiera au prochain tour
+            pass
+
+    def stop(self, timeout=1.0):
+        self.stopped.set()
+        if self.is_alive():
+            self.join(timeout)
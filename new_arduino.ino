@@ -7,8 +7,52 @@ Servo servo1;
 Servo servo2;  
 Servo servo3;  
 
+// Négociation de vitesse (voir baud_negotiation.py)
+const long SAFE_BAUD = 9600;
+const long SUPPORTED_BAUDS[] = {9600, 19200, 38400, 57600, 115200, 250000, 500000};
+const unsigned long BAUD_PROBATION_MS = 1000;
+bool baud_probation = false;
+unsigned long baud_switched_at = 0;
+
+bool baud_supported(long rate) {
+  for (unsigned int i = 0; i < sizeof(SUPPORTED_BAUDS) / sizeof(SUPPORTED_BAUDS[0]); i++) {
+    if (SUPPORTED_BAUDS[i] == rate) return true;
+  }
+  return false;
+}
+
+void switch_baud(long rate) {
+  Serial.flush();
+  Serial.end();
+  Serial.begin(rate);
+}
+
+// Traite les commandes "BAUD <vitesse>" et "PING <motif>", renvoie true si la ligne en était une
+bool handle_link_command(String &data) {
+  if (data.startsWith("BAUD ")) {
+    long rate = data.substring(5).toInt();
+    if (!baud_supported(rate)) {
+      Serial.println("BAUD NON");
+      return true;
+    }
+    Serial.print("BAUD OK ");
+    Serial.println(rate);
+    switch_baud(rate);
+    baud_probation = rate != SAFE_BAUD;
+    baud_switched_at = millis();
+    return true;
+  }
+  if (data.startsWith("PING ")) {
+    Serial.print("PONG ");
+    Serial.println(data.substring(5));
+    baud_probation = false;
+    return true;
+  }
+  return false;
+}
+
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(SAFE_BAUD);
   
   servo0.attach(3);
   servo1.attach(5);
@@ -21,12 +65,31 @@ void setup() {
   servo3.write(90);
 }
 
+// Ligne en cours de réception, assemblée sans readStringUntil (qui bloque
+// jusqu'à 1 s quand la fin de ligne tarde)
+String pending_line = "";
+
 void loop() {
-  if (Serial.available()) {
-    String input_string = Serial.readStringUntil('\n');
+  if (baud_probation && millis() - baud_switched_at >= BAUD_PROBATION_MS) {
+    baud_probation = false;
+    switch_baud(SAFE_BAUD);
+  }
+
+  while (Serial.available()) {
+    char c = Serial.read();
+    if (c != '\n') {
+      pending_line += c;
+      continue;
+    }
+    String input_string = pending_line;
+    pending_line = "";
     
     input_string.trim();
 
+    if (handle_link_command(input_string)) {
+      continue;
+    }
+
     int values[8];
     int value_count = 0;
 
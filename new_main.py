@@ -1,5 +1,8 @@
 import serial  # Bibliothèque pour la communication série avec l'Arduino
 import time    # Bibliothèque pour les fonctions de temporisation
+from baud_negotiation import negotiate_baud_rate  # Négociation de la vitesse de la liaison
+from port_discovery import open_board, remember_port  # Démarrage rapide et recherche du port de l'Arduino
+from playback import DeadlinePlayer  # Lecture des séquences à échéances fixes (sans dérive)
 try:
     import readline  # Ajoute la gestion de l'historique des commandes (fonctionne sous Unix/Linux/MacOS)
 except ImportError:
@@ -11,24 +14,31 @@ except ImportError:
 # Variable globale pour stocker l'objet de connexion série
 ser = None
 
-def connect_arduino(port='/dev/ttyACM0', baudrate=9600):
+def connect_arduino(port='auto', baudrate=9600, auto_baud=False, reset=True):
     """
     Établit une connexion avec l'Arduino via le port série.
     
     Args:
-        port (str): Port série où l'Arduino est connecté (par défaut '/dev/ttyACM0' pour Linux)
+        port (str): Port série où l'Arduino est connecté ('auto' : recherche parmi /dev/ttyUSB* et /dev/ttyACM*)
                    Sous Windows, ce serait typiquement 'COM3' ou similaire
         baudrate (int): Vitesse de communication en bauds (doit correspondre à celle configurée sur l'Arduino)
+        auto_baud (bool): Si True, négocie ensuite une vitesse plus élevée avec l'Arduino
+        reset (bool): Si False, une carte déjà démarrée n'est pas redémarrée (connexion immédiate)
     
     Returns:
         serial.Serial ou None: Objet de connexion ou None en cas d'échec
     """
     global ser  # Référence à la variable globale pour y accéder ailleurs dans le programme
     try:
-        # Initialise la connexion série avec le délai d'attente de 1 seconde
-        ser = serial.Serial(port, baudrate, timeout=1)
-        time.sleep(2)  # Pause de 2 secondes pour laisser le temps à l'Arduino de se réinitialiser après la connexion
-        print("Arduino connecté avec succès")
+        # Ouvre le port et attend que l'Arduino réponde (bannière de démarrage ou sonde PING),
+        # au lieu d'une pause fixe de 2 secondes ; le port trouvé est gardé en cache
+        ser, port, _, _ = open_board(port, baudrate, reset=reset)
+        if auto_baud and ser.baudrate == baudrate:
+            # Propose 500000, 250000 puis 115200 bauds ; reste à baudrate si l'Arduino ne suit pas
+            rate = negotiate_baud_rate(ser)
+            print(f"Vitesse de la liaison: {rate} bauds")
+        remember_port(port, ser.baudrate)
+        print(f"Arduino connecté avec succès sur {port}")
         return ser
     except serial.SerialException as e:
         # Capture et affiche les erreurs de connexion (port incorrect, Arduino non connecté, etc.)
@@ -56,8 +66,9 @@ def move_servos(servo_positions):
         # Attendre un moment pour que l'Arduino exécute la commande
         time.sleep(0.5)
         
-        # Vérifier si l'Arduino a envoyé une réponse
-        if ser.in_waiting:
+        # Lire toutes les lignes envoyées par l'Arduino (une confirmation par servo),
+        # pas seulement la première : les suivantes seraient lues à la commande d'après
+        while ser.in_waiting:
             # Lecture et décodage de la réponse de l'Arduino
             response = ser.readline().decode('utf-8').strip()
             print(f"Réponse Arduino: {response}")
@@ -82,18 +93,25 @@ def mouvements_predefinis():
     """
     print("Mode mouvements prédéfinis activé")
     
-    # Séquence d'initialisation - commence par mettre tous les servos en position neutre
-    reset_position()
-    time.sleep(1)  # Pause d'une seconde
+    # Les séquences sont des listes de trames (instant en secondes, {servo: angle}).
+    # Les instants sont absolus : la pause de move_servos() ne décale pas les trames suivantes.
+    frames = [
+        # Séquence d'initialisation - commence par mettre tous les servos en position neutre
+        (0.0, {0: 90, 1: 90, 2: 90, 3: 90}),
+        # TODO: Ajoutez vos séquences de mouvements prédéfinis ici
+        # Exemple commenté montrant comment pourrait être implémentée une séquence "Salut":
+        # (1.0, {0: 45}),   # Déplace le servo 0 à 45 degrés
+        # (1.5, {0: 135}),  # 0.5 seconde plus tard, mouvement opposé
+        # (2.0, {0: 90}),   # Retour à la position neutre
+        (1.0, {}),  # Pause d'une seconde
+    ]
     
-    # TODO: Ajoutez vos séquences de mouvements prédéfinis ici
-    # Exemple commenté montrant comment pourrait être implémentée une séquence "Salut":
-    # print("Exécution de la séquence 1: Salut")
-    # move_servos({0: 45})  # Déplace le servo 0 à 45 degrés
-    # time.sleep(0.5)       # Pause de 0.5 seconde
-    # move_servos({0: 135}) # Déplace le servo 0 à 135 degrés (mouvement opposé)
-    # time.sleep(0.5)       # Pause de 0.5 seconde
-    # move_servos({0: 90})  # Retour à la position neutre
+    def send(targets):
+        move_servos(targets)
+        return True, None
+    
+    stats = DeadlinePlayer(send).play(frames)
+    print(stats)  # Gigue et dépassements mesurés pendant la séquence
     
     print("Fin des mouvements prédéfinis")
 
@@ -177,7 +195,7 @@ def main():
     permettant de choisir entre les différents modes de fonctionnement.
     """
     # Tente d'établir une connexion avec l'Arduino
-    arduino = connect_arduino()
+    arduino = connect_arduino(auto_baud=True)
     
     # Vérifie si la connexion a réussi
     if not ser:
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Lecture de séquences à échéances absolues
+
+Chaque trame est envoyée à l'instant start + t mesuré avec time.monotonic(),
+et non après une pause relative : le temps passé à écrire sur le port série
+est ainsi compensé et ne s'accumule pas d'un pas à l'autre. Si la lecture
+prend du retard, les trames déjà échues sont fusionnées (ou sautées) pour
+rattraper l'horloge.
+"""
+import math
+import time
+
+
+class PlaybackStats:
+    """
+    Statistiques de gigue et de dépassement d'une lecture
+    """
+
+    def __init__(self):
+        self.frames = 0          # Trames lues dans la séquence
+        self.writes = 0          # Écritures réellement effectuées
+        self.merged = 0          # Trames fusionnées dans une écriture en retard
+        self.skipped = 0         # Trames abandonnées (politique 'skip')
+        self.overruns = 0        # Écritures terminées après l'échéance suivante
+        self.failures = 0        # Écritures refusées par le contrôleur
+        self.nominal_duration = 0.0
+        self.duration = 0.0
+        self._jitter_sum = 0.0
+        self._jitter_sq = 0.0
+        self.max_jitter = 0.0
+        self._write_sum = 0.0
+        self.max_write = 0.0
+
+    def record(self, lateness, write_time):
+        self.writes += 1
+        self._jitter_sum += lateness
+        self._jitter_sq += lateness * lateness
+        self.max_jitter = max(self.max_jitter, lateness)
+        self._write_sum += write_time
+        self.max_write = max(self.max_write, write_time)
+
+    @property
+    def mean_jitter(self):
+        return self._jitter_sum / self.writes if self.writes else 0.0
+
+    @property
+    def jitter_stddev(self):
+        if not self.writes:
+            return 0.0
+        mean = self.mean_jitter
+        return math.sqrt(max(0.0, self._jitter_sq / self.writes - mean * mean))
+
+    def summary(self):
+        """
+        Returns:
+            dict: Statistiques (durées en millisecondes)
+        """
+        return {
+            'frames': self.frames,
+            'writes': self.writes,
+            'merged': self.merged,
+            'skipped': self.skipped,
+            'overruns': self.overruns,
+            'failures': self.failures,
+            'nominal_ms': self.nominal_duration * 1000,
+            'duration_ms': self.duration * 1000,
+            'jitter_mean_ms': self.mean_jitter * 1000,
+            'jitter_stddev_ms': self.jitter_stddev * 1000,
+            'jitter_max_ms': self.max_jitter * 1000,
+            'write_mean_ms': (self._write_sum / self.writes * 1000) if self.writes else 0.0,
+            'write_max_ms': self.max_write * 1000,
+        }
+
+    def __str__(self):
+        s = self.summary()
+        return (f"{s['writes']}/{s['frames']} trames envoyées en {s['duration_ms']:.0f} ms "
+                f"(prévu {s['nominal_ms']:.0f} ms) - gigue moy. {s['jitter_mean_ms']:.1f} ms, "
+                f"max {s['jitter_max_ms']:.1f} ms - {s['overruns']} dépassement(s), "
+                f"{s['merged']} fusionnée(s), {s['skipped']} sautée(s)")
+
+
+def controller_sender(controller):
+    """
+    Renvoie une fonction d'envoi {servo: angle} -> set_servo_angle en une trame combinée
+    """
+    def send(targets):
+        servos = sorted(targets)
+        return controller.set_servo_angle(servos, [targets[s] for s in servos], multi_servo=True)
+    return send
+
+
+class DeadlinePlayer:
+    """
+    Joue une suite de trames (t, {servo: angle}) à des échéances absolues
+    """
+
+    def __init__(self, send, policy='merge', speed=1.0, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            send (callable): Reçoit {servo: angle}, renvoie (bool, message)
+            policy (str): 'merge' fusionne les trames échues (dernier gagnant par servo),
+                          'skip' ne garde que la plus récente
+            speed (float): Multiplicateur de vitesse (2.0 = deux fois plus vite)
+            clock (callable): Horloge monotone en secondes
+            sleep (callable): Fonction d'attente
+        """
+        if policy not in ('merge', 'skip'):
+            raise ValueError(f"Politique inconnue: {policy}")
+        if speed <= 0:
+            raise ValueError("La vitesse doit être strictement positive")
+        self.send = send
+        self.policy = policy
+        self.speed = speed
+        self.clock = clock
+        self.sleep = sleep
+
+    def play(self, frames):
+        """
+        Joue les trames et renvoie les statistiques de la lecture
+
+        Args:
+            frames (iterable): Trames (t_secondes, {servo: angle}) par t croissant ;
+                               un générateur convient, rien n'est chargé d'avance
+
+        Returns:
+            PlaybackStats: Statistiques de gigue et de dépassement
+        """
+        stats = PlaybackStats()
+        frames = iter(frames)
+        upcoming = next(frames, None)
+        start = self.clock()
+        last_t = 0.0
+
+        while upcoming is not None:
+            t, targets = upcoming
+            deadline = start + t / self.speed
+            delay = deadline - self.clock()
+            if delay > 0:
+                self.sleep(delay)
+            fired = self.clock()
+
+            stats.frames += 1
+            last_t = t
+            batch = dict(targets)
+            upcoming = next(frames, None)
+            # Rattrapage : toutes les trames déjà échues partent dans la même écriture
+            while upcoming is not None and start + upcoming[0] / self.speed <= fired:
+                stats.frames += 1
+                last_t = upcoming[0]
+                if self.policy == 'merge':
+                    batch.update(upcoming[1])
+                    stats.merged += 1
+                else:
+                    batch = dict(upcoming[1])
+                    stats.skipped += 1
+                upcoming = next(frames, None)
+
+            if batch:
+                success, _ = self.send(batch)
+                if not success:
+                    stats.failures += 1
+            done = self.clock()
+            stats.record(fired - deadline, done - fired)
+            if upcoming is not None and done > start + upcoming[0] / self.speed:
+                stats.overruns += 1
+
+        stats.nominal_duration = last_t / self.speed
+        stats.duration = self.clock() - start
+        return stats
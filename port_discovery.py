@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Démarrage rapide de la liaison : carte prête, ouverture sans redémarrage, recherche du port
+
+Au lieu d'une pause fixe de 2 s après l'ouverture du port, la connexion se
+termine dès que la carte se manifeste :
+    - par la bannière "Servos initialisés - Prêt à recevoir des commandes",
+      envoyée par le croquis au démarrage (après un redémarrage par DTR) ;
+    - ou par la réponse à une sonde ("PING ..." -> "PONG ...", trame CMD_PING
+      en binaire), quand la carte tournait déjà.
+
+Ouvrir le port active DTR, ce qui redémarre l'Arduino. Avec reset=False, le
+drapeau HUPCL du port est effacé : DTR reste actif à la fermeture, et les
+ouvertures suivantes ne redémarrent plus la carte (la première ouverture
+après le branchement la redémarre encore).
+
+La recherche automatique sonde en parallèle tous les /dev/ttyUSB* et
+/dev/ttyACM*. Le port retenu est gardé en cache, indexé par le numéro de
+série USB de la carte : au lancement suivant, la carte connue est sondée
+seule, directement à la dernière vitesse négociée, même si elle a changé de
+port.
+"""
+import glob
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import serial
+
+import binary_protocol
+from baud_negotiation import DEFAULT_CANDIDATES, SAFE_BAUD
+from serial_reader import LineSplitter
+
+READY_BANNER = "Servos initialisés - Prêt à recevoir des commandes"
+PORT_PATTERNS = ('/dev/ttyUSB*', '/dev/ttyACM*')
+DEFAULT_CACHE = os.path.join('.cache', 'ports.json')
+
+# Délai maximal d'attente de la carte après un redémarrage (bootloader compris)
+READY_TIMEOUT = 2.0
+# Durée pendant laquelle la carte est sondée à chaque vitesse essayée
+PROBE_WINDOW = 0.1
+# Durée pendant laquelle DTR est relâché pour provoquer un redémarrage
+DTR_PULSE = 0.05
+# Intervalle entre deux sondes (aller-retour d'une sonde à 9600 bauds : environ 25 ms)
+PROBE_INTERVAL = 0.05
+PROBE_PATTERN = "ready"
+
+
+def open_port(port, baudrate, timeout=1, reset=True):
+    """
+    Ouvre un port série, avec ou sans redémarrage ultérieur de l'Arduino
+
+    Args:
+        port (str): Port série
+        baudrate (int): Vitesse de la liaison
+        timeout (float): Délai de lecture du port (s)
+        reset (bool): Si False, DTR reste actif à la fermeture du port : les
+                      ouvertures suivantes ne redémarrent pas la carte. Si True,
+                      la carte redémarre, même si DTR était resté actif
+
+    Returns:
+        serial.Serial: Port ouvert
+    """
+    ser = serial.Serial(None, baudrate, timeout=timeout)
+    ser.port = port
+    ser.open()
+    if _set_hangup(ser, reset) is False and reset:
+        # DTR était resté actif : l'ouverture n'a rien redémarré. Fermer le port
+        # (HUPCL rétabli) relâche DTR, le rouvrir le réactive : la carte redémarre
+        ser.close()
+        time.sleep(DTR_PULSE)
+        ser.open()
+    return ser
+
+
+def _set_hangup(ser, enabled):
+    """
+    Active ou efface HUPCL (DTR relâché à la fermeture du port), POSIX uniquement
+
+    Returns:
+        bool or None: État précédent du drapeau, None s'il n'est pas lisible
+    """
+    try:
+        import termios
+    except ImportError:
+        return None
+    try:
+        attributes = termios.tcgetattr(ser.fileno())
+        previous = bool(attributes[2] & termios.HUPCL)
+        if previous != enabled:
+            attributes[2] ^= termios.HUPCL
+            termios.tcsetattr(ser.fileno(), termios.TCSANOW, attributes)
+        return previous
+    except (termios.error, OSError, ValueError):
+        return None
+
+
+def _send_probe(ser, binary):
+    if binary:
+        ser.write(binary_protocol.encode_ping(PROBE_PATTERN.encode('ascii'), seq=0))
+    else:
+        ser.write(f"PING {PROBE_PATTERN}\n".encode('utf-8'))
+
+
+def _ready_signal(message, binary):
+    """
+    Renvoie 'banner' ou 'probe' si le message montre que la carte est prête, None sinon
+    """
+    if message == READY_BANNER:
+        return 'banner'
+    if binary:
+        if isinstance(message, binary_protocol.Reply) and message.ack and message.seq == 0:
+            return 'probe'
+    elif message == f"PONG {PROBE_PATTERN}":
+        return 'probe'
+    return None
+
+
+def wait_until_ready(ser, binary=False, probe=True, timeout=READY_TIMEOUT):
+    """
+    Attend que la carte soit prête : bannière de démarrage ou réponse à une sonde
+
+    Args:
+        ser (serial.Serial): Port ouvert
+        binary (bool): True si la carte utilise le protocole binaire
+        probe (bool): Sonder la carte à intervalles réguliers (inutile juste après
+                      un redémarrage : le bootloader ignore les octets reçus)
+        timeout (float): Délai maximal d'attente (s)
+
+    Returns:
+        tuple: (str ou None, list) - 'banner', 'probe' ou None si la carte ne s'est
+               pas manifestée, et les messages reçus (bannière comprise)
+    """
+    splitter = binary_protocol.ReplySplitter() if binary else LineSplitter()
+    messages = []
+    saved_timeout = ser.timeout
+    ser.timeout = 0.01
+    started = time.monotonic()
+    next_probe = started
+    probes = replies = 0
+    signal = None
+    try:
+        while signal is None:
+            now = time.monotonic()
+            if now - started >= timeout:
+                return None, messages
+            if probe and now >= next_probe:
+                _send_probe(ser, binary)
+                probes += 1
+                next_probe = now + PROBE_INTERVAL
+            for message in splitter.feed(ser.read(ser.in_waiting or 1)):
+                found = _ready_signal(message, binary)
+                if found == 'probe':
+                    replies += 1
+                elif found == 'banner':
+                    messages.append(message)
+                if found and signal is None:
+                    signal = found
+                elif not found:
+                    messages.append(message)
+        # Réponses des sondes encore en route : lues ici pour ne pas polluer la suite
+        deadline = time.monotonic() + PROBE_INTERVAL
+        while replies < probes and time.monotonic() < deadline:
+            for message in splitter.feed(ser.read(ser.in_waiting or 1)):
+                if _ready_signal(message, binary) == 'probe':
+                    replies += 1
+                else:
+                    messages.append(message)
+        return signal, messages
+    finally:
+        ser.timeout = saved_timeout
+
+
+def find_board(ser, rates, binary=False, timeout=READY_TIMEOUT):
+    """
+    Cherche une carte sans la redémarrer : sonde à chaque vitesse, puis attend à la dernière
+
+    Une carte restée à une vitesse négociée lors d'une session précédente
+    répond à cette vitesse. Si aucune ne répond, la carte est peut-être en
+    train de redémarrer (première ouverture après le branchement) : on attend
+    sa bannière à la dernière vitesse de la liste.
+
+    Args:
+        ser (serial.Serial): Port ouvert
+        rates (list): Vitesses à essayer, dans l'ordre
+        binary (bool): True si la carte utilise le protocole binaire
+        timeout (float): Délai maximal d'attente d'un redémarrage (s)
+
+    Returns:
+        tuple: Comme wait_until_ready ; ser.baudrate est la vitesse de la carte
+    """
+    for rate in rates:
+        ser.baudrate = rate
+        ser.reset_input_buffer()
+        # Les messages reçus à une mauvaise vitesse ne sont que des octets illisibles
+        signal, messages = wait_until_ready(ser, binary, probe=True, timeout=PROBE_WINDOW)
+        if signal:
+            return signal, messages
+    return wait_until_ready(ser, binary, probe=True, timeout=timeout)
+
+
+def candidate_ports():
+    """
+    Ports série susceptibles d'être un Arduino (/dev/ttyUSB*, /dev/ttyACM*)
+    """
+    return sorted(port for pattern in PORT_PATTERNS for port in glob.glob(pattern))
+
+
+def usb_serial_numbers():
+    """
+    Numéros de série USB des ports présents
+
+    Returns:
+        dict: {port: numéro de série} (vide si pyserial ne sait pas les lire)
+    """
+    try:
+        from serial.tools import list_ports
+    except ImportError:
+        return {}
+    return {info.device: info.serial_number for info in list_ports.comports() if info.serial_number}
+
+
+def load_cache(path=DEFAULT_CACHE):
+    """
+    Lit le cache {numéro de série: {'port': ..., 'baud': ...}} (vide s'il est absent ou illisible)
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def remember_port(port, baud, path=DEFAULT_CACHE):
+    """
+    Note le port et la vitesse de la carte branchée sur port, sous son numéro de série USB
+
+    Returns:
+        bool: True si le cache a été mis à jour (carte USB avec numéro de série)
+    """
+    number = usb_serial_numbers().get(port)
+    if not number:
+        return False
+    cache = load_cache(path)
+    if cache.get(number) == {'port': port, 'baud': baud}:
+        return True
+    cache[number] = {'port': port, 'baud': baud}
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Écriture atomique : deux programmes lancés ensemble ne lisent jamais un cache à moitié écrit
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(temporary, path)
+    except OSError:
+        return False
+    return True
+
+
+def cached_baud(port, path=DEFAULT_CACHE):
+    """
+    Dernière vitesse connue de la carte branchée sur port (None si elle n'est pas en cache)
+    """
+    number = usb_serial_numbers().get(port)
+    entry = load_cache(path).get(number) if number else None
+    return entry.get('baud') if isinstance(entry, dict) else None
+
+
+def probe_port(port, rates, binary=False, timeout=READY_TIMEOUT):
+    """
+    Ouvre un port sans redémarrer la carte et la cherche (voir find_board), puis le referme
+
+    Returns:
+        tuple or None: (vitesse, signal, messages), None si aucune carte n'a répondu
+    """
+    try:
+        ser = open_port(port, rates[0], timeout=0.01, reset=False)
+    except (serial.SerialException, OSError, ValueError):
+        return None
+    try:
+        signal, messages = find_board(ser, rates, binary, timeout)
+        return (ser.baudrate, signal, messages) if signal else None
+    except (serial.SerialException, OSError):
+        return None
+    finally:
+        ser.close()
+
+
+def _unique(values):
+    return list(dict.fromkeys(value for value in values if value))
+
+
+def discover_port(rates=(SAFE_BAUD,), binary=False, timeout=READY_TIMEOUT, cache_path=DEFAULT_CACHE):
+    """
+    Trouve la carte Arduino parmi les ports candidats
+
+    La carte connue du cache (numéro de série USB) est sondée d'abord, seule
+    et à sa dernière vitesse ; sinon tous les candidats sont sondés en
+    parallèle et le premier qui répond l'emporte.
+
+    Args:
+        rates (list): Vitesses à essayer sur chaque port
+        binary (bool): True si la carte utilise le protocole binaire
+        timeout (float): Délai maximal d'attente d'une carte qui redémarre (s)
+        cache_path (str): Fichier du cache (None : pas de cache)
+
+    Returns:
+        tuple or None: (port, vitesse, signal, messages), None si aucune carte n'a répondu
+    """
+    candidates = candidate_ports()
+    if cache_path:
+        cache = load_cache(cache_path)
+        numbers = usb_serial_numbers()
+        for port in list(candidates):
+            entry = cache.get(numbers.get(port))
+            if not isinstance(entry, dict):
+                continue
+            candidates.remove(port)
+            found = probe_port(port, _unique([entry.get('baud'), *rates]), binary, timeout)
+            if found:
+                return (port,) + found
+    if not candidates:
+        return None
+
+    # Un thread par port : le délai total est celui du port le plus lent à répondre, pas leur somme
+    executor = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="probe")
+    try:
+        futures = {executor.submit(probe_port, port, list(rates), binary, timeout): port for port in candidates}
+        for future in as_completed(futures):
+            found = future.result()
+            if found:
+                return (futures[future],) + found
+        return None
+    finally:
+        # Les sondes encore en cours finissent seules (et referment leur port)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def open_board(port, baudrate=SAFE_BAUD, binary=False, reset=True, candidates=DEFAULT_CANDIDATES,
+               timeout=READY_TIMEOUT, cache_path=DEFAULT_CACHE):
+    """
+    Ouvre la liaison avec une carte et attend qu'elle soit prête
+
+    Avec reset=True, la carte redémarre et l'on attend sa bannière (une sonde
+    suffit pour un croquis sans bannière). Avec reset=False, la carte est
+    sondée à sa dernière vitesse connue, aux vitesses de négociation (une
+    carte non redémarrée garde celle de la session précédente), puis à baudrate.
+
+    Args:
+        port (str): Port série, ou 'auto' pour le chercher (voir discover_port)
+        baudrate (int): Vitesse sûre de la carte au démarrage
+        binary (bool): True si la carte utilise le protocole binaire
+        reset (bool): Redémarrer la carte à l'ouverture
+        candidates (tuple): Vitesses de négociation
+        timeout (float): Délai maximal d'attente de la carte (s)
+        cache_path (str): Fichier du cache des ports (None : pas de cache)
+
+    Returns:
+        tuple: (serial.Serial, port, signal, messages) - signal vaut 'banner' (la carte
+               a redémarré), 'probe' (elle tournait déjà) ou None (elle ne s'est pas manifestée)
+
+    Raises:
+        serial.SerialException: Port impossible à ouvrir, ou aucune carte trouvée
+    """
+    rates = sorted(candidates, reverse=True) + [baudrate]
+    if port == 'auto':
+        found = discover_port(_unique(rates), binary, timeout, cache_path)
+        if found is None:
+            raise serial.SerialException("Aucune carte Arduino trouvée (/dev/ttyUSB*, /dev/ttyACM*)")
+        port, rate, signal, messages = found
+        if not reset or signal == 'banner':
+            # La sonde a effacé HUPCL : cette nouvelle ouverture ne redémarre pas la carte
+            return open_port(port, rate, reset=False), port, signal, messages
+        # Carte trouvée déjà démarrée : redémarrée comme avec un port donné
+
+    ser = open_port(port, baudrate, reset=reset)
+    try:
+        if reset:
+            signal, messages = wait_until_ready(ser, binary, probe=False, timeout=timeout)
+            if signal is None:
+                # Croquis sans bannière (new_arduino.ino) : une sonde suffit à savoir s'il répond
+                signal, more = wait_until_ready(ser, binary, probe=True, timeout=PROBE_WINDOW)
+                messages += more
+        else:
+            known = cached_baud(port, cache_path) if cache_path else None
+            signal, messages = find_board(ser, _unique([known] + rates), binary, timeout)
+    except BaseException:
+        ser.close()
+        raise
+    return ser, port, signal, messages
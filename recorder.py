@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Enregistrement et relecture des sessions du mode interactif
+
+Chaque consigne est notée dans un tampon circulaire préalloué (array) sous
+forme de 5 doubles : instant relatif puis les 4 angles. Un thread écrit les
+blocs pleins sur le disque, si bien que l'enregistrement ne bloque jamais la
+boucle de lecture des touches. Le fichier (.rec) est l'en-tête MAGIC suivi
+des enregistrements bruts.
+"""
+import os
+import struct
+import threading
+import time
+from array import array
+
+from playback import DeadlinePlayer, controller_sender
+
+NUM_SERVOS = 4
+MAGIC = b'REC1'
+EXTENSION = '.rec'
+DEFAULT_DIRECTORY = 'recordings'
+
+RECORD_FIELDS = 1 + NUM_SERVOS
+RECORD = struct.Struct('<' + 'd' * RECORD_FIELDS)
+
+
+class SessionRecorder:
+    """
+    Enregistreur horodaté à tampon circulaire, vidé sur disque par blocs
+    """
+
+    def __init__(self, path, capacity=4096, chunk=256, clock=time.monotonic):
+        """
+        Args:
+            path (str): Fichier d'enregistrement (créé ou écrasé)
+            capacity (int): Nombre d'enregistrements du tampon circulaire
+            chunk (int): Taille des blocs écrits sur disque
+            clock (callable): Horloge monotone en secondes
+        """
+        if not (0 < chunk <= capacity):
+            raise ValueError("La taille de bloc doit être comprise entre 1 et la capacité")
+        self.path = path
+        self.capacity = capacity
+        self.chunk = chunk
+        self.clock = clock
+        self.buffer = array('d', bytes(8 * RECORD_FIELDS * capacity))
+        self.written = 0      # Nombre total d'enregistrements notés
+        self.flushed = 0      # Nombre total d'enregistrements écrits sur disque
+        self.dropped = 0      # Enregistrements écrasés avant d'avoir été écrits
+        self.start = None
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+        self.file = None
+
+    def begin(self):
+        """
+        Démarre l'enregistrement (ouvre le fichier et le thread d'écriture)
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, 'wb')
+        self.file.write(MAGIC)
+        self.start = self.clock()
+        self.running = True
+        self.thread = threading.Thread(target=self._flush_loop, name="SessionRecorder", daemon=True)
+        self.thread.start()
+
+    def record(self, angles):
+        """
+        Note une consigne (les 4 angles) avec son instant ; ne fait jamais d'entrée/sortie
+        """
+        t = self.clock() - self.start
+        with self.lock:
+            base = (self.written % self.capacity) * RECORD_FIELDS
+            self.buffer[base] = t
+            for servo in range(NUM_SERVOS):
+                self.buffer[base + 1 + servo] = angles[servo]
+            self.written += 1
+            pending = self.written - self.flushed
+        if pending >= self.chunk:
+            self.wakeup.set()
+
+    def _take_pending(self):
+        """
+        Copie les enregistrements non écrits (au plus un tampon complet)
+        """
+        with self.lock:
+            pending = self.written - self.flushed
+            if pending > self.capacity:
+                # Le disque n'a pas suivi : les plus anciens ont été écrasés
+                self.dropped += pending - self.capacity
+                self.flushed = self.written - self.capacity
+                pending = self.capacity
+            first = self.flushed % self.capacity
+            last = first + pending
+            if last <= self.capacity:
+                data = self.buffer[first * RECORD_FIELDS:last * RECORD_FIELDS].tobytes()
+            else:
+                data = (self.buffer[first * RECORD_FIELDS:].tobytes()
+                        + self.buffer[:(last - self.capacity) * RECORD_FIELDS].tobytes())
+            self.flushed = self.written
+        return data
+
+    def _flush_loop(self):
+        while self.running:
+            self.wakeup.wait(0.5)
+            self.wakeup.clear()
+            data = self._take_pending()
+            if data:
+                self.file.write(data)
+
+    def end(self):
+        """
+        Arrête l'enregistrement et écrit les derniers blocs
+
+        Returns:
+            int: Nombre d'enregistrements écrits dans le fichier
+        """
+        if not self.running:
+            return 0
+        self.running = False
+        self.wakeup.set()
+        self.thread.join()
+        self.file.write(self._take_pending())
+        self.file.close()
+        return self.written - self.dropped
+
+
+def read_recording(path, chunk=1024):
+    """
+    Lit un fichier d'enregistrement bloc par bloc
+
+    Yields:
+        tuple: (t_secondes, (angle0, angle1, angle2, angle3))
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Fichier d'enregistrement invalide: {path}")
+        while True:
+            data = f.read(RECORD.size * chunk)
+            if len(data) < RECORD.size:
+                return
+            for fields in RECORD.iter_unpack(data[:len(data) - len(data) % RECORD.size]):
+                yield fields[0], tuple(int(a) for a in fields[1:])
+
+
+def thin_recording(records, min_interval=0.0):
+    """
+    Supprime les échantillons redondants d'un enregistrement
+
+    Les poses identiques à la précédente sont retirées ; avec min_interval,
+    les échantillons plus rapprochés que cet intervalle sont fusionnés (seul
+    le plus récent est conservé, à l'instant du premier).
+
+    Args:
+        records (iterable): Échantillons (t, angles)
+        min_interval (float): Intervalle minimal entre deux échantillons conservés (s)
+
+    Yields:
+        tuple: (t_secondes, angles)
+    """
+    previous = None
+    window = None
+    for t, angles in records:
+        if window is not None and t - window[0] < min_interval:
+            window = (window[0], angles)
+            continue
+        if window is not None and window[1] != previous:
+            previous = window[1]
+            yield window
+        window = (t, angles)
+    if window is not None and window[1] != previous:
+        yield window
+
+
+def recording_frames(records):
+    """
+    Convertit des échantillons (t, angles) en trames (t, {servo: angle}) de servos modifiés
+    """
+    previous = None
+    for t, angles in records:
+        changed = {s: a for s, a in enumerate(angles) if previous is None or previous[s] != a}
+        previous = angles
+        yield t, changed
+
+
+def list_recordings(directory=DEFAULT_DIRECTORY):
+    """
+    Liste les enregistrements d'un répertoire, triés par nom
+    """
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.endswith(EXTENSION))
+
+
+def new_recording_path(directory=DEFAULT_DIRECTORY):
+    """
+    Renvoie un nom de fichier horodaté pour un nouvel enregistrement
+    """
+    return os.path.join(directory, time.strftime("session-%Y%m%d-%H%M%S") + EXTENSION)
+
+
+def replay_recording(controller, path, speed=1.0, min_interval=None, clock=time.monotonic, sleep=time.sleep):
+    """
+    Rejoue un enregistrement avec son minutage d'origine
+
+    Args:
+        controller (ArduinoServoController): Contrôleur connecté
+        path (str): Fichier d'enregistrement
+        speed (float): Multiplicateur de vitesse (2.0 = deux fois plus vite)
+        min_interval (float): Si donné, allège l'enregistrement (voir thin_recording)
+        clock, sleep (callable): Horloge et attente de la relecture (voir DeadlinePlayer)
+
+    Returns:
+        tuple: (bool, PlaybackStats ou str) - Succès et statistiques de la lecture
+    """
+    if not controller.is_connected():
+        return False, "Non connecté à l'Arduino"
+    records = read_recording(path)
+    if min_interval is not None:
+        records = thin_recording(records, min_interval)
+    try:
+        stats = DeadlinePlayer(controller_sender(controller), speed=speed, clock=clock, sleep=sleep).play(
+            recording_frames(records))
+    except (OSError, ValueError) as e:
+        return False, str(e)
+    return stats.failures == 0, stats
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Enveloppe de sécurité des servos : limites douces, contraintes couplées, zones interdites
+
+Toutes les règles sont précalculées en tables booléennes sur la grille des
+angles entiers (0 à 180°) :
+
+    - une table de 181 cases par servo (limites douces) ;
+    - une table de 181 × 181 cases par couple de servos contraints
+      (contraintes couplées, zones interdites, sol calculé avec le modèle
+      du bras de kinematics.py).
+
+Vérifier une pose revient à lire quelques cases ; vérifier une trajectoire
+N×4 entière est une seule indexation NumPy, avant l'envoi du moindre octet.
+
+Fichier de configuration JSON (main.py --safety) :
+
+    {
+      "limits": {"1": [15, 165], "3": [30, 120]},
+      "linear": [{"servos": [1, 2], "coefficients": [1, -1], "min": -150}],
+      "forbid": [{"servos": [1, 2], "box": [[0, 20], [0, 60]]}],
+      "floor": {"min_z": 10, "arm": {"base_height": 70, "upper_arm": 80, "forearm": 80}}
+    }
+"""
+import json
+
+import numpy as np
+
+GRID = 181  # Angles entiers de 0 à 180°
+NUM_SERVOS = 4
+
+
+class SafetyEnvelope:
+    """
+    Ensemble de règles de sécurité précalculées sur la grille des angles
+    """
+
+    def __init__(self, num_servos=NUM_SERVOS):
+        self.num_servos = num_servos
+        self.allowed = np.ones((num_servos, GRID), dtype=bool)  # Limites douces par servo
+        # (servo_a, servo_b) -> [table GRID×GRID des couples permis, [(libellé, table de la règle)]]
+        self.pairs = {}
+
+    def set_limits(self, servo, low, high):
+        """
+        Limites douces d'un servo (bornes comprises)
+        """
+        if not (0 <= low <= high <= 180):
+            raise ValueError(f"Limites invalides pour le servo {servo}: {low}-{high}")
+        self.allowed[servo] = False
+        self.allowed[servo, int(low):int(high) + 1] = True
+
+    def add_coupling(self, servo_a, servo_b, predicate, label):
+        """
+        Contrainte entre deux servos, évaluée une fois sur toute la grille
+
+        Args:
+            servo_a, servo_b (int): Servos concernés
+            predicate (callable): predicate(A, B) -> tableau booléen des couples permis,
+                                  appelé avec les grilles d'angles GRID×GRID
+            label (str): Description utilisée dans les messages de refus
+        """
+        if servo_a == servo_b:
+            raise ValueError("Une contrainte couplée porte sur deux servos différents")
+        if servo_a > servo_b:
+            servo_a, servo_b = servo_b, servo_a
+            predicate = lambda first, second, original=predicate: original(second, first)
+        a, b = np.meshgrid(np.arange(GRID, dtype=float), np.arange(GRID, dtype=float), indexing='ij')
+        permitted = np.broadcast_to(np.asarray(predicate(a, b), dtype=bool), (GRID, GRID))
+        entry = self.pairs.setdefault((servo_a, servo_b), [np.ones((GRID, GRID), dtype=bool), []])
+        entry[0] &= permitted
+        entry[1].append((label, permitted))
+
+    def add_linear(self, servo_a, servo_b, coefficients, minimum=None, maximum=None):
+        """
+        Contrainte linéaire : minimum <= ca × A + cb × B <= maximum
+        """
+        ca, cb = coefficients
+        low = -np.inf if minimum is None else minimum
+        high = np.inf if maximum is None else maximum
+        label = f"{ca:g}×servo{servo_a} {'-' if cb < 0 else '+'} {abs(cb):g}×servo{servo_b} hors de [{low:g}, {high:g}]"
+        self.add_coupling(servo_a, servo_b, lambda a, b: (low <= ca * a + cb * b) & (ca * a + cb * b <= high),
+                          label)
+
+    def forbid_box(self, servo_a, servo_b, range_a, range_b):
+        """
+        Zone interdite rectangulaire dans le plan des angles de deux servos (bornes comprises)
+        """
+        (a_low, a_high), (b_low, b_high) = range_a, range_b
+        label = f"zone interdite servo{servo_a} {a_low}-{a_high}°, servo{servo_b} {b_low}-{b_high}°"
+        self.add_coupling(servo_a, servo_b,
+                          lambda a, b: ~((a_low <= a) & (a <= a_high) & (b_low <= b) & (b <= b_high)), label)
+
+    def add_floor(self, model, min_z):
+        """
+        Interdit les poses où le coude ou la pince descendent sous min_z (table, sol)
+
+        Args:
+            model (kinematics.ArmModel): Géométrie du bras
+            min_z (float): Hauteur minimale (mm)
+        """
+        shoulder, elbow = model.servos[1], model.servos[2]
+
+        def above_floor(s, e):
+            a1 = np.radians((s - model.zeros[1]) * model.directions[1])
+            elbow_z = model.base_height + model.upper_arm * np.sin(a1)
+            _, tip_z = model.planar(s, e)
+            return (elbow_z >= min_z) & (tip_z >= min_z)
+
+        self.add_coupling(shoulder, elbow, above_floor, f"bras sous {min_z:g} mm")
+
+    def check_pose(self, angles, changed=None):
+        """
+        Vérifie une pose (une case de table par règle)
+
+        Args:
+            angles (list): Un angle par servo (None : inconnu, non vérifié)
+            changed (set): Si donné, seules les règles portant sur ces servos sont vérifiées
+
+        Returns:
+            tuple: (bool, str) - Succès et raison du refus
+        """
+        for servo, angle in enumerate(angles):
+            if angle is None or (changed is not None and servo not in changed):
+                continue
+            if not (0 <= angle <= 180):
+                return False, f"L'angle {angle} doit être entre 0 et 180 degrés"
+            if not self.allowed[servo, int(round(angle))]:
+                return False, f"Servo {servo}: {angle}° hors des limites de sécurité"
+        for (a, b), (table, rules) in self.pairs.items():
+            if angles[a] is None or angles[b] is None:
+                continue
+            if changed is not None and a not in changed and b not in changed:
+                continue
+            cell = int(round(angles[a])), int(round(angles[b]))
+            if not table[cell]:
+                # Refus : on retrouve les règles en cause pour le message (hors chemin critique)
+                broken = [label for label, permitted in rules if not permitted[cell]]
+                return False, f"Pose refusée ({'; '.join(broken)})"
+        return True, ""
+
+    def check_targets(self, servos, angles, current):
+        """
+        Vérifie des consignes partielles, complétées par les angles actuels des autres servos
+
+        Seules les règles qui portent sur un servo modifié sont vérifiées : une
+        pose de départ hors enveloppe (démarrage à 90°) n'empêche pas d'en sortir.
+
+        Args:
+            servos (list): Numéros des servos modifiés
+            angles (list): Angles demandés
+            current (list): Angles actuels de tous les servos
+        """
+        pose = list(current)
+        for servo, angle in zip(servos, angles):
+            pose[servo] = angle
+        return self.check_pose(pose, set(servos))
+
+    def first_violation(self, setpoints):
+        """
+        Cherche la première pose interdite d'une trajectoire, en une passe vectorisée
+
+        Args:
+            setpoints (ndarray): Tableau N×num_servos des angles
+
+        Returns:
+            int or None: Indice de la première pose interdite, None si tout est permis
+        """
+        angles = np.rint(np.asarray(setpoints, dtype=float)).astype(np.int64)
+        outside = ((angles < 0) | (angles > 180)).any(axis=1)
+        angles = np.clip(angles, 0, 180)
+        bad = outside | ~self.allowed[np.arange(self.num_servos), angles].all(axis=1)
+        for (a, b), (table, _) in self.pairs.items():
+            bad |= ~table[angles[:, a], angles[:, b]]
+        if not bad.any():
+            return None
+        return int(np.argmax(bad))
+
+    def check_trajectory(self, setpoints):
+        """
+        Vérifie une trajectoire entière avant son envoi
+
+        Returns:
+            tuple: (bool, str) - Succès et description de la première pose interdite
+        """
+        index = self.first_violation(setpoints)
+        if index is None:
+            return True, ""
+        _, reason = self.check_pose(np.rint(np.asarray(setpoints[index], dtype=float)).astype(int).tolist())
+        return False, f"Pose {index} de la trajectoire: {reason}"
+
+    @classmethod
+    def from_config(cls, config, num_servos=NUM_SERVOS):
+        """
+        Construit une enveloppe depuis un dictionnaire (format décrit en tête de module)
+        """
+        envelope = cls(num_servos)
+        for servo, (low, high) in config.get('limits', {}).items():
+            envelope.set_limits(int(servo), low, high)
+        for rule in config.get('linear', []):
+            envelope.add_linear(*rule['servos'], rule['coefficients'], rule.get('min'), rule.get('max'))
+        for rule in config.get('forbid', []):
+            envelope.forbid_box(*rule['servos'], *rule['box'])
+        if 'floor' in config:
+            # kinematics n'est nécessaire que pour la règle du sol
+            from kinematics import ArmModel
+            floor = config['floor']
+            envelope.add_floor(ArmModel(**floor.get('arm', {})), floor['min_z'])
+        return envelope
+
+    @classmethod
+    def load(cls, path, num_servos=NUM_SERVOS):
+        """
+        Lit une enveloppe depuis un fichier JSON
+        """
+        with open(path, encoding='utf-8') as f:
+            return cls.from_config(json.load(f), num_servos)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Exécution non interactive de scripts de commandes
+
+Un script est un fichier (ou l'entrée standard) dont chaque ligne est une
+pose, écrite avec la syntaxe de main.py ou celle de new_main.py :
+
+    # Commentaire
+    a(0, 90, 1, 45)         # servo, angle, servo, angle...
+    0:45, 1:120, 3:30       # servo:angle
+    reset                   # tous les servos à 90°
+
+Tout le script est analysé et validé avant le premier envoi, avec un seul
+motif compilé ; toutes les erreurs sont signalées avec leur numéro de ligne.
+Les poses sont ensuite envoyées à la suite, sans attendre la réponse de
+chacune : seul le nombre d'octets non confirmés est limité, pour ne pas
+déborder le tampon de réception de l'Arduino.
+"""
+import re
+import time
+from collections import deque
+from concurrent.futures import Future
+
+# Tampon de réception série de l'Arduino (octets)
+ARDUINO_RX_BUFFER = 64
+
+# Un seul motif pour toute la ligne ; chaque caractère appartient à un jeton
+TOKEN_PATTERN = re.compile(r"""
+      (?P<call>a\(\s*(?P<args>[^()]*?)\s*\))                 # a(servo, angle, ...)
+    | (?P<pair>(?P<servo>\d+)\s*:\s*(?P<angle>[-+]?\d+))    # servo:angle
+    | (?P<reset>reset)\b
+    | (?P<comment>\#.*)
+    | (?P<separator>[\s,;]+)
+    | (?P<error>[^\s,;#]+)
+""", re.VERBOSE | re.IGNORECASE)
+
+
+class ScriptError(ValueError):
+    """
+    Erreurs d'un script, toutes lignes confondues
+    """
+
+    def __init__(self, errors):
+        super().__init__("\n".join(f"ligne {number}: {message}" for number, message in errors))
+        self.errors = errors
+
+
+def _check(pose, servo, angle, num_servos, errors, number):
+    """
+    Ajoute servo:angle à la pose s'il est valide, sinon note l'erreur
+    """
+    if not (0 <= servo < num_servos):
+        errors.append((number, f"servo {servo} inexistant (0-{num_servos - 1})"))
+    elif not (0 <= angle <= 180):
+        errors.append((number, f"angle {angle} invalide pour le servo {servo} (0-180)"))
+    else:
+        pose[servo] = angle
+
+
+def parse_line(line, num_servos, number=0, errors=None):
+    """
+    Analyse une ligne de script
+
+    Args:
+        line (str): Ligne à analyser
+        num_servos (int): Nombre de servos du contrôleur
+        number (int): Numéro de la ligne (pour les messages d'erreur)
+        errors (list): Liste où ajouter les erreurs (number, message)
+
+    Returns:
+        dict: Pose {servo: angle} de la ligne (vide pour un commentaire)
+    """
+    errors = [] if errors is None else errors
+    pose = {}
+    for token in TOKEN_PATTERN.finditer(line):
+        kind = token.lastgroup
+        if kind == 'pair':
+            _check(pose, int(token.group('servo')), int(token.group('angle')), num_servos, errors, number)
+        elif kind == 'call':
+            try:
+                args = [int(x) for x in token.group('args').split(',')]
+            except ValueError:
+                errors.append((number, f"arguments non entiers dans '{token.group()}'"))
+                continue
+            if len(args) % 2 != 0:
+                errors.append((number, f"nombre impair d'arguments dans '{token.group()}'"))
+                continue
+            for servo, angle in zip(args[::2], args[1::2]):
+                _check(pose, servo, angle, num_servos, errors, number)
+        elif kind == 'reset':
+            pose.update((servo, 90) for servo in range(num_servos))
+        elif kind == 'error':
+            errors.append((number, f"commande inconnue '{token.group()}'"))
+    return pose
+
+
+def parse_script(lines, num_servos):
+    """
+    Analyse et valide un script entier, ligne par ligne (fichier ou flux)
+
+    Args:
+        lines (iterable): Lignes du script, par exemple un fichier ouvert ou sys.stdin
+        num_servos (int): Nombre de servos du contrôleur
+
+    Returns:
+        list: Poses [(numéro_ligne, [servos], [angles])], dans l'ordre du script
+
+    Raises:
+        ScriptError: Au moins une ligne invalide ; toutes les erreurs sont réunies
+    """
+    commands = []
+    errors = []
+    for number, line in enumerate(lines, start=1):
+        pose = parse_line(line, num_servos, number, errors)
+        if pose and not errors:
+            servos = sorted(pose)
+            commands.append((number, servos, [pose[s] for s in servos]))
+    if errors:
+        raise ScriptError(errors)
+    return commands
+
+
+def script_poses(commands, initial):
+    """
+    Pose complète après chaque ligne d'un script (pour une vérification d'ensemble)
+
+    Args:
+        commands (list): Poses rendues par parse_script
+        initial (list): Angles de tous les servos avant le script
+
+    Returns:
+        list: Une liste d'angles de tous les servos par commande
+    """
+    pose = list(initial)
+    poses = []
+    for _, servos, angles in commands:
+        for servo, angle in zip(servos, angles):
+            pose[servo] = angle
+        poses.append(list(pose))
+    return poses
+
+
+def reply_futures(result):
+    """
+    Extrait les Futures des réponses d'un envoi (une carte ou plusieurs)
+    """
+    if isinstance(result, Future):
+        return [result]
+    if isinstance(result, dict):
+        return [reply for _, reply in result.values() if isinstance(reply, Future)]
+    return []
+
+
+class ReplyPipeline:
+    """
+    Commandes envoyées sans attendre leur réponse, dans la limite d'un budget d'octets
+
+    Les Futures des réponses sont gardées dans l'ordre d'envoi ; la plus
+    ancienne n'est attendue que lorsque la commande suivante ferait dépasser
+    max_bytes octets non confirmés (le tampon de réception de l'Arduino).
+    """
+
+    def __init__(self, max_bytes=ARDUINO_RX_BUFFER):
+        self.max_bytes = max_bytes
+        self.in_flight = deque()  # (Futures, octets) dans l'ordre d'envoi
+        self.outstanding = 0
+        self.missing = 0  # Commandes restées sans réponse
+
+    def make_room(self, size):
+        """
+        Attend les réponses les plus anciennes jusqu'à ce que size octets puissent partir
+        """
+        while self.in_flight and self.outstanding + size > self.max_bytes:
+            self.settle_oldest()
+
+    def settle_oldest(self):
+        """
+        Attend la réponse de la plus ancienne commande en vol
+
+        Returns:
+            bool: False s'il n'y avait aucune commande en vol
+        """
+        if not self.in_flight:
+            return False
+        futures, size = self.in_flight.popleft()
+        self.outstanding -= size
+        self.missing += sum(1 for future in futures if not future.result())
+        return True
+
+    def add(self, result, size):
+        """
+        Note une commande envoyée (result : second élément rendu par set_servo_angle)
+        """
+        # Les poses déjà confirmées ne sont pas renvoyées (Future déjà résolue)
+        futures = [future for future in reply_futures(result) if not future.done()]
+        if futures:
+            self.in_flight.append((futures, size))
+            self.outstanding += size
+
+    def drain(self):
+        """
+        Attend toutes les réponses restantes
+        """
+        while self.settle_oldest():
+            pass
+
+
+def run_script(controller, commands, max_bytes=ARDUINO_RX_BUFFER):
+    """
+    Envoie les poses d'un script à la suite, sans aller-retour par ligne
+
+    Le contrôleur doit avoir son thread de lecture : chaque envoi rend une
+    Future, attendue seulement quand les commandes non confirmées dépassent
+    max_bytes octets.
+
+    Args:
+        controller: ArduinoServoController ou ControllerPool connecté
+        commands (list): Poses rendues par parse_script
+        max_bytes (int): Octets de commandes autorisés en vol
+
+    Returns:
+        tuple: (bool, str) - Succès et résumé (ou message d'erreur)
+    """
+    if not controller.is_connected():
+        return False, "Non connecté à l'Arduino"
+    started = time.monotonic()
+    pipeline = ReplyPipeline(max_bytes)
+
+    for number, servos, angles in commands:
+        # Taille de la trame texte "s,a;s,a\n" (majorant pour le protocole binaire)
+        size = sum(len(f"{s},{a};") for s, a in zip(servos, angles))
+        pipeline.make_room(size)
+        success, result = controller.set_servo_angle(servos, angles, multi_servo=True)
+        if not success and pipeline.settle_oldest():
+            # Fenêtre de commandes pleine : on libère la plus ancienne et on réessaie
+            success, result = controller.set_servo_angle(servos, angles, multi_servo=True)
+        if not success:
+            return False, f"ligne {number}: {result}"
+        pipeline.add(result, size)
+
+    pipeline.drain()
+    elapsed = time.monotonic() - started
+    rate = len(commands) / elapsed if elapsed > 0 else 0.0
+    summary = f"{len(commands)} poses en {elapsed:.2f} s ({rate:.0f} poses/s)"
+    if pipeline.missing:
+        return False, f"{summary}, {pipeline.missing} sans réponse de l'Arduino"
+    return True, summary
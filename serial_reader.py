@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+
+# Confirmation envoyée par arduino.ino pour chaque servo mis à jour
+CONFIRMATION_PATTERN = re.compile(r"Servo (\d+) positionn.+? (\d+) degr")
+
+
+def resolve(future, result):
+    """
+    Résout une Future de réponse, sauf si celui qui l'attendait l'a annulée entre-temps
+
+    Une Future déjà annulée ne doit pas arrêter le thread de lecture.
+    """
+    if not future.done():
+        try:
+            future.set_result(result)
+        except InvalidStateError:  # Annulée entre le test et set_result
+            pass
+
+
+class LineSplitter:
+    """
+    Découpe un flux d'octets en lignes de texte, de façon incrémentale
+    """
+
+    def __init__(self, encoding='utf-8'):
+        self.encoding = encoding
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Ajoute des octets au tampon et renvoie les lignes complètes
+
+        Args:
+            data (bytes): Octets reçus du port série
+
+        Returns:
+            list: Lignes complètes décodées (sans fin de ligne)
+        """
+        self.buffer += data
+        lines = []
+        start = 0
+        while True:
+            end = self.buffer.find(b'\n', start)
+            if end < 0:
+                break
+            line = self.buffer[start:end].decode(self.encoding, errors='replace').strip()
+            if line:
+                lines.append(line)
+            start = end + 1
+        if start:
+            del self.buffer[:start]
+        return lines
+
+
+class PendingReply:
+    """
+    Réponse attendue pour une commande envoyée à l'Arduino
+    """
+
+    def __init__(self, expected, timeout):
+        self.future = Future()
+        self.expected = expected
+        self.deadline = time.monotonic() + timeout
+        self.lines = []
+
+
+class SerialReader(threading.Thread):
+    """
+    Thread unique qui lit le port série par blocs et distribue les réponses
+
+    Les confirmations sont attribuées aux commandes en attente dans l'ordre
+    d'envoi (futures). Les autres messages sont placés dans une file.
+    """
+
+    def __init__(self, serial_port, splitter=None, is_reply=None, listener=None, periodic=None):
+        """
+        Args:
+            serial_port (serial.Serial): Port série déjà ouvert
+            splitter: Objet avec une méthode feed(bytes) -> liste de messages
+            is_reply (callable): Indique si un message est une confirmation
+            listener (callable): Appelé pour chaque message reçu, avant sa distribution ;
+                                 s'il renvoie True, le message est considéré comme traité
+            periodic (callable): Appelé à chaque tour de boucle (au moins toutes les
+                                 timeout secondes du port), par exemple pour les retransmissions
+        """
+        super().__init__(name="SerialReader", daemon=True)
+        self.serial = serial_port
+        self.splitter = splitter or LineSplitter()
+        self.is_reply = is_reply or (lambda message: CONFIRMATION_PATTERN.match(message) is not None)
+        self.listener = listener
+        self.periodic = periodic
+        self.messages = queue.Queue()
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.running = threading.Event()
+
+    def expect(self, count, timeout):
+        """
+        Enregistre une commande qui attend des confirmations
+
+        Args:
+            count (int): Nombre de confirmations attendues
+            timeout (float): Délai au-delà duquel la réponse partielle est rendue
+
+        Returns:
+            Future: Résolue avec la liste des confirmations reçues
+        """
+        pending = PendingReply(count, timeout)
+        if count <= 0:
+            resolve(pending.future, [])
+            return pending.future
+        with self.lock:
+            self.pending.append(pending)
+        return pending.future
+
+    def run(self):
+        self.running.set()
+        while self.running.is_set():
+            try:
+                data = self.serial.read(self.serial.in_waiting or 1)
+            except Exception:
+                # Port fermé ou débranché : on arrête la lecture
+                break
+            if data:
+                for message in self.splitter.feed(data):
+                    self.dispatch(message)
+            self.expire()
+            if self.periodic:
+                self.periodic()
+        self.running.clear()
+        self.expire(force=True)
+
+    def dispatch(self, message):
+        """
+        Attribue un message à la commande en attente ou à la file
+        """
+        if self.listener and self.listener(message):
+            return
+        with self.lock:
+            if self.pending and self.is_reply(message):
+                pending = self.pending[0]
+                pending.lines.append(message)
+                if len(pending.lines) < pending.expected:
+                    return
+                self.pending.popleft()
+            else:
+                pending = None
+        if pending is None:
+            self.messages.put(message)
+        else:
+            resolve(pending.future, pending.lines)
+
+    def expire(self, force=False):
+        """
+        Résout les commandes dont le délai de réponse est dépassé
+        """
+        now = time.monotonic()
+        expired = []
+        with self.lock:
+            while self.pending and (force or self.pending[0].deadline <= now):
+                expired.append(self.pending.popleft())
+        for pending in expired:
+            resolve(pending.future, pending.lines)
+
+    def stop(self, timeout=1.0):
+        """
+        Demande l'arrêt du thread et attend sa fin
+        """
+        self.running.clear()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Serveur de commande partagé : un seul processus possède le port série
+
+Le serveur ouvre l'Arduino une fois (un seul redémarrage de 2 s) et accepte
+autant de clients que voulu, sur un socket Unix ou TCP local :
+
+    python servo_server.py serve /dev/ttyUSB0 --listen unix:/tmp/servo.sock
+    python servo_server.py send "0:90, 1:45" --connect unix:/tmp/servo.sock --priority 5 --lease 2
+
+Protocole : une requête JSON par ligne, une réponse JSON par ligne.
+
+    {"op": "hello", "name": "vision"}
+    {"op": "set", "targets": {"0": 90}, "priority": 5, "lease": 2.0, "wait": true}
+    {"op": "release", "servos": [0]}        # sans "servos" : toutes ses réservations
+    {"op": "state"}
+
+Arbitrage par servo : une consigne est acceptée si le servo est libre, si
+le client en détient la réservation (lease), ou si sa priorité est
+strictement supérieure à celle du détenteur. Une consigne acceptée avec
+"lease" > 0 réserve le servo pour ce nombre de secondes. Les consignes de
+tous les clients sont fusionnées (la plus récente par servo) et envoyées en
+une trame combinée ; la réponse arrive une fois la trame confirmée par
+l'Arduino, avec les angles confirmés.
+"""
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import os
+import socket
+import sys
+import time
+
+from arduino_servo_controller import ArduinoServoController
+from controller_pool import ControllerPool
+from script_runner import parse_line, reply_futures
+from wire_trace import WireTrace
+
+DEFAULT_ADDRESS = 'unix:/tmp/servo_server.sock'
+MAX_LINE = 64 * 1024
+
+
+def parse_address(address):
+    """
+    Décode une adresse 'unix:/chemin', 'tcp:hôte:port' ou 'hôte:port'
+
+    Returns:
+        tuple: ('unix', chemin) ou ('tcp', (hôte, port))
+    """
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    if address.startswith('tcp:'):
+        address = address[len('tcp:'):]
+    host, _, port = address.rpartition(':')
+    if not port.isdigit():
+        raise ValueError(f"Adresse invalide: {address}")
+    return 'tcp', (host or '127.0.0.1', int(port))
+
+
+class Lease:
+    """
+    Réservation d'un servo par un client
+    """
+
+    def __init__(self, client, priority, expires):
+        self.client = client
+        self.priority = priority
+        self.expires = expires
+
+
+class ServoServer:
+    """
+    Propriétaire unique du contrôleur ; arbitre et fusionne les consignes des clients
+    """
+
+    def __init__(self, controller, min_interval=0.02, reply_timeout=1.0, clock=time.monotonic):
+        """
+        Args:
+            controller: ArduinoServoController ou ControllerPool, avec thread de lecture
+            min_interval (float): Écart minimal entre deux trames (s) ; les consignes
+                                  arrivées entre-temps partent ensemble
+            reply_timeout (float): Attente maximale de la confirmation d'une trame (s)
+            clock (callable): Horloge monotone en secondes
+        """
+        self.controller = controller
+        self.min_interval = min_interval
+        self.reply_timeout = reply_timeout
+        self.clock = clock
+        self.leases = {}      # Servo -> Lease
+        self.pending = {}     # Servo -> angle à envoyer dans la prochaine trame
+        self.waiters = []     # Futures des requêtes incluses dans la prochaine trame
+        self.clients = {}     # Identifiant -> nom
+        self.client_ids = itertools.count(1)
+        self.dirty = None
+        self.writer_task = None
+        self.frames = 0
+
+    # ----- arbitrage -----
+
+    def _owner(self, servo, now):
+        lease = self.leases.get(servo)
+        if lease is not None and lease.expires <= now:
+            del self.leases[servo]
+            lease = None
+        return lease
+
+    def arbitrate(self, client, targets, priority=0, lease=0.0):
+        """
+        Trie les consignes d'un client entre acceptées et refusées
+
+        Args:
+            client (int): Identifiant du client
+            targets (dict): {servo: angle}
+            priority (int): Priorité de la requête (plus grand = plus prioritaire)
+            lease (float): Durée de réservation des servos acceptés (s), 0 pour aucune
+
+        Returns:
+            tuple: ({servo: angle} acceptés, {servo: raison} refusés)
+        """
+        now = self.clock()
+        accepted, rejected = {}, {}
+        for servo, angle in targets.items():
+            if not (0 <= servo < self.controller.num_servos):
+                rejected[servo] = "servo inexistant"
+                continue
+            if not (0 <= angle <= 180):
+                rejected[servo] = "angle hors de 0-180"
+                continue
+            owner = self._owner(servo, now)
+            if owner is not None and owner.client != client and priority <= owner.priority:
+                rejected[servo] = (f"réservé par {self.clients.get(owner.client, owner.client)} "
+                                   f"(priorité {owner.priority}, encore {owner.expires - now:.1f} s)")
+                continue
+            accepted[servo] = angle
+            if lease > 0:
+                self.leases[servo] = Lease(client, priority, now + lease)
+        return accepted, rejected
+
+    def release(self, client, servos=None):
+        """
+        Libère les réservations d'un client (toutes, ou seulement celles des servos donnés)
+        """
+        for servo, lease in list(self.leases.items()):
+            if lease.client == client and (servos is None or servo in servos):
+                del self.leases[servo]
+
+    # ----- envoi des trames -----
+
+    def submit(self, targets):
+        """
+        Ajoute des consignes à la prochaine trame
+
+        Returns:
+            asyncio.Future: Résolue avec les angles confirmés une fois la trame acquittée
+        """
+        self.pending.update(targets)
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.dirty.set()
+        return waiter
+
+    async def _writer(self):
+        """
+        Envoie les consignes fusionnées, une trame en vol à la fois
+
+        Pendant qu'une trame attend sa confirmation, les nouvelles consignes
+        s'accumulent (la plus récente par servo) et partent ensemble ensuite.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.dirty.wait()
+            self.dirty.clear()
+            targets, waiters = self.pending, self.waiters
+            self.pending, self.waiters = {}, []
+            started = self.clock()
+            servos = sorted(targets)
+            try:
+                # Écriture bloquante (verrou, fenêtre, cartes en parallèle) : hors de la boucle
+                success, result = await loop.run_in_executor(None, functools.partial(
+                    self.controller.set_servo_angle, servos, [targets[s] for s in servos], multi_servo=True))
+                if success:
+                    # Angles déjà confirmés : rien n'a été envoyé, leur Future est déjà résolue
+                    futures = [asyncio.wrap_future(future) for future in reply_futures(result)
+                               if not future.done()]
+                    if futures:
+                        # asyncio.wait n'annule pas les réponses en retard (wait_for le ferait,
+                        # et le thread de lecture trouverait alors des Futures déjà annulées)
+                        done, late = await asyncio.wait(futures, timeout=self.reply_timeout)
+                        success = not late and all(future.result() for future in done)
+                    result = "Pas de réponse de l'Arduino" if not success else None
+            except Exception as e:
+                success, result = False, f"Erreur d'envoi: {e}"
+            self.frames += 1
+            outcome = (success, result, list(self.controller.confirmed_angles))
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(outcome)
+            delay = started + self.min_interval - self.clock()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    # ----- clients -----
+
+    async def handle_request(self, client, request):
+        op = request.get('op')
+        if op == 'hello':
+            self.clients[client] = str(request.get('name', client))
+            return {'ok': True, 'client': client, 'num_servos': self.controller.num_servos}
+        if op == 'state':
+            now = self.clock()
+            owners = {}
+            for servo in list(self.leases):
+                lease = self._owner(servo, now)
+                if lease is not None:
+                    owners[str(servo)] = {'client': self.clients.get(lease.client, lease.client),
+                                          'priority': lease.priority,
+                                          'expires_in': round(lease.expires - now, 3)}
+            return {'ok': True, 'commanded': list(self.controller.current_angles),
+                    'confirmed': list(self.controller.confirmed_angles), 'owners': owners}
+        if op == 'release':
+            servos = request.get('servos')
+            self.release(client, None if servos is None else {int(s) for s in servos})
+            return {'ok': True}
+        if op == 'set':
+            targets = {int(servo): int(angle) for servo, angle in request.get('targets', {}).items()}
+            accepted, rejected = self.arbitrate(client, targets, int(request.get('priority', 0)),
+                                                float(request.get('lease', 0)))
+            reply = {'ok': True, 'accepted': {str(s): a for s, a in accepted.items()},
+                     'rejected': {str(s): reason for s, reason in rejected.items()}}
+            if not accepted:
+                reply['ok'] = not rejected
+                return reply
+            waiter = self.submit(accepted)
+            if request.get('wait', True):
+                success, error, confirmed = await waiter
+                reply['ok'] = success
+                reply['confirmed'] = confirmed
+                if error:
+                    reply['error'] = error
+            return reply
+        return {'ok': False, 'error': f"opération inconnue: {op}"}
+
+    async def handle_client(self, reader, writer):
+        client = next(self.client_ids)
+        self.clients[client] = str(client)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("objet JSON attendu")
+                    reply = await self.handle_request(client, request)
+                except (ValueError, TypeError, AttributeError) as e:
+                    request, reply = {}, {'ok': False, 'error': f"requête invalide: {e}"}
+                if 'id' in request:
+                    reply['id'] = request['id']
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            # Un client déconnecté ne garde pas ses réservations
+            self.release(client)
+            self.clients.pop(client, None)
+            writer.close()
+
+    async def serve(self, address, ready=None):
+        """
+        Écoute les clients jusqu'à l'annulation de la tâche
+
+        Args:
+            address (str): Adresse d'écoute (voir parse_address)
+            ready (callable): Appelé une fois le socket ouvert
+        """
+        self.dirty = asyncio.Event()
+        self.writer_task = asyncio.create_task(self._writer())
+        kind, where = parse_address(address)
+        if kind == 'unix':
+            if os.path.exists(where):
+                os.unlink(where)  # Socket laissé par un serveur précédent
+            server = await asyncio.start_unix_server(self.handle_client, where, limit=MAX_LINE)
+        else:
+            server = await asyncio.start_server(self.handle_client, *where, limit=MAX_LINE)
+        try:
+            async with server:
+                if ready:
+                    ready()
+                await server.serve_forever()
+        finally:
+            self.writer_task.cancel()
+            if kind == 'unix' and os.path.exists(where):
+                os.unlink(where)
+
+
+class ServoClient:
+    """
+    Client synchrone du serveur : une connexion durable, une requête à la fois
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, name=None, timeout=5.0):
+        """
+        Args:
+            address (str): Adresse du serveur (voir parse_address)
+            name (str): Nom affiché aux autres clients (réservations)
+            timeout (float): Attente maximale d'une réponse (s)
+        """
+        self.address = address
+        self.name = name or f"client-{os.getpid()}"
+        self.timeout = timeout
+        self.sock = None
+        self.stream = None
+        self.num_servos = 0
+        self.ids = itertools.count(1)
+
+    def connect(self):
+        """
+        Returns:
+            tuple: (bool, str) - Succès et message associé
+        """
+        try:
+            kind, where = parse_address(self.address)
+            family = socket.AF_UNIX if kind == 'unix' else socket.AF_INET
+            self.sock = socket.socket(family, socket.SOCK_STREAM)
+            self.sock.settimeout(self.timeout)
+            self.sock.connect(where)
+            if kind == 'tcp':
+                self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.stream = self.sock.makefile('rwb')
+            reply = self.request('hello', name=self.name)
+        except (OSError, ValueError) as e:
+            self.close()
+            return False, str(e)
+        self.num_servos = reply['num_servos']
+        return True, f"Connecté au serveur {self.address} ({self.num_servos} servos)"
+
+    def close(self):
+        if self.stream:
+            self.stream.close()
+        if self.sock:
+            self.sock.close()
+        self.sock = self.stream = None
+
+    def is_connected(self):
+        return self.sock is not None
+
+    def request(self, op, **fields):
+        """
+        Envoie une requête et attend sa réponse
+
+        Returns:
+            dict: Réponse du serveur
+        """
+        fields.update(op=op, id=next(self.ids))
+        self.stream.write(json.dumps(fields).encode() + b'\n')
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            raise ConnectionError("Connexion fermée par le serveur")
+        return json.loads(line)
+
+    def set_pose(self, targets, priority=0, lease=0.0, wait=True):
+        """
+        Demande des angles au serveur
+
+        Args:
+            targets (dict): {servo: angle}
+            priority (int): Priorité face aux réservations des autres clients
+            lease (float): Réserver les servos acceptés pendant ce nombre de secondes
+            wait (bool): Attendre la confirmation de l'Arduino
+
+        Returns:
+            tuple: (bool, dict) - Succès (toutes les consignes acceptées et confirmées) et réponse
+        """
+        reply = self.request('set', targets={str(s): a for s, a in targets.items()},
+                             priority=priority, lease=lease, wait=wait)
+        return reply['ok'] and not reply['rejected'], reply
+
+    def release(self, servos=None):
+        fields = {} if servos is None else {'servos': list(servos)}
+        return self.request('release', **fields)['ok']
+
+    def state(self):
+        return self.request('state')
+
+    def set_servo_angle(self, servo_num, angle, multi_servo=False, wait=False, timeout=None):
+        """
+        Même appel que ArduinoServoController.set_servo_angle (la réponse est toujours attendue)
+
+        Returns:
+            tuple: (bool, list ou str) - Succès et angles confirmés, ou raison du refus
+        """
+        if not isinstance(servo_num, list):
+            servo_num = [servo_num]
+        if not isinstance(angle, list):
+            angle = [angle]
+        if not multi_servo:
+            servo_num, angle = servo_num[:1], angle[:1]
+        success, reply = self.set_pose(dict(zip(servo_num, angle)))
+        if not success:
+            return False, reply.get('error') or "; ".join(
+                f"servo {s}: {reason}" for s, reason in reply['rejected'].items())
+        return True, reply['confirmed']
+
+
+def serve(args):
+    ports = args.ports
+    options = dict(reader_thread=True, auto_baud=not args.no_auto_baud, reset_on_connect=not args.no_reset,
+                   trace=WireTrace(args.trace) if args.trace else None)
+    if len(ports) == 1:
+        controller = ArduinoServoController(port=ports[0], **options)
+    else:
+        controller = ControllerPool(ports, **options)
+    print(f"Connexion à l'Arduino sur {', '.join(ports)}...")
+    success, messages = controller.connect()
+    if not success:
+        print(f"Erreur de connexion: {messages}")
+        return 1
+    for message in messages:
+        print(f"Arduino: {message}")
+    server = ServoServer(controller, min_interval=1.0 / args.rate)
+    try:
+        asyncio.run(server.serve(args.listen, ready=lambda: print(f"En écoute sur {args.listen}")))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        controller.disconnect()
+        print(f"Arrêt ({server.frames} trames envoyées)")
+    return 0
+
+
+def send(args):
+    client = ServoClient(args.connect, name=args.name)
+    success, message = client.connect()
+    if not success:
+        print(f"Erreur de connexion: {message}")
+        return 1
+    try:
+        if args.command is None:
+            print(json.dumps(client.state(), indent=2, ensure_ascii=False))
+            return 0
+        errors = []
+        targets = parse_line(args.command, client.num_servos, 1, errors)
+        if errors or not targets:
+            print("Commande invalide: " + "; ".join(message for _, message in errors))
+            return 1
+        success, reply = client.set_pose(targets, args.priority, args.lease)
+        print(json.dumps(reply, ensure_ascii=False))
+        # La réservation prend fin avec la connexion : on la garde le temps demandé
+        if success and args.lease and args.hold:
+            time.sleep(args.lease)
+        return 0 if success else 1
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur de commande des servos partagé entre plusieurs clients")
+    commands = parser.add_subparsers(dest='mode', required=True)
+
+    serve_parser = commands.add_parser('serve', help="Ouvrir l'Arduino et accepter les clients")
+    serve_parser.add_argument('ports', nargs='*', default=['auto'],
+                              help="Port(s) série des cartes ('auto' : recherche de la carte)")
+    serve_parser.add_argument('--listen', default=DEFAULT_ADDRESS,
+                              help=f"unix:/chemin ou [tcp:]hôte:port (défaut {DEFAULT_ADDRESS})")
+    serve_parser.add_argument('--rate', type=float, default=50, help="Trames par seconde au plus")
+    serve_parser.add_argument('--no-auto-baud', action='store_true', help="Rester à 9600 bauds")
+    serve_parser.add_argument('--no-reset', action='store_true',
+                              help="Ne pas redémarrer une carte déjà démarrée (connexion immédiate)")
+    serve_parser.add_argument('--trace', metavar='FICHIER', help="Tracer les octets échangés (voir wire_trace.py)")
+
+    send_parser = commands.add_parser('send', help="Envoyer une pose (ou afficher l'état) via le serveur")
+    send_parser.add_argument('command', nargs='?', help="Pose 'servo:angle, ...' ou 'a(servo, angle, ...)'")
+    send_parser.add_argument('--connect', default=DEFAULT_ADDRESS, help="Adresse du serveur")
+    send_parser.add_argument('--name', help="Nom du client")
+    send_parser.add_argument('--priority', type=int, default=0, help="Priorité de la requête")
+    send_parser.add_argument('--lease', type=float, default=0.0, help="Réserver les servos (s)")
+    send_parser.add_argument('--hold', action='store_true', help="Rester connecté pendant la réservation")
+
+    args = parser.parse_args()
+    return serve(args) if args.mode == 'serve' else send(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+import threading
+import time
+
+from serial_reader import CONFIRMATION_PATTERN
+
+
+def parse_confirmation(message):
+    """
+    Extrait (servo, angle) d'une confirmation "Servo N positionné à X degrés"
+
+    Returns:
+        tuple or None: (servo, angle), ou None si le message n'est pas une confirmation
+    """
+    match = CONFIRMATION_PATTERN.match(message) if isinstance(message, str) else None
+    if match is None:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+class ServoStateMirror:
+    """
+    Miroir de l'état des servos : angles commandés et angles confirmés par l'Arduino
+
+    Un angle n'est considéré comme appliqué qu'une fois confirmé, soit par une
+    ligne "Servo N positionné à X degrés" (arduino.ino), soit par l'accusé
+    binaire portant le numéro de séquence de la trame (binary_arduino.ino).
+    """
+
+    def __init__(self, num_servos=4, initial_angle=90, clock=time.monotonic):
+        self.num_servos = num_servos
+        self.clock = clock
+        self.commanded = [initial_angle] * num_servos
+        self.commanded_at = [None] * num_servos
+        self.acked = [None] * num_servos
+        self.acked_at = [None] * num_servos
+        # Instant de la consigne dont provient l'angle confirmé : un accusé tardif
+        # d'une trame plus ancienne ne doit pas écraser une confirmation plus récente
+        self.acked_command_at = [None] * num_servos
+        self.pending_frames = {}  # Numéro de séquence -> (instant, {servo: angle})
+        self.lock = threading.Lock()
+
+    def reset(self, initial_angle=90):
+        """
+        Oublie tout l'état (après une reconnexion, l'Arduino repart au centre)
+        """
+        with self.lock:
+            self.commanded = [initial_angle] * self.num_servos
+            self.commanded_at = [None] * self.num_servos
+            self.acked = [None] * self.num_servos
+            self.acked_at = [None] * self.num_servos
+            self.acked_command_at = [None] * self.num_servos
+            self.pending_frames.clear()
+
+    def command(self, servos, angles, seq=None):
+        """
+        Note des angles envoyés à l'Arduino
+
+        Args:
+            servos (list): Numéros des servos
+            angles (list): Angles commandés
+            seq (int): Numéro de séquence de la trame, si l'accusé le renvoie
+
+        Returns:
+            dict: {servo: (angle, instant)} commandés avant cet envoi (voir withdraw)
+        """
+        now = self.clock()
+        with self.lock:
+            previous = {servo: (self.commanded[servo], self.commanded_at[servo]) for servo in servos}
+            for servo, angle in zip(servos, angles):
+                self.commanded[servo] = angle
+                self.commanded_at[servo] = now
+            if seq is not None:
+                self.pending_frames[seq] = (now, dict(zip(servos, angles)))
+        return previous
+
+    def withdraw(self, previous, seq=None):
+        """
+        Annule une consigne notée mais jamais envoyée (ex. fenêtre de commandes pleine)
+
+        Args:
+            previous (dict): Valeur renvoyée par command
+            seq (int): Numéro de séquence de la trame abandonnée
+        """
+        with self.lock:
+            for servo, (angle, commanded_at) in previous.items():
+                self.commanded[servo] = angle
+                self.commanded_at[servo] = commanded_at
+            if seq is not None:
+                self.pending_frames.pop(seq, None)
+
+    def acknowledge(self, servo, angle):
+        """
+        Note un angle confirmé par l'Arduino
+        """
+        if not (0 <= servo < self.num_servos):
+            return
+        now = self.clock()
+        with self.lock:
+            self.acked[servo] = angle
+            self.acked_at[servo] = now
+            self.acked_command_at[servo] = self.commanded_at[servo]
+
+    def acknowledge_frame(self, seq, accepted=True):
+        """
+        Applique l'accusé d'une trame numérotée (refusée : les angles ne sont pas confirmés)
+
+        Returns:
+            dict: Angles de la trame, vide si le numéro est inconnu
+        """
+        now = self.clock()
+        with self.lock:
+            commanded_at, targets = self.pending_frames.pop(seq, (None, {}))
+            if accepted:
+                for servo, angle in targets.items():
+                    previous = self.acked_command_at[servo]
+                    if previous is not None and previous > commanded_at:
+                        continue
+                    self.acked[servo] = angle
+                    self.acked_at[servo] = now
+                    self.acked_command_at[servo] = commanded_at
+        return targets
+
+    def observe(self, message):
+        """
+        Met à jour le miroir à partir d'une confirmation texte ; à brancher sur le lecteur
+        
+        Returns:
+            bool: True si le message était une confirmation
+        """
+        confirmation = parse_confirmation(message)
+        if confirmation is None:
+            return False
+        self.acknowledge(*confirmation)
+        return True
+
+    def is_applied(self, servo, angle):
+        """
+        Indique si l'angle est déjà confirmé et qu'aucune autre consigne n'est en cours
+        """
+        return self.acked[servo] == angle and self.commanded[servo] == angle
+
+    def divergence(self):
+        """
+        Renvoie les servos dont la dernière consigne n'est pas encore confirmée
+
+        Returns:
+            dict: {servo: (angle commandé, angle confirmé ou None)}
+        """
+        with self.lock:
+            return {servo: (self.commanded[servo], self.acked[servo])
+                    for servo in range(self.num_servos)
+                    if self.commanded_at[servo] is not None and self.commanded[servo] != self.acked[servo]}
+
+    def in_flight(self):
+        """
+        Nombre de servos dont la consigne est en attente de confirmation
+        """
+        return sum(1 for servo in range(self.num_servos)
+                   if self.commanded_at[servo] is not None and self.commanded[servo] != self.acked[servo])
+
+    def snapshot(self):
+        """
+        Returns:
+            list: Pour chaque servo, dict des angles et instants commandés/confirmés
+        """
+        with self.lock:
+            return [{'commanded': self.commanded[s], 'commanded_at': self.commanded_at[s],
+                     'acked': self.acked[s], 'acked_at': self.acked_at[s]}
+                    for s in range(self.num_servos)]
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Affichage plein écran du mode interactif, sans sous-processus
+
+RawTerminal garde le terminal en mode brut pour toute une session (au lieu
+de le basculer à chaque touche). StatusScreen place des champs de texte à
+des positions fixes et ne réécrit, par adressage du curseur ANSI, que ceux
+dont le contenu a changé ; chaque rafraîchissement est un seul write().
+"""
+import os
+
+try:
+    import termios
+    import tty
+except ImportError:
+    # Windows : pas de mode brut, le mode interactif lit des lignes
+    termios = None
+
+CLEAR = "\033[2J\033[H"
+HIDE_CURSOR = "\033[?25l"
+SHOW_CURSOR = "\033[?25h"
+CLEAR_LINE_END = "\033[K"
+
+
+def clear_screen(fd=1):
+    """
+    Efface l'écran et replace le curseur en haut à gauche (séquence ANSI)
+    """
+    os.write(fd, CLEAR.encode())
+
+
+class RawTerminal:
+    """
+    Terminal en mode brut pendant un bloc with, restauré à la sortie
+
+    Les touches arrivent une par une, sans écho ni attente de la touche
+    Entrée ; Ctrl+C arrive comme le caractère '\\x03'. Le traitement des sorties
+    (OPOST) est conservé pour que '\\n' revienne en début de ligne.
+    """
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.saved = None
+
+    def __enter__(self):
+        if termios is None:
+            raise OSError("Mode brut indisponible (module termios absent)")
+        self.saved = termios.tcgetattr(self.fd)
+        tty.setraw(self.fd, termios.TCSANOW)
+        attributes = termios.tcgetattr(self.fd)
+        attributes[1] |= termios.OPOST
+        termios.tcsetattr(self.fd, termios.TCSANOW, attributes)
+        return self
+
+    def __exit__(self, *exc):
+        termios.tcsetattr(self.fd, termios.TCSADRAIN, self.saved)
+
+
+class StatusScreen:
+    """
+    Écran fait de lignes fixes et de champs mis à jour par différence
+    """
+
+    def __init__(self, fd=1):
+        """
+        Args:
+            fd (int): Descripteur de sortie (1 = sortie standard)
+        """
+        self.fd = fd
+        self.fields = {}    # Nom -> (ligne, colonne), à partir de 1
+        self.rendered = {}  # Nom -> texte actuellement affiché
+        self.pending = []
+
+    def add_field(self, name, row, column=1):
+        self.fields[name] = (row, column)
+
+    def draw(self, lines):
+        """
+        Efface l'écran et affiche les lignes fixes ; les champs seront tous redessinés
+        """
+        self.rendered.clear()
+        self.pending = [HIDE_CURSOR, CLEAR, "\r\n".join(lines)]
+
+    def set(self, name, text):
+        """
+        Met à jour un champ ; rien n'est émis si son texte n'a pas changé
+        """
+        if self.rendered.get(name) == text:
+            return
+        row, column = self.fields[name]
+        self.pending.append(f"\033[{row};{column}H{text}{CLEAR_LINE_END}")
+        self.rendered[name] = text
+
+    def flush(self):
+        """
+        Émet toutes les modifications en une seule écriture
+        """
+        if self.pending:
+            os.write(self.fd, "".join(self.pending).encode())
+            self.pending = []
+
+    def close(self, row=None):
+        """
+        Réaffiche le curseur, sous les champs ou à la ligne donnée
+        """
+        row = row or max((r for r, _ in self.fields.values()), default=0) + 1
+        self.pending.append(f"\033[{row};1H{SHOW_CURSOR}")
+        self.flush()
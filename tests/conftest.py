@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# Modules du projet à la racine du dépôt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from virtual_arduino import VirtualArduino  # noqa: E402
+
+
+@pytest.fixture
+def virtual_board():
+    """
+    Démarre des cartes émulées (virtual_arduino.py) et les arrête en fin de test
+
+    Usage : board, port = virtual_board('servo', drop_rate=1.0)
+    """
+    boards = []
+
+    def start(firmware='servo', **options):
+        options.setdefault('boot_delay', 0.05)
+        board = VirtualArduino(firmware, **options)
+        boards.append(board)
+        return board, board.start()
+
+    yield start
+    for board in boards:
+        board.stop()
@@ -0,0 +1,33 @@
+from arduino_servo_controller import ArduinoServoController
+
+
+def test_full_window_leaves_state_untouched(virtual_board):
+    # Aucun accusé ne revient : la première commande occupe l'unique place de la fenêtre
+    board, port = virtual_board('servo', drop_rate=1.0)
+    controller = ArduinoServoController(port, window_size=1, retransmit_timeout=5.0, port_cache=None)
+    success, messages = controller.connect()
+    assert success, messages
+    try:
+        assert controller.set_servo_angle(0, 45)[0]
+        assert controller.set_servo_angle(1, 30, timeout=0.05) == (False, "Fenêtre de commandes pleine")
+        assert controller.current_angles[1] == 90
+        assert len(controller.state.pending_frames) == 1
+    finally:
+        controller.disconnect()
+
+
+def test_sequence_wrap_skips_numbers_in_flight(virtual_board):
+    board, port = virtual_board('servo', drop_rate=1.0)
+    controller = ArduinoServoController(port, window_size=2, retransmit_timeout=5.0, port_cache=None)
+    success, messages = controller.connect()
+    assert success, messages
+    try:
+        first_seq = controller.sequence
+        assert controller.set_servo_angle(0, 45)[0]
+        # 255 commandes plus tard, le compteur revient sur le numéro encore en vol
+        controller.sequence = first_seq
+        assert controller.set_servo_angle(1, 30)[0]
+        assert sorted(controller.window.in_flight) == [first_seq, (first_seq + 1) & 0xFF]
+        assert controller.current_angles[:2] == [45, 30]
+    finally:
+        controller.disconnect()
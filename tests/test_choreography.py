@@ -0,0 +1,25 @@
+import pytest
+
+from arduino_servo_controller import ArduinoServoController
+from choreography import compiled_path, play_choreography
+
+SOURCE = "rate 50\nat 0.0  90 90 90 90\nat 0.2  45 _ _ _\n"
+
+
+@pytest.mark.parametrize('size', [0, 5, 20])
+def test_truncated_cache_reported(virtual_board, tmp_path, size):
+    path = tmp_path / "court.choreo"
+    path.write_text(SOURCE)
+    compiled = compiled_path(str(path))
+    with open(compiled, 'r+b') as f:
+        f.truncate(size)
+    board, port = virtual_board('servo')
+    controller = ArduinoServoController(port, port_cache=None)
+    success, messages = controller.connect()
+    assert success, messages
+    try:
+        success, message = play_choreography(controller, str(path))
+        assert not success
+        assert isinstance(message, str)
+    finally:
+        controller.disconnect()
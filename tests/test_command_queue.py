@@ -0,0 +1,81 @@
+import time
+
+from arduino_servo_controller import ArduinoServoController
+from command_queue import CommandQueue, JobCancelled
+from playback import DeadlinePlayer, controller_sender
+
+
+def wait_confirmed(controller, angles, timeout):
+    deadline = time.monotonic() + timeout
+    while controller.confirmed_angles != angles and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return controller.confirmed_angles
+
+
+def test_urgent_confirmed_under_load(virtual_board):
+    # À 9600 bauds, une trame de 4 servos renvoie environ 130 octets de confirmations
+    # (0,14 s) : une séquence à 50 Hz sature la liaison dans le sens carte -> hôte
+    board, port = virtual_board('servo', slew_rate=0)
+    controller = ArduinoServoController(port, reader_thread=True, port_cache=None)
+    success, messages = controller.connect()
+    assert success, messages
+    commands = CommandQueue(controller).start()
+    try:
+        frames = [(i * 0.02, {s: 30 + (i * 7 + s * 20) % 120 for s in range(4)}) for i in range(200)]
+        job = commands.start_job("charge", lambda job: DeadlinePlayer(
+            controller_sender(job.controller), clock=job.clock, sleep=job.sleep).play(frames))
+        time.sleep(1.0)
+        start = time.monotonic()
+        assert commands.urgent([0, 1, 2, 3], [90, 90, 90, 90])[0]
+        assert wait_confirmed(controller, [90, 90, 90, 90], 2.0) == [90, 90, 90, 90]
+        # Une trame normale au plus devant la commande urgente, plus ses propres confirmations
+        assert time.monotonic() - start < 0.5
+        assert board.targets() == [90, 90, 90, 90]
+        try:
+            job.wait(1)
+        except JobCancelled:
+            pass
+        assert job.state == "annulée"
+    finally:
+        commands.stop()
+        controller.disconnect()
+
+
+def test_halt_discards_scheduler_targets(virtual_board):
+    board, port = virtual_board('servo', slew_rate=0)
+    controller = ArduinoServoController(port, reader_thread=True, port_cache=None)
+    success, messages = controller.connect()
+    assert success, messages
+    commands = CommandQueue(controller).start()
+    controller.start_scheduler(rate_hz=50, commands=commands)
+    try:
+        for angle in range(20, 160, 5):
+            controller.queue_servo_angle([0, 1, 2, 3], [angle] * 4)
+            time.sleep(0.01)
+        commands.halt()
+        stopped = controller.current_angles
+        time.sleep(0.5)
+        # Plus rien ne part après l'arrêt : la dernière consigne écrite reste la dernière
+        assert controller.current_angles == stopped
+        assert wait_confirmed(controller, stopped, 1.0) == stopped
+        assert stopped != [155] * 4
+    finally:
+        controller.stop_scheduler()
+        commands.stop()
+        controller.disconnect()
+
+
+def test_worker_survives_raising_command():
+    # Port débranché : la commande lève une exception, la suivante doit quand même partir
+    controller = ArduinoServoController('/dev/null', port_cache=None)
+    commands = CommandQueue(controller).start()
+    try:
+        def unplugged():
+            raise OSError("port débranché")
+        failed = commands.submit(unplugged)
+        sent = commands.submit(lambda: (True, "envoyée"))
+        assert isinstance(failed.exception(1), OSError)
+        assert sent.result(1) == (True, "envoyée")
+        assert commands.worker.is_alive()
+    finally:
+        commands.stop()
@@ -0,0 +1,27 @@
+from command_window import CommandWindow
+from controller_pool import ControllerPool
+from metrics import Metrics
+
+
+def test_pool_gauges_kept_per_board(virtual_board):
+    ports = [virtual_board('servo')[1] for _ in range(2)]
+    metrics = Metrics()
+    pool = ControllerPool(ports, metrics=metrics, port_cache=None)
+    # Jauges déclarées à la connexion, avec le port réellement ouvert
+    assert metrics.snapshot()['gauges'] == {}
+    success, messages = pool.connect()
+    assert success, messages
+    try:
+        pool.controllers[1].negotiated_baud = 500000
+        gauges = metrics.snapshot()['gauges']
+        assert gauges[f'link_baud{{board="{ports[0]}"}}'] == 9600
+        assert gauges[f'link_baud{{board="{ports[1]}"}}'] == 500000
+        for controller, retransmissions in zip(pool.controllers, (2, 3)):
+            controller.window = CommandWindow(write=None, encode=None)
+            controller.window.retransmissions = retransmissions
+        assert metrics.snapshot()['counters']['retransmissions'] == 5
+        exported = metrics.to_prometheus()
+        assert exported.count("# TYPE servo_link_baud gauge") == 1
+        assert f'servo_link_baud{{board="{ports[1]}"}} 500000' in exported
+    finally:
+        pool.disconnect()
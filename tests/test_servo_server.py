@@ -0,0 +1,63 @@
+import asyncio
+
+from arduino_servo_controller import ArduinoServoController
+from servo_server import ServoServer
+
+
+def run_writer(server, *batches, pause=0.0):
+    """
+    Soumet chaque lot de consignes au thread d'écriture du serveur et renvoie les résultats
+    """
+    async def scenario():
+        server.dirty = asyncio.Event()
+        task = asyncio.create_task(server._writer())
+        outcomes = []
+        try:
+            for targets in batches:
+                outcomes.append(await asyncio.wait_for(server.submit(targets), 5))
+                await asyncio.sleep(pause)
+        finally:
+            task.cancel()
+        return outcomes
+    return asyncio.run(scenario())
+
+
+def connect(port, **options):
+    controller = ArduinoServoController(port, reader_thread=True, port_cache=None, **options)
+    success, messages = controller.connect()
+    assert success, messages
+    return controller
+
+
+def test_reader_survives_server_timeout(virtual_board):
+    # Aucune commande n'arrive à la carte : le serveur abandonne avant le contrôleur
+    board, port = virtual_board('servo', drop_rate=1.0)
+    controller = connect(port, reply_timeout=0.3)
+    try:
+        server = ServoServer(controller, reply_timeout=0.1)
+        # Le délai du contrôleur expire pendant la pause, après celui du serveur
+        first, second = run_writer(server, {0: 45}, {1: 30}, pause=0.5)
+        assert first[:2] == (False, "Pas de réponse de l'Arduino")
+        assert second[0] is False
+        assert controller.reader.is_alive()
+    finally:
+        controller.disconnect()
+
+
+def test_writer_reports_send_errors(virtual_board):
+    board, port = virtual_board('servo')
+    controller = connect(port)
+    try:
+        server = ServoServer(controller)
+
+        def broken(*args, **kwargs):
+            raise OSError("port débranché")
+        controller.set_servo_angle = broken
+        outcome, = run_writer(server, {0: 45})
+        assert outcome[:2] == (False, "Erreur d'envoi: port débranché")
+        del controller.set_servo_angle
+        outcome, = run_writer(server, {0: 60})
+        assert outcome[0] is True
+        assert outcome[2][0] == 60
+    finally:
+        controller.disconnect()
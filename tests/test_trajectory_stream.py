@@ -0,0 +1,45 @@
+from arduino_servo_controller import ArduinoServoController
+from safety import SafetyEnvelope
+from trajectory_stream import TrajectoryStreamer
+
+
+def test_stream_with_hold(virtual_board):
+    # 98 consignes à 50 Hz, maintien de 3 s, puis 100 consignes : le tampon
+    # (64 cases) est plein pendant le maintien, avec des cases jouées pas encore signalées
+    board, port = virtual_board('buffered', slew_rate=0)
+    controller = ArduinoServoController(port, reader_thread=True, port_cache=None)
+    success, messages = controller.connect()
+    assert success, messages
+    streamer = TrajectoryStreamer(controller)
+    try:
+        assert streamer.open()[0]
+        frames = [(i * 0.02, {0: 45 + i % 90}) for i in range(98)]
+        frames += [(98 * 0.02 + 3.0 + i * 0.02, {1: 45 + i % 90}) for i in range(100)]
+        assert streamer.stream(frames) == (True, "198 consignes envoyées")
+        success, message = streamer.flush()
+        assert success, message
+        assert board.targets()[:2] == [45 + 97 % 90, 45 + 99 % 90]
+    finally:
+        streamer.close()
+        controller.disconnect()
+
+
+def test_stream_checks_safety_envelope(virtual_board):
+    board, port = virtual_board('buffered', slew_rate=0)
+    safety = SafetyEnvelope()
+    safety.set_limits(0, 0, 100)
+    controller = ArduinoServoController(port, reader_thread=True, safety=safety, port_cache=None)
+    success, messages = controller.connect()
+    assert success, messages
+    streamer = TrajectoryStreamer(controller)
+    try:
+        assert streamer.open()[0]
+        received = board.rx_bytes
+        success, message = streamer.stream([(0.0, {0: 80}), (0.02, {0: 120})])
+        assert not success
+        assert message.startswith("Trame à 0.020 s")
+        # Rien n'est parti : la trajectoire est refusée avant le premier envoi
+        assert board.rx_bytes == received
+    finally:
+        streamer.close()
+        controller.disconnect()
@@ -0,0 +1,23 @@
+import time
+
+from arduino_servo_controller import ArduinoServoController
+
+
+def test_full_tx_buffer_stalls_the_sketch(virtual_board):
+    # 30 commandes de 5 octets (0,16 s à 9600 bauds), 30 confirmations d'environ
+    # 33 octets (1 s) : le croquis avance au rythme de son émission, pas de sa réception
+    board, port = virtual_board('servo', slew_rate=0)
+    controller = ArduinoServoController(port, reader_thread=True, port_cache=None)
+    success, messages = controller.connect()
+    assert success, messages
+    try:
+        writes = board.servo_writes
+        controller.serial.write(b"".join(f"0,{angle};\n".encode() for angle in range(30, 60)))
+        time.sleep(0.4)
+        assert board.servo_writes - writes < 20
+        deadline = time.monotonic() + 3
+        while board.servo_writes - writes < 30 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert board.targets()[0] == 59
+    finally:
+        controller.disconnect()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Génération vectorisée de trajectoires multi-servos
+
+Les positions clés (keyframes) de tous les servos sont interpolées en une
+seule passe NumPy, ce qui donne un tableau N×4 de consignes échantillonnées
+à fréquence fixe. Le tableau est ensuite envoyé au contrôleur sous forme de
+trames multi_servo combinées.
+"""
+import time
+
+import numpy as np
+
+from playback import DeadlinePlayer, controller_sender
+
+NUM_SERVOS = 4
+
+# Profils d'interpolation : fonction de forme s -> f(s) sur [0, 1], avec le
+# rapport vitesse de pointe / vitesse moyenne et le coefficient d'accélération
+# de pointe (a_max = coef * amplitude / durée²)
+PROFILES = {
+    'linear': (lambda s: s, 1.0, 0.0),
+    'cubic': (lambda s: s * s * (3.0 - 2.0 * s), 1.5, 6.0),
+    'minimum_jerk': (lambda s: s ** 3 * (10.0 + s * (-15.0 + 6.0 * s)), 1.875, 5.7735),
+}
+
+
+def _as_limits(value, name):
+    """
+    Convertit une limite (scalaire, liste ou None) en tableau de 4 valeurs
+    """
+    if value is None:
+        return np.full(NUM_SERVOS, np.inf)
+    limits = np.broadcast_to(np.asarray(value, dtype=float), (NUM_SERVOS,)).copy()
+    if np.any(limits <= 0):
+        raise ValueError(f"{name} doit être strictement positive")
+    return limits
+
+
+def segment_durations(poses, durations, profile='minimum_jerk', max_velocity=None, max_acceleration=None):
+    """
+    Allonge les segments trop rapides pour respecter les limites de chaque servo
+
+    Args:
+        poses (ndarray): Positions clés, tableau K×4
+        durations (ndarray): Durées demandées des K-1 segments (s)
+        profile (str): Profil d'interpolation
+        max_velocity: Vitesse maximale en °/s (scalaire ou une valeur par servo)
+        max_acceleration: Accélération maximale en °/s² (scalaire ou par servo)
+
+    Returns:
+        ndarray: Durées retenues des segments (s)
+    """
+    _, velocity_factor, acceleration_factor = PROFILES[profile]
+    amplitudes = np.abs(np.diff(poses, axis=0))
+    v_max = _as_limits(max_velocity, "La vitesse maximale")
+    a_max = _as_limits(max_acceleration, "L'accélération maximale")
+
+    # Durée minimale par segment et par servo, puis le servo le plus contraignant
+    t_velocity = amplitudes * velocity_factor / v_max
+    t_acceleration = np.sqrt(amplitudes * acceleration_factor / a_max)
+    minimum = np.maximum(t_velocity, t_acceleration).max(axis=1)
+    return np.maximum(durations, minimum)
+
+
+def plan_trajectory(keyframes, rate_hz=50, profile='minimum_jerk', max_velocity=None, max_acceleration=None):
+    """
+    Calcule toutes les consignes d'un mouvement à partir de positions clés
+
+    Args:
+        keyframes (list): Liste de (temps_s, [angle0, angle1, angle2, angle3]),
+                          temps croissants, le premier étant la position de départ
+        rate_hz (float): Fréquence d'échantillonnage des consignes (Hz)
+        profile (str): 'linear', 'cubic' ou 'minimum_jerk'
+        max_velocity: Vitesse maximale en °/s (scalaire ou une valeur par servo)
+        max_acceleration: Accélération maximale en °/s² (scalaire ou par servo)
+
+    Returns:
+        tuple: (temps, consignes) - tableau N des instants (s) et tableau N×4 des angles
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Profil inconnu: {profile}")
+    if len(keyframes) < 1:
+        raise ValueError("Au moins une position clé est nécessaire")
+
+    times = np.array([t for t, _ in keyframes], dtype=float)
+    poses = np.array([pose for _, pose in keyframes], dtype=float)
+    if poses.shape[1:] != (NUM_SERVOS,):
+        raise ValueError(f"Chaque position clé doit contenir {NUM_SERVOS} angles")
+    if np.any(np.diff(times) <= 0):
+        raise ValueError("Les temps des positions clés doivent être croissants")
+    if np.any((poses < 0) | (poses > 180)):
+        raise ValueError("Les angles doivent être entre 0 et 180 degrés")
+    if len(keyframes) == 1:
+        return np.zeros(1), poses.copy()
+
+    durations = segment_durations(poses, np.diff(times), profile, max_velocity, max_acceleration)
+    starts = np.concatenate(([0.0], np.cumsum(durations)))
+
+    # Instants d'échantillonnage, fin du mouvement incluse
+    total = starts[-1]
+    samples = np.arange(0.0, total, 1.0 / rate_hz)
+    samples = np.append(samples, total)
+
+    # Segment et avancement normalisé de chaque instant, en une seule passe
+    segment = np.clip(np.searchsorted(starts, samples, side='right') - 1, 0, len(durations) - 1)
+    progress = np.clip((samples - starts[segment]) / durations[segment], 0.0, 1.0)
+    shape = PROFILES[profile][0](progress)[:, None]
+    setpoints = poses[segment] + (poses[segment + 1] - poses[segment]) * shape
+    return samples, setpoints
+
+
+def trajectory_frames(setpoints, rate_hz=50, initial=None):
+    """
+    Convertit un tableau de consignes en trames (t, {servo: angle}) pour DeadlinePlayer
+
+    Seuls les servos dont l'angle arrondi change sont inclus dans chaque trame,
+    et les échantillons sans changement ne produisent aucune trame.
+
+    Args:
+        setpoints (ndarray): Tableau N×4 des angles
+        rate_hz (float): Fréquence d'échantillonnage (Hz)
+        initial (list): Angles actuels des servos (tous inclus dans la première trame si None)
+
+    Returns:
+        list: Trames (t_secondes, {servo: angle})
+    """
+    angles = np.rint(setpoints).astype(int)
+    # Masque des servos modifiés, calculé pour tout le tableau d'un coup
+    first = np.full(NUM_SERVOS, -1) if initial is None else np.asarray(initial)
+    changed = angles != np.vstack((first[None, :], angles[:-1]))
+    rows, servos = np.nonzero(changed)
+    values = angles[rows, servos]
+
+    # np.nonzero parcourt les lignes dans l'ordre : un découpage suffit à grouper par échantillon
+    unique_rows, starts = np.unique(rows, return_index=True)
+    frames = []
+    for row, columns, row_values in zip(unique_rows.tolist(), np.split(servos, starts[1:]),
+                                        np.split(values, starts[1:])):
+        frames.append((row / rate_hz, dict(zip(columns.tolist(), row_values.tolist()))))
+    # Trame vide finale : la lecture dure jusqu'au dernier échantillon
+    frames.append(((len(angles) - 1) / rate_hz, {}))
+    return frames
+
+
+def play_trajectory(controller, setpoints, rate_hz=50, clock=time.monotonic, sleep=time.sleep):
+    """
+    Envoie un tableau de consignes au contrôleur, une trame combinée par échantillon,
+    à des échéances absolues (voir playback.DeadlinePlayer)
+
+    Args:
+        controller (ArduinoServoController): Contrôleur connecté
+        setpoints (ndarray): Tableau N×4 des angles
+        rate_hz (float): Fréquence de lecture (Hz)
+        clock, sleep (callable): Horloge et attente de la lecture (celles d'un Job de
+                                 command_queue.py pour une lecture annulable)
+
+    Returns:
+        tuple: (bool, PlaybackStats ou str) - Succès et statistiques de la lecture
+    """
+    if not controller.is_connected():
+        return False, "Non connecté à l'Arduino"
+    # Toute la trajectoire est vérifiée avant le premier envoi (voir safety.py)
+    safety = getattr(controller, 'safety', None)
+    if safety:
+        safe, reason = safety.check_trajectory(setpoints)
+        if not safe:
+            return False, reason
+
+    frames = trajectory_frames(setpoints, rate_hz, controller.current_angles)
+    stats = DeadlinePlayer(controller_sender(controller), clock=clock, sleep=sleep).play(frames)
+    return stats.failures == 0, stats
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Envoi anticipé de trajectoires vers le tampon de buffered_arduino.ino
+
+La carte garde un tampon circulaire de consignes horodatées, jouées par une
+interruption du Timer2 : la régularité du mouvement est fixée par le
+microcontrôleur, plus par l'ordonnancement du processus Python.
+
+L'hôte envoie les consignes en avance ("T <ms> servo,angle,..."), dans la
+limite des cases libres du tampon. La carte signale chaque case libérée
+(consigne jouée ou abandonnée) par un compteur cumulé sur 16 bits,
+"C <libérées>" : ce sont les crédits qui autorisent les envois suivants.
+
+    streamer = TrajectoryStreamer(controller)   # contrôleur avec thread de lecture
+    streamer.open()
+    streamer.stream(frames)                     # [(t_s, {servo: angle})]
+    streamer.flush()                            # attend la fin de la lecture
+    streamer.close()
+"""
+import re
+import threading
+import time
+from collections import deque
+
+from trajectory import trajectory_frames
+
+# Les compteurs de la carte (consignes libérées) sont des entiers sur 16 bits
+COUNTER_MODULO = 1 << 16
+
+# Cases libérées avant que la carte ne renvoie un crédit (CREDIT_BATCH de buffered_arduino.ino)
+CREDIT_BATCH = 4
+
+# Réponses du tampon : crédits, états et refus
+REPLY_PATTERN = re.compile(r"(?P<kind>C|ABORTED|BUF|GO|FULL|ERR T)(?P<values>(?: \d+)*)$")
+
+
+class TrajectoryStreamer:
+    """
+    Consignes horodatées envoyées en avance, au rythme des crédits de la carte
+    """
+
+    def __init__(self, controller, reply_timeout=1.0):
+        """
+        Args:
+            controller (ArduinoServoController): Contrôleur connecté avec thread de lecture
+            reply_timeout (float): Délai d'attente des réponses de la carte (s)
+        """
+        self.controller = controller
+        self.reply_timeout = reply_timeout
+        self.capacity = 0
+        self.sent = 0  # Consignes envoyées (compteur cumulé, modulo 2**16 comme la carte)
+        self.released = 0  # Cases libérées selon la carte
+        self.late_at_open = 0
+        self.dues = deque()  # Échéances (s après GO) des consignes encore dans le tampon
+        self.streamed = 0  # Consignes envoyées depuis le dernier flush
+        self.go_at = None  # Instant du démarrage de la lecture
+        self.final = {}  # Dernier angle envoyé par servo
+        self.error = None
+        self.aborted = False
+        self.replies = {}  # Dernières valeurs reçues par type de réponse
+        self.condition = threading.Condition()
+
+    def open(self):
+        """
+        Branche le flux sur le contrôleur et lit la capacité du tampon (vidé s'il ne l'est pas)
+
+        Returns:
+            tuple: (bool, str) - Succès et message associé
+        """
+        if not self.controller.is_connected():
+            return False, "Non connecté à l'Arduino"
+        if self.controller.reader is None:
+            return False, "Le tampon de trajectoire demande le thread de lecture (reader_thread=True)"
+        self.controller.add_listener(self._on_message)
+        status = self._request(b"BUF?\n", 'BUF')
+        if status is None or len(status) != 4:
+            self.close()
+            return False, "Pas de tampon de trajectoire sur la carte (buffered_arduino.ino ?)"
+        self.capacity, count, released, self.late_at_open = status
+        with self.condition:
+            self.released = released
+        if count and self._request(b"ABORT\n", 'ABORTED') is None:
+            self.close()
+            return False, "Pas de réponse de l'Arduino"
+        with self.condition:
+            self.sent = self.released
+        return True, f"Tampon de {self.capacity} consignes"
+
+    def close(self):
+        """
+        Débranche le flux du contrôleur
+        """
+        self.controller.remove_listener(self._on_message)
+
+    def stream(self, frames):
+        """
+        Envoie des trames en avance et démarre leur lecture par la carte
+
+        Le tampon est d'abord rempli, puis la lecture démarre (GO) ; chaque
+        crédit renvoyé par la carte autorise l'envoi d'une consigne de plus.
+        Rend la main dès que la dernière consigne est dans le tampon (voir flush).
+
+        Args:
+            frames (list): Trames (t_secondes, {servo: angle}) à temps croissants,
+                           t = 0 au démarrage de la lecture ; les trames vides sont ignorées
+
+        Returns:
+            tuple: (bool, str) - Succès et message associé
+        """
+        # Tout est validé (enveloppe de sécurité comprise, voir safety.py) et encodé avant le premier envoi
+        safety = getattr(self.controller, 'safety', None)
+        pose = list(self.controller.current_angles)
+        lines = []
+        previous = 0
+        for t, targets in frames:
+            if not targets:
+                continue
+            due = int(round(t * 1000))
+            if due < previous:
+                return False, "Les temps des trames doivent être croissants"
+            previous = due
+            for s, a in targets.items():
+                if not (0 <= s <= 3):
+                    return False, f"Le numéro de servo {s} doit être entre 0 et 3"
+                if not (0 <= a <= 180):
+                    return False, f"L'angle {a} doit être entre 0 et 180 degrés"
+            if safety:
+                servos = list(targets)
+                safe, reason = safety.check_targets(servos, [targets[s] for s in servos], pose)
+                if not safe:
+                    return False, f"Trame à {t:.3f} s: {reason}"
+            for s, a in targets.items():
+                pose[s] = a
+            pairs = ",".join(f"{s},{int(a)}" for s, a in sorted(targets.items()))
+            lines.append((t, targets, f"T {due} {pairs}\n".encode('utf-8')))
+
+        with self.condition:
+            self.error = None
+            self.aborted = False
+        self.go_at = None
+        for t, targets, line in lines:
+            success, reason = self._wait_credit()
+            if not success:
+                return False, reason
+            # Verrou du contrôleur : pas d'écriture d'un autre thread (abort, ordonnanceur) au milieu
+            with self.controller.lock:
+                self.controller.serial.write(line)
+            with self.condition:
+                self.sent = (self.sent + 1) % COUNTER_MODULO
+                self.dues.append(t)
+            self.streamed += 1
+            self.final.update(targets)
+            self.controller.state.command(list(targets), list(targets.values()))
+        if self.go_at is None and lines and not self._start():
+            return False, "Pas de réponse de l'Arduino au démarrage de la lecture"
+        return True, f"{len(lines)} consignes envoyées"
+
+    def flush(self):
+        """
+        Attend que la carte ait joué toutes les consignes envoyées
+
+        Returns:
+            tuple: (bool, str) - Succès et bilan (consignes jouées en retard)
+        """
+        with self.condition:
+            if self.aborted:
+                return False, "Trajectoire interrompue"
+            while self._in_buffer():
+                if self.aborted:
+                    return False, "Trajectoire interrompue"
+                self._forget_released()
+                last_due = self.dues[-1] if self.dues else 0.0
+                remaining = self.go_at + last_due + self.reply_timeout - time.monotonic()
+                if remaining <= 0:
+                    return False, f"{self._in_buffer()} consignes non jouées (plus de crédits de la carte)"
+                self.condition.wait(remaining)
+            self.dues.clear()
+        played, self.streamed = self.streamed, 0
+        # Tout est joué : les derniers angles envoyés sont ceux des servos
+        for servo, angle in self.final.items():
+            self.controller.state.acknowledge(servo, angle)
+        status = self._request(b"BUF?\n", 'BUF')
+        late = (status[3] - self.late_at_open) % COUNTER_MODULO if status else 0
+        self.late_at_open = status[3] if status else self.late_at_open
+        return True, f"{played} consignes jouées par la carte, {late} en retard"
+
+    def abort(self):
+        """
+        Interrompt la lecture : la carte vide son tampon et les servos restent où ils sont
+
+        Peut être appelé depuis un autre thread pendant stream() ou flush().
+        Les angles commandés du contrôleur restent ceux des dernières consignes
+        envoyées, même si elles n'ont pas été jouées.
+
+        Returns:
+            tuple: (bool, str) - Succès et message associé
+        """
+        with self.condition:
+            self.aborted = True
+            self.condition.notify_all()
+        values = self._request(b"ABORT\n", 'ABORTED')
+        with self.condition:
+            self.dues.clear()
+            self.sent = self.released
+        self.go_at = None
+        self.streamed = 0
+        if values is None:
+            return False, "Pas de réponse de l'Arduino"
+        return True, "Trajectoire interrompue"
+
+    def _on_message(self, message):
+        """
+        Listener du contrôleur (thread de lecture) : crédits et réponses du tampon
+        """
+        match = REPLY_PATTERN.match(message) if isinstance(message, str) else None
+        if match is None:
+            return False
+        kind = match.group('kind')
+        values = [int(value) for value in match.group('values').split()]
+        with self.condition:
+            if kind in ('C', 'ABORTED') and values:
+                self.released = values[0]
+            elif kind in ('FULL', 'ERR T'):
+                self.error = kind
+            self.replies[kind] = values
+            self.condition.notify_all()
+        return True
+
+    def _request(self, command, kind):
+        """
+        Envoie une commande et attend la réponse du type donné
+
+        Returns:
+            list or None: Valeurs de la réponse, None sans réponse
+        """
+        with self.condition:
+            self.replies.pop(kind, None)
+        with self.controller.lock:
+            self.controller.serial.write(command)
+        with self.condition:
+            if not self.condition.wait_for(lambda: kind in self.replies, self.reply_timeout):
+                return None
+            return self.replies[kind]
+
+    def _start(self):
+        """
+        Démarre la lecture du tampon par la carte (horloge de lecture à 0)
+        """
+        if self._request(b"GO\n", 'GO') is None:
+            return False
+        # Instant pris après la réponse : les échéances attendues ne sont jamais en avance
+        self.go_at = time.monotonic()
+        return True
+
+    def _in_buffer(self):
+        return (self.sent - self.released) % COUNTER_MODULO
+
+    def _forget_released(self):
+        """
+        Oublie les échéances des consignes déjà jouées (appelé avec self.condition)
+        """
+        while len(self.dues) > self._in_buffer():
+            self.dues.popleft()
+
+    def _wait_credit(self):
+        """
+        Attend une case libre dans le tampon ; démarre la lecture s'il est plein
+        """
+        with self.condition:
+            while True:
+                if self.aborted:
+                    return False, "Trajectoire interrompue"
+                if self.error:
+                    return False, f"Consigne refusée par la carte ({self.error})"
+                self._forget_released()
+                if self._in_buffer() < self.capacity:
+                    return True, ""
+                if self.go_at is None:
+                    break
+                # La carte signale les cases libérées par lots : au pire, le crédit
+                # arrive à l'échéance de la CREDIT_BATCH-ième consigne du tampon
+                # (une consigne jouée avant un long maintien reste sinon sans crédit)
+                batch_due = self.dues[min(CREDIT_BATCH, len(self.dues)) - 1] if self.dues else 0.0
+                remaining = self.go_at + batch_due + self.reply_timeout - time.monotonic()
+                if remaining <= 0:
+                    return False, "Plus de crédits de la carte"
+                self.condition.wait(remaining)
+        # Tampon plein avant le démarrage : la lecture commence
+        if not self._start():
+            return False, "Pas de réponse de l'Arduino au démarrage de la lecture"
+        return self._wait_credit()
+
+
+def stream_trajectory(controller, setpoints, rate_hz=50):
+    """
+    Fait jouer un tableau de consignes par la carte, depuis son tampon
+    (équivalent de trajectory.play_trajectory pour buffered_arduino.ino)
+
+    Args:
+        controller (ArduinoServoController): Contrôleur connecté avec thread de lecture
+        setpoints (ndarray): Tableau N×4 des angles
+        rate_hz (float): Fréquence de lecture (Hz)
+
+    Returns:
+        tuple: (bool, str) - Succès et bilan de la lecture
+    """
+    if not controller.is_connected():
+        return False, "Non connecté à l'Arduino"
+
+    frames = trajectory_frames(setpoints, rate_hz, controller.current_angles)
+    streamer = TrajectoryStreamer(controller)
+    success, message = streamer.open()
+    if not success:
+        return False, message
+    try:
+        success, message = streamer.stream(frames)
+        if success:
+            return streamer.flush()
+        streamer.abort()
+        return False, message
+    except KeyboardInterrupt:
+        streamer.abort()
+        raise
+    finally:
+        streamer.close()
+
+
+# Exemple : balayage des quatre servos joué depuis le tampon de la carte
+if __name__ == "__main__":
+    import argparse
+
+    from arduino_servo_controller import ArduinoServoController
+    from trajectory import plan_trajectory
+
+    parser = argparse.ArgumentParser(description="Trajectoire jouée depuis le tampon de buffered_arduino.ino")
+    parser.add_argument('port', help="Port série de l'Arduino")
+    parser.add_argument('--baud', type=int, default=9600, help="Vitesse de la liaison")
+    parser.add_argument('--rate', type=float, default=50, help="Fréquence des consignes (Hz)")
+    args = parser.parse_args()
+
+    controller = ArduinoServoController(args.port, args.baud, reader_thread=True)
+    success, messages = controller.connect()
+    if not success:
+        raise SystemExit(f"Erreur de connexion: {messages}")
+    try:
+        _, setpoints = plan_trajectory([(0.0, [90, 90, 90, 90]), (1.5, [30, 150, 45, 135]),
+                                        (3.0, [150, 30, 135, 45]), (4.5, [90, 90, 90, 90])],
+                                       rate_hz=args.rate)
+        print(stream_trajectory(controller, setpoints, args.rate)[1])
+    finally:
+        controller.disconnect()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Pilotage en vitesse au clavier (« maintenir pour bouger »)
+
+Une touche enfoncée donne une vitesse au servo au lieu d'un pas d'angle. Une
+boucle à fréquence fixe intègre les positions avec rampes d'accélération et
+envoie une seule trame combinée par tick, quel que soit le rythme des
+touches. Le terminal ne signale pas le relâchement d'une touche : il est
+déduit de l'arrêt de la répétition automatique.
+"""
+import time
+
+NUM_SERVOS = 4
+
+# Le clavier attend environ 250 à 600 ms avant de répéter une touche tenue,
+# puis la répète toutes les 30 à 50 ms
+INITIAL_REPEAT_TIMEOUT = 0.65
+REPEAT_TIMEOUT = 0.12
+
+
+def _per_servo(value, count):
+    """
+    Accepte une valeur unique ou une valeur par servo
+    """
+    if isinstance(value, (int, float)):
+        return [float(value)] * count
+    values = [float(v) for v in value]
+    if len(values) != count:
+        raise ValueError(f"{count} valeurs attendues, {len(values)} reçues")
+    return values
+
+
+class VelocityJog:
+    """
+    Intégrateur de vitesse des servos commandé par des appuis de touches
+    """
+
+    def __init__(self, send, num_servos=NUM_SERVOS, rate_hz=50, max_speed=90.0, acceleration=360.0,
+                 initial_angles=None, limits=(0, 180), initial_timeout=INITIAL_REPEAT_TIMEOUT,
+                 repeat_timeout=REPEAT_TIMEOUT, clock=time.monotonic):
+        """
+        Args:
+            send (callable): Reçoit {servo: angle} (servos modifiés), une fois par tick au plus
+            num_servos (int): Nombre de servos
+            rate_hz (float): Fréquence de la boucle de commande (Hz)
+            max_speed (float or list): Vitesse maximale (°/s), globale ou par servo
+            acceleration (float or list): Accélération et décélération (°/s²), globale ou par servo
+            initial_angles (list): Positions de départ (90° par défaut)
+            limits (tuple): Angles minimal et maximal
+            initial_timeout (float): Relâchement supposé sans répétition après le premier appui (s)
+            repeat_timeout (float): Relâchement supposé une fois la répétition commencée (s)
+            clock (callable): Horloge monotone en secondes
+        """
+        self.send = send
+        self.num_servos = num_servos
+        self.period = 1.0 / rate_hz
+        self.max_speed = _per_servo(max_speed, num_servos)
+        self.acceleration = _per_servo(acceleration, num_servos)
+        self.low, self.high = limits
+        self.initial_timeout = initial_timeout
+        self.repeat_timeout = repeat_timeout
+        self.clock = clock
+        initial = initial_angles if initial_angles is not None else [90] * num_servos
+        self.positions = [float(a) for a in initial]
+        self.sent = [int(round(a)) for a in self.positions]
+        self.velocities = [0.0] * num_servos
+        self.directions = [0] * num_servos      # Sens demandé : -1, 0 ou 1
+        self.last_press = [None] * num_servos
+        self.repeating = [False] * num_servos
+        self.last_tick = None
+        self.writes = 0
+
+    def press(self, servo, direction, now=None):
+        """
+        Note un appui (ou une répétition) de la touche d'un servo
+
+        Args:
+            servo (int): Numéro du servo
+            direction (int): -1 pour diminuer l'angle, 1 pour l'augmenter
+        """
+        now = self.clock() if now is None else now
+        if self.directions[servo] == direction and self.last_press[servo] is not None:
+            # Même touche encore signalée : c'est la répétition automatique
+            self.repeating[servo] = True
+        else:
+            self.repeating[servo] = False
+        self.directions[servo] = direction
+        self.last_press[servo] = now
+        if self.last_tick is None:
+            self.last_tick = now
+
+    def release_all(self):
+        """
+        Relâche toutes les touches (les servos décélèrent jusqu'à l'arrêt)
+        """
+        self.directions = [0] * self.num_servos
+        self.last_press = [None] * self.num_servos
+
+    def stop_all(self):
+        """
+        Arrêt immédiat, sans rampe
+        """
+        self.release_all()
+        self.velocities = [0.0] * self.num_servos
+
+    def set_positions(self, angles):
+        """
+        Recale les positions intégrées (après une consigne envoyée par un autre chemin)
+        """
+        self.stop_all()
+        self.positions = [float(a) for a in angles]
+        self.sent = [int(round(a)) for a in angles]
+
+    def set_max_speed(self, speed, servo=None):
+        """
+        Change la vitesse maximale d'un servo, ou de tous si servo est None
+        """
+        for s in range(self.num_servos) if servo is None else [servo]:
+            self.max_speed[s] = float(speed)
+
+    def active(self):
+        """
+        Indique si un servo est tenu ou encore en mouvement (la boucle doit tourner)
+        """
+        return any(self.directions) or any(self.velocities)
+
+    def timeout(self, now=None):
+        """
+        Délai jusqu'au prochain tick, None si rien ne bouge (attente sans limite)
+        """
+        if not self.active():
+            self.last_tick = None
+            return None
+        now = self.clock() if now is None else now
+        if self.last_tick is None:
+            return 0.0
+        return max(0.0, self.last_tick + self.period - now)
+
+    def due(self, now=None):
+        """
+        Indique si le prochain tick est échu (à la milliseconde près, la précision de select())
+        """
+        timeout = self.timeout(now)
+        return timeout is not None and timeout <= 0.001
+
+    def tick(self, now=None):
+        """
+        Avance l'intégration jusqu'à now et envoie la trame des servos dont l'angle entier a changé
+
+        Returns:
+            dict: Angles envoyés {servo: angle} (vide si aucun n'a changé)
+        """
+        now = self.clock() if now is None else now
+        dt = 0.0 if self.last_tick is None else min(now - self.last_tick, 4 * self.period)
+        self.last_tick = now
+        changed = {}
+        for servo in range(self.num_servos):
+            self._release_if_idle(servo, now)
+            self._integrate(servo, dt)
+            angle = int(round(self.positions[servo]))
+            if angle != self.sent[servo]:
+                self.sent[servo] = angle
+                changed[servo] = angle
+        if changed:
+            self.send(changed)
+            self.writes += 1
+        return changed
+
+    def _release_if_idle(self, servo, now):
+        if not self.directions[servo]:
+            return
+        timeout = self.repeat_timeout if self.repeating[servo] else self.initial_timeout
+        if now - self.last_press[servo] > timeout:
+            self.directions[servo] = 0
+            self.last_press[servo] = None
+
+    def _integrate(self, servo, dt):
+        velocity = self.velocities[servo]
+        acceleration = self.acceleration[servo]
+        target = self.directions[servo] * self.max_speed[servo]
+        # Freiner à temps pour s'arrêter sur la butée plutôt que de la heurter
+        if velocity and acceleration > 0:
+            limit = self.high if velocity > 0 else self.low
+            stopping = velocity * velocity / (2 * acceleration)
+            if abs(limit - self.positions[servo]) <= stopping:
+                target = 0.0
+        # Rampe : la vitesse rejoint la consigne à accélération bornée
+        change = acceleration * dt if acceleration > 0 else abs(target - velocity)
+        if target > velocity:
+            velocity = min(target, velocity + change)
+        else:
+            velocity = max(target, velocity - change)
+        position = self.positions[servo] + velocity * dt
+        if position <= self.low or position >= self.high:
+            position = min(self.high, max(self.low, position))
+            velocity = 0.0
+        self.positions[servo] = position
+        self.velocities[servo] = velocity
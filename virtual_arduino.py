@@ -0,0 +1,857 @@
+#!/usr/bin/env python3
+"""
+Arduino virtuel sur pseudo-terminal, pour travailler sans carte
+
+L'émulateur crée un pseudo-terminal (pty) et fait tourner, côté maître, une
+copie en Python d'un des croquis du dépôt. Le programme hôte ouvre le côté
+esclave (/dev/pts/N) exactement comme un vrai port série :
+
+    python virtual_arduino.py --firmware servo --link /tmp/ttyVIRT0
+    python main.py /tmp/ttyVIRT0
+
+Croquis émulés :
+    - servo  : arduino.ino ("servo,angle;servo,angle", confirmation par servo,
+               commandes numérotées "@<seq> ..." -> "OK <seq>", BAUD/PING)
+    - flat   : new_arduino.ino (liste "servo, angle, servo, angle", réponse
+               "Received", BAUD/PING) ; pour new_main.py, qui ouvre
+               /dev/ttyACM0 : --link /dev/ttyACM0 (droits root nécessaires)
+    - binary : binary_arduino.ino (trames de binary_protocol.py)
+    - buffered : buffered_arduino.ino (tampon de consignes horodatées, "T <ms> ...",
+               GO/ABORT/BUF?, crédits "C <n>" ; voir trajectory_stream.py)
+
+Comportements simulés :
+    - durée de transmission des octets à la vitesse courante (10 bits par
+      octet), dans les deux sens, et changement de vitesse après vidage de
+      l'émission (Serial.flush) ;
+    - tampon d'émission de 64 octets : quand il est plein, Serial.print
+      bloque le croquis, qui cesse alors de lire ce qu'il reçoit ;
+    - octets illisibles quand l'hôte et la carte ne sont pas à la même vitesse
+      (Linux : vitesse du port lue avec l'ioctl TCGETS2) ;
+    - redémarrage à l'ouverture du port (DTR), délai du bootloader pendant
+      lequel les octets reçus sont perdus, puis bannière de démarrage ; pas
+      de redémarrage si la fermeture précédente a gardé DTR actif (drapeau
+      HUPCL effacé, voir port_discovery.open_port) ;
+    - déplacement progressif des servos (vitesse de rotation limitée) ;
+    - défauts injectables : octets perdus, parasites, redémarrages.
+"""
+import argparse
+import array
+import fcntl
+import os
+import pty
+import queue
+import random
+import re
+import select
+import termios
+import threading
+import time
+import tty
+
+import binary_protocol
+
+NUM_SERVOS = 4
+BANNER = "Servos initialisés - Prêt à recevoir des commandes"
+SAFE_BAUD = 9600
+SUPPORTED_BAUDS = (9600, 19200, 38400, 57600, 115200, 250000, 500000)
+BAUD_PROBATION = 1.0
+
+# Durée du bootloader après un reset (Arduino Uno, optiboot : environ 1,5 s)
+DEFAULT_BOOT_DELAY = 1.5
+# Vitesse de rotation d'un micro-servo SG90 (0,1 s pour 60°)
+DEFAULT_SLEW_RATE = 600.0
+# Taille du tampon de réception de l'Arduino : les octets sont traités par blocs de cette taille
+RX_CHUNK = 64
+# Tampon d'émission de HardwareSerial : au-delà, Serial.write attend qu'une place se libère
+TX_BUFFER = 64
+BITS_PER_BYTE = 10  # Bit de start, 8 bits de données, bit de stop
+
+# ioctl Linux renvoyant la struct termios2 (vitesses réelles, même non standard)
+TCGETS2 = 0x802C542A
+
+INTEGER_PATTERN = re.compile(r"\s*([+-]?\d+)")
+PAIR_PATTERN = re.compile(r"\s*([+-]?\d+),\s*([+-]?\d+)")
+
+
+def atoi(text):
+    """
+    Équivalent de atoi()/String.toInt() : entier en tête de chaîne, 0 sinon
+    """
+    match = INTEGER_PATTERN.match(text)
+    return int(match.group(1)) if match else 0
+
+
+class SimulatedServo:
+    """
+    Servo dont la position rejoint la consigne à vitesse limitée
+
+    write() reproduit Servo.write() : une valeur inférieure à MIN_PULSE est un
+    angle (borné à 0-180), une valeur plus grande une largeur d'impulsion.
+    """
+
+    MIN_PULSE = 544
+    MAX_PULSE = 2400
+
+    def __init__(self, slew_rate=DEFAULT_SLEW_RATE, angle=90.0, clock=time.monotonic):
+        self.slew_rate = slew_rate
+        self.clock = clock
+        self.reset(angle)
+
+    def reset(self, angle=90.0):
+        self.start_angle = float(angle)
+        self.target = float(angle)
+        self.start_time = self.clock()
+
+    def position(self, now=None):
+        """
+        Angle atteint à l'instant now (par défaut maintenant)
+        """
+        now = self.clock() if now is None else now
+        if self.slew_rate <= 0:
+            return self.target
+        travel = self.slew_rate * (now - self.start_time)
+        delta = self.target - self.start_angle
+        if abs(delta) <= travel:
+            return self.target
+        return self.start_angle + (travel if delta > 0 else -travel)
+
+    def settled_at(self):
+        """
+        Instant où la consigne courante sera atteinte
+        """
+        if self.slew_rate <= 0:
+            return self.start_time
+        return self.start_time + abs(self.target - self.start_angle) / self.slew_rate
+
+    def write(self, value):
+        if value < self.MIN_PULSE:
+            self._move_to(min(max(value, 0), 180))
+        else:
+            self.write_microseconds(value)
+
+    def write_microseconds(self, micros):
+        micros = min(max(micros, self.MIN_PULSE), self.MAX_PULSE)
+        self._move_to((micros - self.MIN_PULSE) * 180.0 / (self.MAX_PULSE - self.MIN_PULSE))
+
+    def _move_to(self, angle):
+        now = self.clock()
+        self.start_angle = self.position(now)
+        self.start_time = now
+        self.target = float(angle)
+
+
+class Firmware:
+    """
+    Base des croquis émulés : période d'essai de la vitesse et accès à la carte
+    """
+
+    banner = BANNER
+    poll_interval = 0.01  # Période maximale entre deux appels de loop() (s)
+
+    def __init__(self, board):
+        self.board = board
+        self.baud_probation = False
+        self.baud_switched_at = 0.0
+
+    def setup(self):
+        for servo in self.board.servos:
+            servo.write(90)
+        if self.banner:
+            self.board.println(self.banner)
+
+    def loop(self):
+        # Période d'essai écoulée sans confirmation : retour à la vitesse sûre
+        if self.baud_probation and self.board.clock() - self.baud_switched_at >= BAUD_PROBATION:
+            self.baud_probation = False
+            self.board.switch_baud(SAFE_BAUD)
+
+    def receive(self, data):
+        raise NotImplementedError
+
+    def start_probation(self, rate):
+        self.baud_probation = rate != SAFE_BAUD
+        self.baud_switched_at = self.board.clock()
+
+    def handle_link_command(self, data):
+        """
+        Traite "BAUD <vitesse>" et "PING <motif>" ; renvoie True si la ligne en était une
+        """
+        if data.startswith("BAUD "):
+            rate = atoi(data[5:])
+            if rate not in SUPPORTED_BAUDS:
+                self.board.println("BAUD NON")
+                return True
+            self.board.println(f"BAUD OK {rate}")
+            self.board.switch_baud(rate)
+            self.start_probation(rate)
+            return True
+        if data.startswith("PING "):
+            self.board.println("PONG " + data[5:])
+            self.baud_probation = False
+            return True
+        return False
+
+
+class ServoFirmware(Firmware):
+    """
+    arduino.ino : "servo,angle;servo,angle", une confirmation par servo
+    """
+
+    LINE_SIZE = 64
+
+    def __init__(self, board):
+        super().__init__(board)
+        self.line = bytearray()
+        self.overflow = False
+
+    def receive(self, data):
+        for byte in data:
+            if byte == 0x0A:
+                # Une ligne trop longue est ignorée en entier plutôt que tronquée
+                if not self.overflow:
+                    self.process_line(self.line.decode('latin-1'))
+                self.line.clear()
+                self.overflow = False
+            elif byte != 0x0D:
+                if len(self.line) < self.LINE_SIZE - 1:
+                    self.line.append(byte)
+                else:
+                    self.overflow = True
+
+    def process_line(self, data):
+        if self.handle_link_command(data):
+            return
+        seq = -1
+        if data.startswith('@'):
+            seq = atoi(data[1:])
+            space = data.find(' ')
+            if space < 0:
+                self.board.println(f"ERR {seq}")
+                return
+            data = data[space + 1:]
+
+        updates = []
+        # strtok ignore les segments vides
+        for command in (part for part in data.split(';') if part):
+            if len(updates) >= NUM_SERVOS:
+                break
+            match = PAIR_PATTERN.match(command)
+            if match is None:
+                continue
+            servo, angle = int(match.group(1)), int(match.group(2))
+            if 0 <= servo < NUM_SERVOS and 0 <= angle <= 180:
+                updates.append((servo, angle))
+
+        for servo, angle in updates:
+            self.board.write_servo(servo, angle)
+            if seq < 0:
+                self.board.println(f"Servo {servo} positionné à {angle} degrés")
+        if seq >= 0:
+            self.board.println(f"{'OK' if updates else 'ERR'} {seq}")
+
+
+class FlatFirmware(Firmware):
+    """
+    new_arduino.ino : "servo, angle, servo, angle", réponse "Received"
+
+    Les servos 2 et 3 sont montés à l'envers : leur angle est inversé. Le
+    croquis écrit "servo_num = 2 || servo_num = 3", qui ne compile pas ;
+    l'émulateur applique la comparaison voulue.
+    """
+
+    banner = None
+    MAX_VALUES = 8
+
+    def __init__(self, board):
+        super().__init__(board)
+        self.pending_line = bytearray()
+
+    def receive(self, data):
+        for byte in data:
+            if byte != 0x0A:
+                self.pending_line.append(byte)
+                continue
+            line = self.pending_line.decode('latin-1').strip()
+            self.pending_line.clear()
+            self.process_line(line)
+
+    def process_line(self, line):
+        if self.handle_link_command(line):
+            return
+        values = [atoi(part.replace(' ', '')) for part in line.split(',') if part.replace(' ', '')]
+        values = values[:self.MAX_VALUES]
+        if not values or len(values) % 2:
+            return
+        self.board.println("Received")
+        for i in range(0, len(values), 2):
+            servo, angle = values[i], values[i + 1]
+            if servo in (2, 3):
+                angle = abs(angle - 180)
+            if 0 <= servo < NUM_SERVOS:
+                self.board.write_servo(servo, angle)
+
+
+class BinaryFirmware(Firmware):
+    """
+    binary_arduino.ino : trames SYNC | type | seq | masque | données | CRC-8
+    """
+
+    FRAME_SIZE = 36
+
+    def __init__(self, board):
+        super().__init__(board)
+        self.frame = bytearray()
+        self.expected_length = 0
+        self.in_frame = False
+
+    def reply(self, ack, seq):
+        self.board.write(binary_protocol.encode_reply(ack, seq))
+
+    def receive(self, data):
+        for byte in data:
+            if not self.in_frame:
+                if byte == binary_protocol.SYNC:
+                    self.in_frame = True
+                    self.frame.clear()
+                    self.expected_length = 3
+                continue
+            self.frame.append(byte)
+            if len(self.frame) == 3:
+                command, seq, mask = self.frame
+                if command not in (binary_protocol.CMD_SET_ANGLES, binary_protocol.CMD_SET_MICROS,
+                                   binary_protocol.CMD_SET_BAUD, binary_protocol.CMD_PING):
+                    self.reply(False, seq)
+                    self.in_frame = False
+                    continue
+                self.expected_length = 3 + binary_protocol.payload_size(command, mask) + 1
+                if self.expected_length > self.FRAME_SIZE:
+                    self.reply(False, seq)
+                    self.in_frame = False
+                    continue
+            if len(self.frame) == self.expected_length:
+                self.apply_frame()
+                self.in_frame = False
+
+    def apply_frame(self):
+        command, seq, mask = self.frame[0], self.frame[1], self.frame[2]
+        if binary_protocol.crc8(self.frame[:-1]) != self.frame[-1]:
+            self.reply(False, seq)
+            return
+        if command == binary_protocol.CMD_PING:
+            self.baud_probation = False
+            self.reply(True, seq)
+            return
+        if command == binary_protocol.CMD_SET_BAUD:
+            if mask >= len(SUPPORTED_BAUDS):
+                self.reply(False, seq)
+                return
+            self.reply(True, seq)
+            self.board.switch_baud(SUPPORTED_BAUDS[mask])
+            self.start_probation(SUPPORTED_BAUDS[mask])
+            return
+        if mask & 0xF0:
+            self.reply(False, seq)
+            return
+        offset = 3
+        for servo in range(NUM_SERVOS):
+            if not mask & (1 << servo):
+                continue
+            if command == binary_protocol.CMD_SET_ANGLES:
+                angle = self.frame[offset]
+                offset += 1
+                if angle > 180:
+                    self.reply(False, seq)
+                    return
+                self.board.write_servo(servo, angle)
+            else:
+                micros = self.frame[offset] | (self.frame[offset + 1] << 8)
+                offset += 2
+                self.board.write_servo(servo, min(max(micros, 500), 2500), micros=True)
+        self.reply(True, seq)
+
+
+class BufferedFirmware(FlatFirmware):
+    """
+    buffered_arduino.ino : tampon circulaire de consignes horodatées, crédits renvoyés
+
+    L'interruption du Timer2 (1 kHz) est jouée par loop(), appelée au moins
+    toutes les millisecondes.
+    """
+
+    banner = BANNER
+    poll_interval = 0.001
+    BUFFER_SIZE = 64
+    CREDIT_BATCH = 4
+    CREDIT_DELAY_MS = 20
+    LATE_MS = 2
+    VALUE_PATTERN = re.compile(r"-?\d+")
+
+    def __init__(self, board):
+        super().__init__(board)
+        self.ring = []  # (échéance_ms, {servo: angle})
+        self.started_at = None  # Instant du GO, None hors lecture
+        self.released = 0
+        self.reported = 0
+        self.unreported_since = 0.0
+        self.late = 0
+
+    def write_angle(self, servo, angle):
+        self.board.write_servo(servo, 180 - angle if servo in (2, 3) else angle)
+
+    def parse_values(self, text):
+        # Tout caractère autre qu'un chiffre ou un signe sépare deux valeurs
+        return [int(value) for value in self.VALUE_PATTERN.findall(text)]
+
+    def process_line(self, line):
+        if self.handle_link_command(line):
+            return
+        if line.startswith("T "):
+            self.queue_setpoint(line)
+        elif line == "GO":
+            self.started_at = self.board.clock()
+            self.board.println("GO")
+        elif line == "ABORT":
+            self.started_at = None
+            self.released = (self.released + len(self.ring)) & 0xFFFF
+            self.ring.clear()
+            self.reported = self.released
+            self.board.println(f"ABORTED {self.released}")
+        elif line == "BUF?":
+            self.board.println(f"BUF {self.BUFFER_SIZE} {len(self.ring)} {self.released} {self.late}")
+        else:
+            values = self.parse_values(line)
+            if not values or len(values) % 2 or len(values) > 2 * NUM_SERVOS:
+                return
+            for servo, angle in zip(values[::2], values[1::2]):
+                if 0 <= servo < NUM_SERVOS and 0 <= angle <= 180:
+                    self.write_angle(servo, angle)
+                    self.board.println(f"Servo {servo} positionné à {angle} degrés")
+
+    def queue_setpoint(self, line):
+        space = line.find(' ', 2)
+        values = self.parse_values(line[space + 1:]) if space >= 0 else []
+        if not values or len(values) % 2 or len(values) > 2 * NUM_SERVOS:
+            self.board.println("ERR T")
+            return
+        if len(self.ring) >= self.BUFFER_SIZE:
+            self.board.println("FULL")
+            return
+        pairs = list(zip(values[::2], values[1::2]))
+        if not all(0 <= servo < NUM_SERVOS and 0 <= angle <= 180 for servo, angle in pairs):
+            self.board.println("ERR T")
+            return
+        self.ring.append((atoi(line[2:space]), dict(pairs)))
+
+    def loop(self):
+        super().loop()
+        if self.started_at is not None:
+            clock_ms = int((self.board.clock() - self.started_at) * 1000)
+            while self.ring and clock_ms >= self.ring[0][0]:
+                due, angles = self.ring.pop(0)
+                if clock_ms - due > self.LATE_MS:
+                    self.late += 1
+                for servo, angle in sorted(angles.items()):
+                    self.write_angle(servo, angle)
+                self.released = (self.released + 1) & 0xFFFF
+        # Crédits par lots, dès que le tampon est vide, ou après CREDIT_DELAY_MS
+        freed = (self.released - self.reported) & 0xFFFF
+        now = self.board.clock()
+        if not freed:
+            self.unreported_since = now
+        elif (freed >= self.CREDIT_BATCH or not self.ring
+              or now - self.unreported_since >= self.CREDIT_DELAY_MS / 1000):
+            self.board.println(f"C {self.released}")
+            self.reported = self.released
+            self.unreported_since = now
+
+
+FIRMWARES = {
+    'servo': ServoFirmware,
+    'flat': FlatFirmware,
+    'binary': BinaryFirmware,
+    'buffered': BufferedFirmware,
+}
+
+
+class VirtualArduino:
+    """
+    Carte Arduino émulée derrière un pseudo-terminal
+
+    Un thread joue la boucle du croquis (réception, détection de l'ouverture
+    du port, redémarrages), un second émet les octets au rythme de la vitesse
+    courante.
+    """
+
+    def __init__(self, firmware='servo', boot_delay=DEFAULT_BOOT_DELAY, slew_rate=DEFAULT_SLEW_RATE,
+                 reset_on_open=True, check_line_speed=True, drop_rate=0.0, garbage_rate=0.0,
+                 seed=None, link=None, clock=time.monotonic):
+        """
+        Args:
+            firmware (str): Croquis émulé ('servo', 'flat', 'binary' ou 'buffered')
+            boot_delay (float): Durée du bootloader après un redémarrage (s)
+            slew_rate (float): Vitesse de rotation des servos (°/s), 0 pour instantané
+            reset_on_open (bool): Redémarrer à chaque ouverture du port (DTR)
+            check_line_speed (bool): Brouiller les octets si l'hôte n'est pas à la même vitesse
+            drop_rate (float): Probabilité de perdre chaque octet reçu
+            garbage_rate (float): Probabilité d'envoyer des parasites avant chaque émission
+            seed (int): Graine du générateur des défauts
+            link (str): Lien symbolique à créer vers le port (ex. /tmp/ttyVIRT0)
+            clock (callable): Horloge monotone en secondes
+        """
+        if firmware not in FIRMWARES:
+            raise ValueError(f"Croquis inconnu: {firmware} (choix: {', '.join(FIRMWARES)})")
+        self.firmware_name = firmware
+        self.boot_delay = boot_delay
+        self.reset_on_open = reset_on_open
+        self.check_line_speed = check_line_speed
+        self.drop_rate = drop_rate
+        self.garbage_rate = garbage_rate
+        self.random = random.Random(seed)
+        self.link = link
+        self.clock = clock
+        self.servos = [SimulatedServo(slew_rate, clock=clock) for _ in range(NUM_SERVOS)]
+        self.listeners = []
+        self.baud = SAFE_BAUD
+        self.firmware = None
+        self.booted_at = None
+        self.host_connected = False
+        self.host_seen = False  # Le port a déjà été ouvert (la première ouverture redémarre toujours)
+        self.dtr_held = False  # DTR resté actif depuis la dernière fermeture du port
+        self.reset_requested = threading.Event()
+        self.tx_queue = queue.Queue()
+        self.tx_buffered = 0  # Octets dans le tampon d'émission (en file ou en cours d'émission)
+        self.tx_space = threading.Condition()
+        self.rx_free_at = 0.0
+        self.running = False
+        self.master = None
+        self.port = None
+        self.threads = []
+        # Compteurs
+        self.rx_bytes = 0
+        self.tx_bytes = 0
+        self.dropped_bytes = 0
+        self.garbled_bytes = 0
+        self.servo_writes = 0
+        self.resets = 0
+
+    # --- Cycle de vie -----------------------------------------------------
+
+    def start(self):
+        """
+        Crée le pseudo-terminal et démarre la carte
+
+        Returns:
+            str: Chemin du port à ouvrir côté hôte (le lien symbolique s'il y en a un)
+        """
+        self.master, slave = pty.openpty()
+        self.port = os.ttyname(slave)
+        tty.setraw(slave)
+        # Le côté esclave n'est gardé ouvert que par l'hôte : sa fermeture est ainsi détectable
+        os.close(slave)
+        if self.link:
+            if os.path.islink(self.link):
+                os.unlink(self.link)
+            os.symlink(self.port, self.link)
+        self.running = True
+        self._reset()
+        self.threads = [threading.Thread(target=self._run, name="VirtualArduino", daemon=True),
+                        threading.Thread(target=self._transmit, name="VirtualArduinoTx", daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        return self.link or self.port
+
+    def stop(self):
+        """
+        Arrête la carte et supprime le pseudo-terminal
+        """
+        if not self.threads:
+            return
+        self.running = False
+        # Boucle d'abord (elle peut attendre la fin d'une émission), émission ensuite ;
+        # le descripteur n'est fermé qu'après, sinon un autre pty pourrait le réutiliser
+        loop_thread, tx_thread = self.threads
+        loop_thread.join()
+        self.tx_queue.put(None)
+        tx_thread.join()
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+        if self.master is not None:
+            os.close(self.master)
+            self.master = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- API utilisée par les croquis (équivalents de Serial et Servo) -----
+
+    def write(self, data):
+        """
+        Serial.write : met des octets en file d'émission
+
+        Comme sur la carte, l'appel bloque tant que le tampon d'émission
+        (TX_BUFFER octets) n'a pas de place : le croquis est alors arrêté.
+        """
+        if self.garbage_rate and self.random.random() < self.garbage_rate:
+            data = self._noise(self.random.randint(1, 8)) + data
+        data = bytes(data)
+        while data:
+            with self.tx_space:
+                while self.tx_buffered >= TX_BUFFER and self.running:
+                    self.tx_space.wait(0.1)
+                if not self.running:
+                    return
+                room = TX_BUFFER - self.tx_buffered
+                chunk, data = data[:room], data[room:]
+                self.tx_buffered += len(chunk)
+            self.tx_queue.put(chunk)
+
+    def println(self, text):
+        self.write(text.encode('utf-8') + b'\r\n')
+
+    def flush(self):
+        """
+        Serial.flush : attend la fin de l'émission en cours
+        """
+        self.tx_queue.join()
+
+    def switch_baud(self, rate):
+        self.flush()
+        self.baud = rate
+
+    def write_servo(self, servo, value, micros=False):
+        if micros:
+            self.servos[servo].write_microseconds(value)
+        else:
+            self.servos[servo].write(value)
+        self.servo_writes += 1
+        now = self.clock()
+        for listener in self.listeners:
+            listener(servo, self.servos[servo].target, now)
+
+    # --- Observation et défauts --------------------------------------------
+
+    def add_listener(self, listener):
+        """
+        Enregistre listener(servo, angle, instant), appelé à chaque écriture de servo
+        """
+        self.listeners.append(listener)
+
+    def positions(self):
+        """
+        Angles actuels des servos (en mouvement ou non)
+        """
+        now = self.clock()
+        return [servo.position(now) for servo in self.servos]
+
+    def targets(self):
+        return [servo.target for servo in self.servos]
+
+    def inject_reset(self):
+        """
+        Provoque un redémarrage de la carte (comme une coupure d'alimentation)
+        """
+        self.reset_requested.set()
+
+    def inject_garbage(self, count=16):
+        """
+        Envoie des octets parasites à l'hôte
+        """
+        with self.tx_space:
+            self.tx_buffered += count
+        self.tx_queue.put(self._noise(count))
+
+    def stats(self):
+        return {
+            'rx_bytes': self.rx_bytes,
+            'tx_bytes': self.tx_bytes,
+            'dropped_bytes': self.dropped_bytes,
+            'garbled_bytes': self.garbled_bytes,
+            'servo_writes': self.servo_writes,
+            'resets': self.resets,
+            'baud': self.baud,
+        }
+
+    # --- Fonctionnement interne ----------------------------------------------
+
+    def _noise(self, count):
+        return bytes(self.random.getrandbits(8) for _ in range(count))
+
+    def _byte_time(self):
+        return BITS_PER_BYTE / self.baud
+
+    def _host_baud(self):
+        """
+        Vitesse configurée par l'hôte sur le port, None si elle n'est pas lisible
+        """
+        if not self.check_line_speed:
+            return None
+        attributes = array.array('i', [0] * 11)
+        try:
+            fcntl.ioctl(self.master, TCGETS2, attributes)
+        except OSError:
+            return None
+        return attributes[9]
+
+    def _hangup_on_close(self):
+        """
+        Indique si la fermeture du port relâche DTR (drapeau HUPCL de l'hôte, vrai s'il est illisible)
+        """
+        attributes = array.array('i', [0] * 11)
+        try:
+            fcntl.ioctl(self.master, TCGETS2, attributes)
+        except OSError:
+            return True
+        return bool(attributes[2] & termios.HUPCL)
+
+    def _speed_mismatch(self):
+        host = self._host_baud()
+        return host is not None and host != self.baud
+
+    def _reset(self):
+        """
+        Redémarrage : émission perdue, vitesse sûre, croquis relancé après le bootloader
+        """
+        while True:
+            try:
+                self.tx_queue.get_nowait()
+                self.tx_queue.task_done()
+            except queue.Empty:
+                break
+        with self.tx_space:
+            self.tx_buffered = 0
+            self.tx_space.notify_all()
+        self.baud = SAFE_BAUD
+        self.firmware = FIRMWARES[self.firmware_name](self)
+        self.booted_at = self.clock() + self.boot_delay
+        self.resets += 1
+
+    def _run(self):
+        while self.running:
+            if self.reset_requested.is_set():
+                self.reset_requested.clear()
+                self._reset()
+            try:
+                ready, _, _ = select.select([self.master], [], [], self.firmware.poll_interval)
+            except (OSError, ValueError):
+                break
+            data = b''
+            if ready:
+                try:
+                    data = os.read(self.master, RX_CHUNK)
+                except OSError:
+                    # Aucun processus n'a le port ouvert ; le drapeau HUPCL garde le réglage
+                    # de la dernière fermeture, même si l'hôte n'est resté qu'un instant
+                    if self.host_seen:
+                        self.dtr_held = not self._hangup_on_close()
+                    self.host_connected = False
+                    time.sleep(0.05)
+                    continue
+            if not self.host_connected:
+                self.host_connected = True
+                self.host_seen = True
+                if self.reset_on_open and not self.dtr_held:
+                    self._reset()
+            if data:
+                self._receive(data)
+            if self.booted_at is not None and self.clock() >= self.booted_at:
+                self.booted_at = None
+                self.firmware.setup()
+            if self.booted_at is None:
+                self.firmware.loop()
+
+    def _receive(self, data):
+        # Les octets arrivent au rythme de la liaison
+        now = self.clock()
+        self.rx_free_at = max(self.rx_free_at, now) + len(data) * self._byte_time()
+        delay = self.rx_free_at - now
+        if delay > 0:
+            time.sleep(delay)
+        self.rx_bytes += len(data)
+        if self.booted_at is not None:
+            # Le bootloader ne transmet rien au croquis
+            return
+        if self._speed_mismatch():
+            self.garbled_bytes += len(data)
+            data = self._noise(len(data))
+        if self.drop_rate:
+            kept = bytes(byte for byte in data if self.random.random() >= self.drop_rate)
+            self.dropped_bytes += len(data) - len(kept)
+            data = kept
+        self.firmware.receive(data)
+
+    def _transmit(self):
+        free_at = 0.0
+        while True:
+            data = self.tx_queue.get()
+            try:
+                if data is None:
+                    return
+                now = self.clock()
+                free_at = max(free_at, now) + len(data) * self._byte_time()
+                delay = free_at - now
+                if delay > 0:
+                    time.sleep(delay)
+                if not self.host_connected or self.master is None:
+                    continue
+                if self._speed_mismatch():
+                    self.garbled_bytes += len(data)
+                    data = self._noise(len(data))
+                try:
+                    os.write(self.master, data)
+                except OSError:
+                    continue
+                self.tx_bytes += len(data)
+            finally:
+                if data:
+                    with self.tx_space:
+                        # Peut passer sous zéro après un redémarrage pendant l'émission
+                        self.tx_buffered = max(self.tx_buffered - len(data), 0)
+                        self.tx_space.notify_all()
+                self.tx_queue.task_done()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arduino virtuel sur pseudo-terminal")
+    parser.add_argument('--firmware', choices=sorted(FIRMWARES), default='servo',
+                        help="Croquis émulé (servo: arduino.ino, flat: new_arduino.ino, binary: binary_arduino.ino, "
+                             "buffered: buffered_arduino.ino)")
+    parser.add_argument('--link', help="Lien symbolique vers le port (ex. /tmp/ttyVIRT0)")
+    parser.add_argument('--boot-delay', type=float, default=DEFAULT_BOOT_DELAY, help="Durée du bootloader (s)")
+    parser.add_argument('--slew-rate', type=float, default=DEFAULT_SLEW_RATE, help="Vitesse des servos (°/s)")
+    parser.add_argument('--no-reset', action='store_true', help="Ne pas redémarrer à l'ouverture du port")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="Probabilité de perte d'un octet reçu")
+    parser.add_argument('--garbage-rate', type=float, default=0.0, help="Probabilité de parasites par émission")
+    parser.add_argument('--reset-every', type=float, help="Redémarrer la carte toutes les N secondes")
+    parser.add_argument('--seed', type=int, help="Graine des défauts injectés")
+    parser.add_argument('--verbose', action='store_true', help="Afficher chaque écriture de servo")
+    args = parser.parse_args()
+
+    board = VirtualArduino(args.firmware, boot_delay=args.boot_delay, slew_rate=args.slew_rate,
+                           reset_on_open=not args.no_reset, drop_rate=args.drop_rate,
+                           garbage_rate=args.garbage_rate, seed=args.seed, link=args.link)
+    if args.verbose:
+        board.add_listener(lambda servo, angle, t: print(f"Servo {servo} -> {angle:.1f}°"))
+    port = board.start()
+    print(f"Arduino virtuel ({args.firmware}) sur {port}")
+    print("Ctrl+C pour arrêter")
+    try:
+        next_reset = time.monotonic() + args.reset_every if args.reset_every else None
+        while True:
+            time.sleep(0.1)
+            if next_reset is not None and time.monotonic() >= next_reset:
+                board.inject_reset()
+                print("Redémarrage injecté")
+                next_reset += args.reset_every
+    except KeyboardInterrupt:
+        pass
+    finally:
+        board.stop()
+        print(f"Arrêt. {board.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+Trace binaire des octets échangés sur la liaison série (journal circulaire en mmap)
+
+Chaque bloc écrit (TX) ou lu (RX) sur le port est ajouté, avec son instant
+(horloge monotone, en ns) et son sens, dans un fichier de taille fixe projeté
+en mémoire. Quand le fichier est plein, les plus anciens enregistrements sont
+écrasés : la trace peut rester active en permanence. Un enregistrement coûte
+un struct.pack_into et une copie d'octets dans la projection, sans objet
+Python créé par événement ; le noyau écrit les pages dans le fichier, qui
+reste lisible même si le programme est tué.
+
+    trace = WireTrace('servo.trace')
+    controller = ArduinoServoController(trace=trace)
+
+Le fichier d'une session précédente est gardé sous le nom <fichier>.1.
+
+Outil hors ligne :
+
+    python wire_trace.py decode servo.trace --direction rx --grep Servo
+    python wire_trace.py decode avant.trace apres.trace --align first-tx
+    python wire_trace.py replay servo.trace /dev/ttyACM0 --record rejeu.trace
+
+Format du fichier :
+    - en-tête de HEADER_SIZE octets : magie, version, nombre de canaux,
+      capacité, positions logiques (cumulées) du début et de la fin du
+      journal, origine des temps (horloge murale et monotone, en ns), puis
+      les canaux (un par port tracé : nom et dernière vitesse, gardée même
+      quand les événements de la liaison ont été écrasés) ;
+    - journal circulaire : enregistrements RECORD (instant en ns depuis
+      l'origine, type, canal, longueur) suivis de leurs octets. Un
+      enregistrement n'est jamais coupé par la fin du journal : la place
+      restante est marquée par un bourrage (PAD).
+"""
+import heapq
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import namedtuple
+
+MAGIC = b'SRVTRACE'
+VERSION = 1
+DEFAULT_SIZE = 1 << 20  # 1 Mo : plusieurs minutes de trafic à 50 poses/s
+
+HEADER = struct.Struct('<8sIIQQQQQ')  # magie, version, canaux, capacité, début, fin, origine murale, monotone
+POSITIONS = struct.Struct('<QQ')  # Début et fin du journal, mis à jour à chaque enregistrement
+POSITIONS_OFFSET = 24
+MAX_CHANNELS = 8
+CHANNEL = struct.Struct('<28sI')  # Nom du port, dernière vitesse de la liaison
+CHANNELS_OFFSET = 64
+HEADER_SIZE = CHANNELS_OFFSET + MAX_CHANNELS * CHANNEL.size
+
+RECORD = struct.Struct('<QBBH')  # instant (ns), type, canal, longueur
+
+# Types d'enregistrement
+PAD = 0  # Bourrage jusqu'à la fin du journal
+TX = 1  # Octets écrits vers l'Arduino
+RX = 2  # Octets reçus de l'Arduino
+NOTE = 3  # Événement de la liaison : "open <bauds>", "baud <bauds>", "close"
+
+KIND_NAMES = {TX: 'TX', RX: 'RX', NOTE: '--'}
+NOTE_PATTERN = re.compile(r"(?P<event>open|baud|close)(?: (?P<baud>\d+))?$")
+
+TraceRecord = namedtuple('TraceRecord', 'time kind channel data')  # time en secondes depuis l'origine
+Trace = namedtuple('Trace', 'path channels rates origin_wall records')
+
+
+class WireTrace:
+    """
+    Journal circulaire des échanges d'un ou plusieurs ports, dans un fichier projeté en mémoire
+    """
+
+    def __init__(self, path, size=DEFAULT_SIZE, clock=time.monotonic_ns):
+        """
+        Args:
+            path (str): Fichier de la trace (une session précédente est renommée en <path>.1)
+            size (int): Taille totale du fichier (octets)
+            clock (callable): Horloge monotone en nanosecondes
+        """
+        self.capacity = size - HEADER_SIZE
+        if self.capacity < 4096:
+            raise ValueError(f"Trace trop petite: {size} octets (au moins {HEADER_SIZE + 4096})")
+        # Un enregistrement occupe au plus la moitié du journal (bourrage compris, il tient toujours)
+        self.max_payload = min(0xFFFF, self.capacity // 2 - RECORD.size)
+        self.path = path
+        self.clock = clock
+        if os.path.exists(path):
+            os.replace(path, f"{path}.1")
+        with open(path, 'wb') as f:
+            f.truncate(size)
+        self.file = open(path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.origin = clock()
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, 0, self.capacity, 0, 0, time.time_ns(), self.origin)
+        self.head = 0  # Position logique de la fin du journal
+        self.tail = 0  # Position logique du plus ancien enregistrement conservé
+        self.channels = []
+        self.lock = threading.Lock()
+
+    def channel(self, name):
+        """
+        Numéro du canal d'un port (attribué à la première demande, gardé aux reconnexions)
+        """
+        with self.lock:
+            if name in self.channels:
+                return self.channels.index(name)
+            if len(self.channels) == MAX_CHANNELS:
+                raise ValueError(f"Au plus {MAX_CHANNELS} ports par trace")
+            self.channels.append(name)
+            CHANNEL.pack_into(self.map, CHANNELS_OFFSET + (len(self.channels) - 1) * CHANNEL.size,
+                              name.encode('utf-8'), 0)
+            struct.pack_into('<I', self.map, 12, len(self.channels))
+            return len(self.channels) - 1
+
+    def link_rate(self, channel, baudrate):
+        """
+        Note la vitesse de la liaison d'un canal (événement et en-tête)
+        """
+        struct.pack_into('<I', self.map, CHANNELS_OFFSET + channel * CHANNEL.size + 28, baudrate)
+
+    def record(self, kind, channel, data):
+        """
+        Ajoute un enregistrement (bloc tronqué à max_payload octets)
+
+        Args:
+            kind (int): TX, RX ou NOTE
+            channel (int): Canal du port (voir channel)
+            data (bytes): Octets échangés
+        """
+        length = len(data)
+        if length > self.max_payload:
+            data = data[:self.max_payload]
+            length = self.max_payload
+        size = RECORD.size + length
+        with self.lock:
+            moment = self.clock() - self.origin
+            offset = self.head % self.capacity
+            skip = self.capacity - offset if offset + size > self.capacity else 0
+            end = self.head + skip + size
+            while end - self.tail > self.capacity:
+                self._evict()
+            if skip:
+                if skip >= RECORD.size:
+                    RECORD.pack_into(self.map, HEADER_SIZE + offset, moment, PAD, 0, skip - RECORD.size)
+                offset = 0
+            position = HEADER_SIZE + offset
+            RECORD.pack_into(self.map, position, moment, kind, channel, length)
+            self.map[position + RECORD.size:position + size] = data
+            # Fin du journal publiée une fois l'enregistrement complet
+            self.head = end
+            POSITIONS.pack_into(self.map, POSITIONS_OFFSET, self.tail, self.head)
+
+    def _evict(self):
+        """
+        Oublie le plus ancien enregistrement (appelé avec self.lock)
+        """
+        offset = self.tail % self.capacity
+        if self.capacity - offset < RECORD.size:
+            # Fin du journal trop courte pour un en-tête : bourrage implicite
+            self.tail += self.capacity - offset
+            return
+        length = RECORD.unpack_from(self.map, HEADER_SIZE + offset)[3]
+        self.tail += RECORD.size + length
+
+    def note(self, text, channel=0):
+        """
+        Enregistre un événement de la liaison (ouverture, changement de vitesse, fermeture)
+        """
+        self.record(NOTE, channel, text.encode('utf-8'))
+
+    def wrap_serial(self, port, name):
+        """
+        Renvoie le port enveloppé pour tracer les octets échangés
+
+        Args:
+            port (serial.Serial): Port ouvert
+            name (str): Nom du canal (chemin du port)
+        """
+        return TracedSerial(port, self, self.channel(name))
+
+    def flush(self):
+        """
+        Force l'écriture des pages modifiées sur le disque
+        """
+        self.map.flush()
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+
+class TracedSerial:
+    """
+    Port série dont les blocs écrits et lus sont ajoutés à une trace
+
+    Comme metrics.InstrumentedSerial, toutes les autres opérations sont
+    transmises au port d'origine ; les changements de vitesse sont notés.
+    """
+
+    def __init__(self, port, trace, channel):
+        object.__setattr__(self, '_port', port)
+        object.__setattr__(self, '_trace', trace)
+        object.__setattr__(self, '_channel', channel)
+        trace.note(f"open {port.baudrate}", channel)
+        trace.link_rate(channel, port.baudrate)
+
+    def __getattr__(self, name):
+        return getattr(self._port, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._port, name, value)
+        if name == 'baudrate':
+            self._trace.note(f"baud {value}", self._channel)
+            self._trace.link_rate(self._channel, value)
+
+    def write(self, data):
+        written = self._port.write(data)
+        self._trace.record(TX, self._channel, data)
+        return written
+
+    def read(self, size=1):
+        data = self._port.read(size)
+        if data:
+            self._trace.record(RX, self._channel, data)
+        return data
+
+    def readline(self, *args, **kwargs):
+        data = self._port.readline(*args, **kwargs)
+        if data:
+            self._trace.record(RX, self._channel, data)
+        return data
+
+    def close(self):
+        if self._port.is_open:
+            self._trace.note("close", self._channel)
+        self._port.close()
+
+
+def load_trace(path):
+    """
+    Lit une trace (copie du fichier : la trace peut être en cours d'écriture)
+
+    Returns:
+        Trace: Noms et dernières vitesses des canaux, origine murale (ns) et
+               enregistrements du plus ancien au plus récent
+
+    Raises:
+        ValueError: Le fichier n'est pas une trace
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f"{path}: fichier trop court pour une trace")
+    magic, version, count, capacity, tail, head, origin_wall, _ = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: pas une trace de la liaison série (ou version {version} inconnue)")
+    channels = []
+    rates = []
+    for index in range(min(count, MAX_CHANNELS)):
+        name, rate = CHANNEL.unpack_from(data, CHANNELS_OFFSET + index * CHANNEL.size)
+        channels.append(name.rstrip(b'\0').decode('utf-8', errors='replace'))
+        rates.append(rate)
+
+    records = []
+    position = tail
+    while position < head:
+        offset = position % capacity
+        if capacity - offset < RECORD.size:
+            position += capacity - offset
+            continue
+        moment, kind, channel, length = RECORD.unpack_from(data, HEADER_SIZE + offset)
+        start = HEADER_SIZE + offset + RECORD.size
+        if kind != PAD:
+            records.append(TraceRecord(moment / 1e9, kind, channel, data[start:start + length]))
+        position += RECORD.size + length
+    return Trace(path, channels, rates, origin_wall, records)
+
+
+def format_payload(data):
+    """
+    Texte lisible d'un bloc : échappé s'il est imprimable, en hexadécimal sinon
+    """
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.hex(' ')
+    if all(character.isprintable() or character in '\t\r\n' for character in text):
+        return repr(text)
+    return data.hex(' ')
+
+
+def aligned_records(traces, align='start'):
+    """
+    Fusionne les enregistrements de plusieurs traces sur une même échelle de temps
+
+    Args:
+        traces (list): Traces rendues par load_trace
+        align (str): 'start' (origine de chaque trace), 'wall' (horloge murale,
+                     pour des traces prises en même temps) ou 'first-tx' (premier
+                     envoi de chaque trace à 0, pour comparer une capture et son rejeu)
+
+    Returns:
+        iterator: (temps aligné en s, indice de la trace, TraceRecord) par temps croissants
+    """
+    def shifted(index, trace):
+        if align == 'wall':
+            shift = trace.origin_wall / 1e9
+        elif align == 'first-tx':
+            shift = -next((record.time for record in trace.records if record.kind == TX), 0.0)
+        else:
+            shift = 0.0
+        return ((record.time + shift, index, record) for record in trace.records)
+
+    return heapq.merge(*(shifted(index, trace) for index, trace in enumerate(traces)),
+                       key=lambda item: item[0])
+
+
+def decode(traces, align='start', directions=None, channels=None, pattern=None, since=None, until=None):
+    """
+    Lignes lisibles des enregistrements retenus par les filtres
+
+    Args:
+        traces (list): Traces rendues par load_trace
+        align (str): Échelle de temps (voir aligned_records)
+        directions (set): Types gardés (TX, RX, NOTE) ; None : tous
+        channels (str): Sous-chaîne du nom de port des canaux gardés
+        pattern (re.Pattern): Motif cherché dans les octets (décodés en latin-1)
+        since, until (float): Fenêtre de temps gardée (s, sur l'échelle alignée)
+
+    Returns:
+        iterator: Lignes "temps  écart  [trace:]port  sens  octets"
+    """
+    previous = None
+    for moment, index, record in aligned_records(traces, align):
+        if directions is not None and record.kind not in directions:
+            continue
+        names = traces[index].channels
+        name = names[record.channel] if record.channel < len(names) else f"canal{record.channel}"
+        if channels and channels not in name:
+            continue
+        if since is not None and moment < since:
+            continue
+        if until is not None and moment > until:
+            break
+        if pattern is not None and not pattern.search(record.data.decode('latin-1')):
+            continue
+        delta = 0.0 if previous is None else moment - previous
+        previous = moment
+        source = f"{index}:" if len(traces) > 1 else ""
+        yield (f"{moment:14.6f}  +{delta * 1000:9.3f} ms  {source}{os.path.basename(name):<10}"
+               f"  {KIND_NAMES[record.kind]}  {format_payload(record.data)}")
+
+
+def replay(trace, port, channel=0, baudrate=None, speed=1.0, reset=False, record=None, settle=0.5, output=print):
+    """
+    Rejoue les envois d'une trace vers un port, en respectant leurs instants
+
+    Les changements de vitesse notés dans la trace sont reproduits au même
+    moment ; les octets reçus sont affichés au fil de l'eau et, si record est
+    donné, tracés pour être comparés à la capture (decode --align first-tx).
+
+    Args:
+        trace (Trace): Trace rendue par load_trace
+        port (str): Port de l'Arduino (ou de l'Arduino virtuel)
+        channel (int): Canal de la trace à rejouer
+        baudrate (int): Vitesse d'ouverture ; par défaut celle notée avant le premier
+                        envoi, ou la dernière vitesse du canal si l'événement a été écrasé
+        speed (float): Facteur de vitesse du rejeu (2 : deux fois plus vite)
+        reset (bool): Redémarrer la carte à l'ouverture (et attendre sa bannière)
+        record (WireTrace): Trace où enregistrer le rejeu
+        settle (float): Attente des dernières réponses (s)
+        output (callable): Affichage des octets reçus
+
+    Returns:
+        tuple: (bool, str) - Succès et bilan du rejeu
+    """
+    # pyserial n'est nécessaire que pour le rejeu
+    import serial
+    from port_discovery import open_port, wait_until_ready
+
+    events = [item for item in trace.records if item.channel == channel and item.kind in (TX, NOTE)]
+    sends = [item for item in events if item.kind == TX]
+    if not sends:
+        return False, "Aucun envoi à rejouer sur ce canal"
+    if baudrate is None:
+        opened = [NOTE_PATTERN.match(item.data.decode('utf-8', errors='replace'))
+                  for item in events if item.kind == NOTE and item.time <= sends[0].time]
+        rates = [int(match.group('baud')) for match in opened if match and match.group('baud')]
+        if rates:
+            baudrate = rates[-1]
+        elif channel < len(trace.rates) and trace.rates[channel]:
+            # Ouverture et négociation écrasées : la carte doit déjà être à cette vitesse (sinon --baud)
+            baudrate = trace.rates[channel]
+            output(f"Dernière vitesse du canal: {baudrate} bauds (ouverture absente de la trace)")
+        else:
+            baudrate = 9600
+
+    try:
+        ser = open_port(port, baudrate, timeout=0.05, reset=reset)
+    except serial.SerialException as e:
+        return False, str(e)
+    if reset:
+        wait_until_ready(ser, probe=False)
+    if record is not None:
+        ser = record.wrap_serial(ser, port)
+
+    received = [0]
+    stop = threading.Event()
+
+    def read_replies():
+        while not stop.is_set():
+            try:
+                data = ser.read(ser.in_waiting or 1)
+            except (serial.SerialException, OSError):
+                return
+            if data:
+                received[0] += len(data)
+                output(f"{time.monotonic() - started:14.6f}  RX  {format_payload(data)}")
+
+    started = time.monotonic()
+    reader = threading.Thread(target=read_replies, name="ReplayReader", daemon=True)
+    reader.start()
+    first = sends[0].time
+    worst = 0.0
+    try:
+        for item in events:
+            if item.time < first:
+                continue
+            # Échéances absolues : un retard n'est pas reporté sur les envois suivants
+            delay = started + (item.time - first) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                worst = max(worst, -delay)
+            if item.kind == TX:
+                ser.write(item.data)
+                continue
+            match = NOTE_PATTERN.match(item.data.decode('utf-8', errors='replace'))
+            if match and match.group('event') == 'baud':
+                ser.baudrate = int(match.group('baud'))
+        time.sleep(settle)
+    finally:
+        stop.set()
+        reader.join()
+        ser.close()
+    return True, (f"{len(sends)} envois rejoués à {baudrate} bauds en {time.monotonic() - started - settle:.3f} s, "
+                  f"retard max {worst * 1000:.1f} ms, {received[0]} octets reçus")
+
+
+# Outil en ligne de commande : décodage et rejeu des traces
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Trace binaire de la liaison série des servos")
+    commands = parser.add_subparsers(dest='mode', required=True)
+
+    decode_parser = commands.add_parser('decode', help="Afficher une ou plusieurs traces")
+    decode_parser.add_argument('traces', nargs='+', help="Fichiers de trace")
+    decode_parser.add_argument('--align', choices=('start', 'wall', 'first-tx'), default='start',
+                               help="Échelle de temps commune des traces")
+    decode_parser.add_argument('--direction', choices=('tx', 'rx', 'note'), action='append',
+                               help="Types gardés (option répétable)")
+    decode_parser.add_argument('--port', help="Garder les ports dont le nom contient ce texte")
+    decode_parser.add_argument('--grep', help="Garder les blocs contenant ce motif (expression régulière)")
+    decode_parser.add_argument('--since', type=float, help="Début de la fenêtre (s)")
+    decode_parser.add_argument('--until', type=float, help="Fin de la fenêtre (s)")
+
+    replay_parser = commands.add_parser('replay', help="Rejouer les envois d'une trace vers un port")
+    replay_parser.add_argument('trace', help="Fichier de trace")
+    replay_parser.add_argument('port', help="Port de l'Arduino ou de l'Arduino virtuel")
+    replay_parser.add_argument('--channel', type=int, default=0, help="Canal de la trace à rejouer")
+    replay_parser.add_argument('--baud', type=int, help="Vitesse d'ouverture (défaut : celle de la trace)")
+    replay_parser.add_argument('--speed', type=float, default=1.0, help="Facteur de vitesse du rejeu")
+    replay_parser.add_argument('--reset', action='store_true', help="Redémarrer la carte avant le rejeu")
+    replay_parser.add_argument('--record', metavar='FICHIER', help="Tracer le rejeu dans ce fichier")
+
+    args = parser.parse_args()
+    try:
+        if args.mode == 'decode':
+            kinds = {'tx': TX, 'rx': RX, 'note': NOTE}
+            lines = decode([load_trace(path) for path in args.traces], args.align,
+                           {kinds[name] for name in args.direction} if args.direction else None,
+                           args.port, re.compile(args.grep) if args.grep else None, args.since, args.until)
+            for line in lines:
+                print(line)
+        else:
+            recording = WireTrace(args.record) if args.record else None
+            success, summary = replay(load_trace(args.trace), args.port, args.channel, args.baud, args.speed,
+                                      args.reset, recording)
+            if recording:
+                recording.close()
+            print(summary)
+            sys.exit(0 if success else 1)
+    except BrokenPipeError:
+        # Sortie coupée (ex. | head)
+        pass
+    except (OSError, ValueError) as e:
+        sys.exit(f"Erreur: {e}")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import threading
+import time
+
+from command_queue import command_size
+
+
+class WriteScheduler(threading.Thread):
+    """
+    Ordonnanceur d'écriture « dernier gagnant »
+
+    Ne conserve que la dernière consigne de chaque servo et envoie tous les
+    servos modifiés dans une seule trame multi_servo ("s,a;s,a"), au plus
+    une trame par période. Au repos, une nouvelle consigne part aussitôt ;
+    sous une rafale, les consignes reçues pendant la période sont fusionnées.
+    La latence de file est ainsi nulle au repos et bornée à une période.
+    """
+
+    def __init__(self, controller, rate_hz=50, commands=None):
+        """
+        Args:
+            controller (ArduinoServoController): Contrôleur connecté
+            rate_hz (float): Fréquence d'envoi des trames (Hz)
+            commands (CommandQueue): Si donnée, les trames passent par sa voie normale
+                                     (cadencée, abandonnée par halt/urgent)
+        """
+        super().__init__(name="WriteScheduler", daemon=True)
+        self.controller = controller
+        self.commands = commands
+        self.period = 1.0 / rate_hz
+        self.targets = {}
+        self.lock = threading.Lock()
+        self.running = threading.Event()
+        # Armé dès la création : un stop() juste après start() ne peut pas être perdu
+        self.running.set()
+        self.wakeup = threading.Event()
+
+    def set_target(self, servo_num, angle):
+        """
+        Enregistre la nouvelle consigne d'un servo (remplace la précédente)
+        """
+        with self.lock:
+            self.targets[servo_num] = angle
+        self.wakeup.set()
+
+    def discard(self):
+        """
+        Oublie les consignes en attente sans les envoyer
+        """
+        with self.lock:
+            self.targets.clear()
+
+    def flush(self):
+        """
+        Envoie immédiatement les consignes en attente
+
+        Returns:
+            tuple: (bool, str) - Résultat de set_servo_angle, ou (True, []) si rien à envoyer
+        """
+        with self.lock:
+            # Inutile de renvoyer une consigne déjà appliquée
+            current = self.controller.current_angles
+            dirty = {s: a for s, a in self.targets.items() if current[s] != a}
+            self.targets.clear()
+        if not dirty:
+            return True, []
+        servos = sorted(dirty)
+        angles = [dirty[s] for s in servos]
+        if self.commands:
+            # Bloque jusqu'à l'écriture : les consignes suivantes s'accumulent pendant ce temps
+            return self.commands.send(self.controller.set_servo_angle, servos, angles, multi_servo=True,
+                                      size=command_size(servos, angles))
+        return self.controller.set_servo_angle(servos, angles, multi_servo=True)
+
+    def run(self):
+        next_allowed = time.monotonic()
+        while self.running.is_set():
+            # Attendre une nouvelle consigne (ou l'arrêt) sans réveil périodique
+            self.wakeup.wait()
+            self.wakeup.clear()
+            # Une trame est déjà partie il y a moins d'une période : on laisse les consignes s'accumuler
+            delay = next_allowed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.flush()
+            next_allowed = time.monotonic() + self.period
+        self.flush()
+
+    def stop(self, timeout=1.0):
+        """
+        Arrête l'ordonnanceur après un dernier envoi des consignes en attente
+        """
+        self.running.clear()
+        self.wakeup.set()
+        if self.is_alive():
+            self.join(timeout)